@@ -0,0 +1,484 @@
+"""Local stand-in for the Gmail endpoints gmail-clean uses.
+
+Serves users.messages.list, users.messages.batchDelete, users.labels.list,
+users.getProfile, users.history.list and the batch HTTP endpoint (carrying
+users.messages.trash, users.messages.untrash and users.messages.get
+sub-requests) over plain HTTP so the real client code can be driven offline. Mailbox size, page size
+cap, per-request latency and injected 429/5xx rates are configurable; inside a
+batch the error rates also apply to each sub-request.
+
+Point a real service object at it with service_for(url).
+
+Run standalone:
+    python -m benchmarks.fake_gmail --messages 100000 --latency 0.05
+"""
+
+import functools
+import json
+import random
+import re
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from dataclasses import asdict, dataclass, field
+from email.parser import BytesParser
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import httplib2
+import typer
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+
+# Sub-request paths inside a batch: messages/{id} (get), messages/{id}/trash and /untrash
+_MESSAGE_PATH = re.compile(r"/gmail/v1/users/me/messages/([0-9a-f]+)(/trash|/untrash)?")
+
+# users.history.list historyTypes values and the record keys they select.
+_HISTORY_TYPES = {
+    "messageAdded": "messagesAdded",
+    "messageDeleted": "messagesDeleted",
+    "labelAdded": "labelsAdded",
+    "labelRemoved": "labelsRemoved",
+}
+
+# Generated metadata: senders are drawn with a long tail, so a few dominate
+# the way newsletters do in a real mailbox.
+_SENDERS = [f"sender{index}@example.com" for index in range(40)]
+_USER_LABELS = {"Label_1": "Receipts", "Label_2": "Travel"}
+_CATEGORIES = ["CATEGORY_PROMOTIONS", "CATEGORY_UPDATES", "CATEGORY_SOCIAL", "CATEGORY_PERSONAL"]
+
+# Dates of generated messages are spread uniformly over this range.
+MAILBOX_START = 1_104_537_600  # 2005-01-01
+MAILBOX_END = 1_735_689_600  # 2025-01-01
+
+
+@dataclass
+class FakeGmailConfig:
+    """Knobs for one fake mailbox."""
+
+    messages: int = 10_000
+    page_size: int = 500  # server-side cap on maxResults
+    latency: float = 0.0  # seconds added to every request
+    rate_429: float = 0.0  # probability of answering 429
+    rate_5xx: float = 0.0  # probability of answering 503
+    retry_after: int | None = None  # Retry-After seconds sent with 429s
+    seed: int = 0
+
+
+@dataclass
+class FakeGmailStats:
+    """Request counters, returned by GET /_stats."""
+
+    list: int = 0
+    batch_delete: int = 0
+    get_profile: int = 0
+    batch: int = 0  # batch HTTP requests
+    trash: int = 0  # messages.trash sub-requests
+    get: int = 0  # messages.get sub-requests
+    labels: int = 0
+    history: int = 0
+    errors_429: int = 0
+    errors_5xx: int = 0
+    deleted: int = 0
+    trashed: int = 0
+    response_bytes: int = 0
+    connections: int = 0  # TCP connections accepted
+
+
+@dataclass
+class _Mailbox:
+    """Messages sorted by (epoch, id); deletions are tombstones until reset.
+
+    Trashed messages stay in the mailbox but, as with Gmail's default
+    messages.list, are no longer listed.
+    """
+
+    config: FakeGmailConfig
+    keys: list[tuple[int, str]] = field(default_factory=list)
+    deleted: set[str] = field(default_factory=set)
+    trashed: set[str] = field(default_factory=set)
+    history_id: int = 1
+    history: list[dict] = field(default_factory=list)
+
+    def __post_init__(self) -> None:
+        rng = random.Random(self.config.seed)
+        keys = set()
+        while len(keys) < self.config.messages:
+            message_id = format(rng.getrandbits(60) | (1 << 60), "x")
+            keys.add((rng.randrange(MAILBOX_START, MAILBOX_END), message_id))
+        self.keys = sorted(keys)
+        self.epochs = {message_id: epoch for epoch, message_id in self.keys}
+
+    def metadata(self, message_id: str) -> dict:
+        """Return a format=metadata message resource, stable for a given ID."""
+        rng = random.Random(message_id)
+        labels = [rng.choice(_CATEGORIES)]
+        if rng.random() < 0.3:
+            labels.append("INBOX")
+        if rng.random() < 0.1:
+            labels.append(rng.choice(list(_USER_LABELS)))
+        if message_id in self.trashed:
+            labels.append("TRASH")
+        sender = _SENDERS[min(int(rng.expovariate(0.2)), len(_SENDERS) - 1)]
+        return {
+            "id": message_id,
+            "threadId": message_id,
+            "labelIds": labels,
+            "sizeEstimate": int(rng.lognormvariate(9, 1.2)),
+            "internalDate": str(self.epochs[message_id] * 1000),
+            "payload": {"headers": [{"name": "From", "value": f"Sender <{sender}>"}]},
+        }
+
+    def record(self, change: dict) -> None:
+        """Append one users.history record (e.g. {"messagesDeleted": [...]})."""
+        self.history_id += 1
+        self.history.append({"id": str(self.history_id), **change})
+
+    def set_trashed(self, message_id: str, trashed: bool) -> None:
+        """Move a message to or out of Trash and record the label change."""
+        if (message_id in self.trashed) == trashed:
+            return
+        if trashed:
+            self.trashed.add(message_id)
+        else:
+            self.trashed.discard(message_id)
+        change = {"labelIds": ["TRASH"], "message": self.metadata(message_id)}
+        self.record({"labelsAdded" if trashed else "labelsRemoved": [change]})
+
+    def window(self, after: int | None, before: int | None) -> tuple[int, int]:
+        """Index range of keys with after < epoch < before."""
+        low = bisect_right(self.keys, (after, "~")) if after is not None else 0
+        high = bisect_left(self.keys, (before, "")) if before is not None else len(self.keys)
+        return low, max(low, high)
+
+    def page(
+        self, after: int | None, before: int | None, limit: int, cursor: tuple[int, str] | None
+    ) -> tuple[list[tuple[int, str]], int, bool]:
+        """Return up to `limit` live keys newest-first below cursor, the estimate,
+        and whether older keys remain (which may all turn out to be tombstones)."""
+        low, high = self.window(after, before)
+        estimate = high - low  # counts tombstones, like a real estimate may
+        if cursor is not None:
+            high = min(high, bisect_left(self.keys, cursor))
+        found = []
+        index = high - 1
+        while index >= low and len(found) < limit:
+            key = self.keys[index]
+            if key[1] not in self.deleted and key[1] not in self.trashed:
+                found.append(key)
+            index -= 1
+        return found, estimate, index >= low
+
+
+class FakeGmailServer:
+    """Threaded HTTP server holding one fake mailbox.
+
+    Use as a context manager; pass `url` to service_for to build a service against it.
+    """
+
+    def __init__(self, config: FakeGmailConfig | None = None, port: int = 0) -> None:
+        self.config = config or FakeGmailConfig()
+        self._lock = threading.Lock()
+        self._rng = random.Random(self.config.seed)
+        self.reset()
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", port), self._handler_class())
+        self._httpd.daemon_threads = True
+        # A short poll interval keeps stop() (and test teardown) fast.
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+        )
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def reset(self, config: FakeGmailConfig | None = None) -> None:
+        """Rebuild the mailbox and zero the counters."""
+        with self._lock:
+            if config is not None:
+                self.config = config
+            self.mailbox = _Mailbox(self.config)
+            self.stats = FakeGmailStats()
+
+    def start(self) -> "FakeGmailServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "FakeGmailServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out in separate writes; without TCP_NODELAY
+            # every keep-alive response stalls ~40 ms on delayed ACKs.
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                with server._lock:
+                    server.stats.connections += 1
+
+            def log_message(self, format, *args):  # noqa: A002 — stdlib signature
+                pass
+
+            def do_GET(self):
+                server._dispatch(self, "GET")
+
+            def do_POST(self):
+                server._dispatch(self, "POST")
+
+        return Handler
+
+    def _send(self, handler, status: int, payload: dict, headers: dict | None = None) -> None:
+        body = json.dumps(payload).encode()
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json; charset=UTF-8")
+        handler.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        handler.wfile.write(body)
+        with self._lock:
+            self.stats.response_bytes += len(body)
+
+    def _dispatch(self, handler, method: str) -> None:
+        url = urlparse(handler.path)
+        length = int(handler.headers.get("Content-Length") or 0)
+        body = handler.rfile.read(length) if length else b""
+
+        if url.path == "/_stats":
+            with self._lock:
+                return self._send(handler, 200, asdict(self.stats))
+        if url.path == "/_reset":
+            overrides = json.loads(body or b"{}")
+            self.reset(FakeGmailConfig(**overrides) if overrides else None)
+            return self._send(handler, 200, {})
+
+        if self.config.latency:
+            time.sleep(self.config.latency)
+        error = self._roll_error()
+        if error:
+            headers = self._error_headers(error)
+            return self._send(handler, error, {"error": {"code": error}}, headers)
+
+        if method == "GET" and url.path == "/gmail/v1/users/me/messages":
+            return self._list(handler, parse_qs(url.query))
+        if method == "POST" and url.path == "/gmail/v1/users/me/messages/batchDelete":
+            return self._batch_delete(handler, json.loads(body))
+        if method == "POST" and url.path == "/batch":
+            return self._batch(handler, body)
+        if method == "GET" and url.path == "/gmail/v1/users/me/labels":
+            with self._lock:
+                self.stats.labels += 1
+            system = ["INBOX", "TRASH", *_CATEGORIES]
+            labels = [{"id": label, "name": label, "type": "system"} for label in system]
+            labels += [
+                {"id": label, "name": name, "type": "user"}
+                for label, name in _USER_LABELS.items()
+            ]
+            return self._send(handler, 200, {"labels": labels})
+        if method == "GET" and url.path == "/gmail/v1/users/me/history":
+            return self._history(handler, parse_qs(url.query))
+        if method == "GET" and url.path == "/gmail/v1/users/me/profile":
+            with self._lock:
+                self.stats.get_profile += 1
+                history_id = self.mailbox.history_id
+            return self._send(
+                handler, 200, {"emailAddress": "me@example.com", "historyId": str(history_id)}
+            )
+        return self._send(handler, 404, {"error": {"code": 404, "message": url.path}})
+
+    def _roll_error(self) -> int:
+        """Return an injected error status (429 or 503), or 0 to answer normally."""
+        with self._lock:
+            roll = self._rng.random()
+            if roll < self.config.rate_429:
+                self.stats.errors_429 += 1
+                return 429
+            if roll < self.config.rate_429 + self.config.rate_5xx:
+                self.stats.errors_5xx += 1
+                return 503
+            return 0
+
+    def _error_headers(self, status: int) -> dict[str, str]:
+        if status == 429 and self.config.retry_after is not None:
+            return {"Retry-After": str(self.config.retry_after)}
+        return {}
+
+    def _list(self, handler, params: dict[str, list[str]]) -> None:
+        query = params.get("q", [""])[0]
+        after = re.search(r"after:(\d+)", query)
+        before = re.search(r"before:(\d+)", query)
+        limit = min(int(params.get("maxResults", ["100"])[0]), self.config.page_size)
+        token = params.get("pageToken", [None])[0]
+        cursor = None
+        if token:
+            epoch, message_id = token.split(":")
+            cursor = (int(epoch), message_id)
+        with self._lock:
+            self.stats.list += 1
+            found, estimate, more = self.mailbox.page(
+                int(after.group(1)) if after else None,
+                int(before.group(1)) if before else None,
+                limit,
+                cursor,
+            )
+        slim = "fields" in params
+        payload: dict = {"resultSizeEstimate": estimate}
+        if found:
+            payload["messages"] = [
+                {"id": message_id} if slim else {"id": message_id, "threadId": message_id}
+                for _, message_id in found
+            ]
+        if found and more:
+            payload["nextPageToken"] = f"{found[-1][0]}:{found[-1][1]}"
+        self._send(handler, 200, payload)
+
+    def _history(self, handler, params: dict[str, list[str]]) -> None:
+        start = int(params["startHistoryId"][0])
+        types = {_HISTORY_TYPES[name] for name in params.get("historyTypes", [])}
+        limit = min(int(params.get("maxResults", ["100"])[0]), self.config.page_size)
+        offset = int(params.get("pageToken", ["0"])[0])
+        with self._lock:
+            self.stats.history += 1
+            records = [
+                record
+                for record in self.mailbox.history
+                if int(record["id"]) > start and (not types or types & record.keys())
+            ]
+            history_id = self.mailbox.history_id
+        payload: dict = {"history": records[offset:offset + limit], "historyId": str(history_id)}
+        if offset + limit < len(records):
+            payload["nextPageToken"] = str(offset + limit)
+        self._send(handler, 200, payload)
+
+    def _batch_delete(self, handler, payload: dict) -> None:
+        ids = payload.get("ids", [])
+        if len(ids) > 1000:
+            return self._send(handler, 400, {"error": {"code": 400, "message": "too many ids"}})
+        with self._lock:
+            self.stats.batch_delete += 1
+            # Like Gmail, one ID the mailbox never had fails the whole request.
+            invalid = any(message_id not in self.mailbox.epochs for message_id in ids)
+            if not invalid:
+                before = len(self.mailbox.deleted)
+                self.mailbox.deleted.update(ids)
+                self.stats.deleted += len(self.mailbox.deleted) - before
+                self.mailbox.record(
+                    {"messagesDeleted": [{"message": {"id": message_id}} for message_id in ids]}
+                )
+        if invalid:
+            return self._send(handler, 400, {"error": {"code": 400, "message": "Invalid id"}})
+        handler.send_response(204)
+        handler.send_header("Content-Length", "0")
+        handler.end_headers()
+
+    def _batch(self, handler, body: bytes) -> None:
+        """Answer a multipart/mixed batch, one application/http part per sub-request."""
+        envelope = BytesParser().parsebytes(
+            f"Content-Type: {handler.headers['Content-Type']}\r\n\r\n".encode() + body
+        )
+        parts = envelope.get_payload()
+        if len(parts) > 100:
+            return self._send(handler, 400, {"error": {"code": 400, "message": "too many parts"}})
+        with self._lock:
+            self.stats.batch += 1
+
+        boundary = f"batch_{self._rng.getrandbits(64):x}"
+        out = []
+        for part in parts:
+            method, path = part.get_payload().split(" ", 2)[:2]
+            status, payload = self._sub_request(method, urlparse(path).path)
+            headers = self._error_headers(status)
+            headers["Content-Type"] = "application/json; charset=UTF-8"
+            out.append(
+                f"--{boundary}\r\n"
+                "Content-Type: application/http\r\n"
+                f"Content-ID: <response-{part['Content-ID'][1:-1]}>\r\n\r\n"
+                f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+                + "".join(f"{name}: {value}\r\n" for name, value in headers.items())
+                + f"\r\n{json.dumps(payload)}\r\n"
+            )
+        out.append(f"--{boundary}--\r\n")
+        response = "".join(out).encode()
+        handler.send_response(200)
+        handler.send_header("Content-Type", f"multipart/mixed; boundary={boundary}")
+        handler.send_header("Content-Length", str(len(response)))
+        handler.end_headers()
+        handler.wfile.write(response)
+        with self._lock:
+            self.stats.response_bytes += len(response)
+
+    def _sub_request(self, method: str, path: str) -> tuple[int, dict]:
+        """Return (status, JSON body) for one sub-request of a batch."""
+        error = self._roll_error()
+        if error:
+            return error, {"error": {"code": error}}
+        match = _MESSAGE_PATH.fullmatch(path)
+        if match is None or method != ("POST" if match.group(2) else "GET"):
+            return 404, {"error": {"code": 404, "message": path}}
+        message_id = match.group(1)
+        with self._lock:
+            if match.group(2) == "/trash":
+                self.stats.trash += 1
+            elif not match.group(2):
+                self.stats.get += 1
+            if message_id not in self.mailbox.epochs or message_id in self.mailbox.deleted:
+                return 404, {"error": {"code": 404, "message": "Not Found"}}
+            if match.group(2) == "/trash" and message_id not in self.mailbox.trashed:
+                self.stats.trashed += 1
+            if match.group(2):
+                self.mailbox.set_trashed(message_id, match.group(2) == "/trash")
+            return 200, self.mailbox.metadata(message_id)
+
+
+@functools.cache
+def _discovery_document(url: str) -> dict:
+    # The batch URI is built from rootUrl, not api_endpoint, so rewrite rootUrl
+    # itself to send batch requests to the fake server too.
+    document = json.loads(get_static_doc("gmail", "v1"))
+    document["rootUrl"] = f"{url}/"
+    return document
+
+
+def service_for(url: str, http=None):
+    """Build a real Gmail service object whose requests go to the fake server.
+
+    http defaults to a fresh httplib2.Http; pass a shared PooledHttp to measure
+    the pooled transport.
+    """
+    return build_from_document(_discovery_document(url), http=http or httplib2.Http())
+
+
+def main(
+    port: int = typer.Option(8765, help="Port to listen on."),
+    messages: int = typer.Option(10_000, help="Mailbox size."),
+    page_size: int = typer.Option(500, help="Server-side cap on maxResults."),
+    latency: float = typer.Option(0.0, help="Seconds of latency per request."),
+    rate_429: float = typer.Option(0.0, help="Fraction of requests answered with 429."),
+    rate_5xx: float = typer.Option(0.0, help="Fraction of requests answered with 503."),
+) -> None:
+    """Serve a fake Gmail mailbox until interrupted."""
+    config = FakeGmailConfig(messages, page_size, latency, rate_429, rate_5xx)
+    with FakeGmailServer(config, port=port) as server:
+        typer.echo(f"Fake Gmail serving {messages:,} messages at {server.url}")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    typer.run(main)
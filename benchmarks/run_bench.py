@@ -0,0 +1,235 @@
+"""Offline benchmarks: drive the real listing, deletion and CLI code against fake_gmail.
+
+Each scenario starts from a freshly generated mailbox and reports messages per
+second, server-side request counts and the tracemalloc peak of the client.
+
+    python -m benchmarks.run_bench --messages 50000 --latency 0.02
+    python -m benchmarks.run_bench --scenario list --scenario sharded
+
+Deletion is paced by the quota limiter (batchDelete costs 50 units per 500
+messages, trash 5 units per message), so at the default --quota-rate the
+delete and trash scenarios measure the limiter, not the client. Raise
+--quota-rate to measure raw throughput.
+"""
+
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from functools import partial
+from pathlib import Path
+from unittest.mock import patch
+
+import typer
+from rich.console import Console
+from rich.table import Table
+from typer.testing import CliRunner
+
+from benchmarks.fake_gmail import (
+    MAILBOX_END,
+    FakeGmailConfig,
+    FakeGmailServer,
+    service_for,
+)
+from gmail_cleanup import main as cli
+from gmail_cleanup.cleaner import batch_delete
+from gmail_cleanup.date_utils import build_gmail_query
+from gmail_cleanup.gmail_client import (
+    iter_sharded_message_id_pages,
+    list_message_ids,
+)
+from gmail_cleanup.rate_limit import DEFAULT_QUOTA_RATE, RateLimiter
+from gmail_cleanup.transport import PooledHttp, TransportConfig
+
+console = Console()
+
+# A day past the newest generated message, so every scenario sees the whole
+# mailbox whatever the local timezone used to parse --before.
+CUTOFF = datetime.fromtimestamp(MAILBOX_END + 86_400, tz=timezone.utc)
+
+
+@dataclass
+class BenchResult:
+    name: str
+    messages: int
+    seconds: float
+    list_calls: int
+    delete_calls: int
+    batch_calls: int
+    errors: int
+    connections: int
+    peak_mib: float
+
+    @property
+    def rate(self) -> float:
+        return self.messages / self.seconds if self.seconds else 0.0
+
+
+def _measure(
+    name: str, server: FakeGmailServer, scenario: Callable[[], int]
+) -> BenchResult:
+    """Run scenario against a fresh mailbox; it returns the messages it handled."""
+    server.reset()
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        messages = scenario()
+    finally:
+        seconds = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    stats = server.stats
+    return BenchResult(
+        name,
+        messages,
+        seconds,
+        stats.list,
+        stats.batch_delete,
+        stats.batch,
+        stats.errors_429 + stats.errors_5xx,
+        stats.connections,
+        peak / 2**20,
+    )
+
+
+def _scenarios(
+    server: FakeGmailServer, workers: int, quota_rate: float, transport: str
+) -> dict[str, Callable[[], int]]:
+    query = build_gmail_query(CUTOFF)
+
+    def new_factory() -> Callable[[], object]:
+        # "pooled" mirrors build_gmail_service: every service from one factory
+        # shares a single PooledHttp. "httplib2" gives each its own connection.
+        if transport == "httplib2":
+            return partial(service_for, server.url)
+        http = PooledHttp(config=TransportConfig(pool_size=workers + 1))
+        return partial(service_for, server.url, http)
+
+    def limiter(**kwargs) -> RateLimiter:
+        # Also stands in for RateLimiter in run_cli, where main passes metrics=.
+        return RateLimiter(rate=quota_rate, **kwargs)
+
+    def list_sequential() -> int:
+        return len(list_message_ids(new_factory()(), query, limiter=limiter()))
+
+    def list_sharded() -> int:
+        pages = iter_sharded_message_id_pages(
+            new_factory(), CUTOFF, workers=workers, limiter=limiter()
+        )
+        return sum(len(page) for page in pages)
+
+    def delete(delete_workers: int, trash: bool = False) -> int:
+        # IDs come straight from the mailbox so only deletion is timed.
+        ids = [message_id for _, message_id in server.mailbox.keys]
+        factory = new_factory()
+        return batch_delete(
+            factory(),
+            ids,
+            workers=delete_workers,
+            service_factory=factory,
+            limiter=limiter(),
+            trash=trash,
+        )
+
+    def run_cli(args: list[str], stdin: str | None = None) -> int:
+        # The real command end to end: auth and the journal are redirected to
+        # the fake server and a throwaway directory.
+        with (
+            tempfile.TemporaryDirectory() as tmp,
+            # main imports these lazily, so patch them where they are defined.
+            patch("gmail_cleanup.auth.build_gmail_service", new_factory()),
+            patch("gmail_cleanup.rate_limit.RateLimiter", limiter),
+            patch("gmail_cleanup.journal.JOURNAL_PATH", Path(tmp) / "journal.db"),
+        ):
+            result = CliRunner().invoke(cli.app, args, input=stdin)
+        if result.exit_code != 0:
+            raise RuntimeError(f"gmail-clean {' '.join(args)} failed:\n{result.output}")
+        return server.config.messages
+
+    before = ["--before", CUTOFF.strftime("%Y-%m-%d")]
+    return {
+        "list": list_sequential,
+        "sharded": list_sharded,
+        "delete": partial(delete, 1),
+        "delete-parallel": partial(delete, workers),
+        "trash": partial(delete, 1, trash=True),
+        "trash-parallel": partial(delete, workers, trash=True),
+        "cli-dry-run": partial(run_cli, before),
+        "cli-execute": partial(
+            run_cli, [*before, "--execute", "--workers", str(workers)], "y\n"
+        ),
+    }
+
+
+def main(
+    messages: int = typer.Option(20_000, help="Mailbox size."),
+    page_size: int = typer.Option(500, help="Server-side cap on maxResults."),
+    latency: float = typer.Option(0.0, help="Seconds of latency per request."),
+    rate_429: float = typer.Option(0.0, help="Fraction of requests answered with 429."),
+    rate_5xx: float = typer.Option(0.0, help="Fraction of requests answered with 503."),
+    workers: int = typer.Option(4, help="Workers for the parallel scenarios."),
+    quota_rate: float = typer.Option(
+        DEFAULT_QUOTA_RATE, help="Quota units/second given to the rate limiter."
+    ),
+    scenario: list[str] = typer.Option(
+        [], help="Scenario to run (repeatable). Default: all."
+    ),
+    transport: str = typer.Option(
+        "pooled", help="Client transport: pooled (PooledHttp) or httplib2."
+    ),
+) -> None:
+    """Benchmark gmail-clean against a local fake Gmail server."""
+    if transport not in ("pooled", "httplib2"):
+        typer.echo("Error: --transport must be pooled or httplib2.", err=True)
+        raise typer.Exit(code=1)
+    config = FakeGmailConfig(messages, page_size, latency, rate_429, rate_5xx)
+    with FakeGmailServer(config) as server:
+        scenarios = _scenarios(server, workers, quota_rate, transport)
+        unknown = set(scenario) - scenarios.keys()
+        if unknown:
+            typer.echo(
+                f"Error: unknown scenario(s) {', '.join(sorted(unknown))}; "
+                f"choose from {', '.join(scenarios)}",
+                err=True,
+            )
+            raise typer.Exit(code=1)
+        results = [
+            _measure(name, server, scenarios[name])
+            for name in (scenario or scenarios)
+        ]
+
+    table = Table(
+        title=f"{messages:,} messages, {latency * 1000:.0f} ms latency, {transport} transport"
+    )
+    columns = (
+        "scenario",
+        "msgs/s",
+        "seconds",
+        "list",
+        "batchDelete",
+        "batch",
+        "errors",
+        "conns",
+        "peak MiB",
+    )
+    for column in columns:
+        table.add_column(column, justify="left" if column == "scenario" else "right")
+    for r in results:
+        table.add_row(
+            r.name,
+            f"{r.rate:,.0f}",
+            f"{r.seconds:.2f}",
+            str(r.list_calls),
+            str(r.delete_calls),
+            str(r.batch_calls),
+            str(r.errors),
+            str(r.connections),
+            f"{r.peak_mib:.1f}",
+        )
+    console.print(table)
+
+
+if __name__ == "__main__":
+    typer.run(main)
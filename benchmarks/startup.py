@@ -0,0 +1,123 @@
+"""CLI startup-time benchmark.
+
+Times fresh interpreter runs of the paths that should stay cheap — importing
+the CLI, --help, and an argument error — and lists any heavy module they
+loaded. Every run is a new process, so nothing is warm but the OS file cache.
+
+    python -m benchmarks.startup --runs 20
+    python -m benchmarks.startup --max-ms 250   # exit 1 if any median is slower
+"""
+
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import typer
+from rich.console import Console
+from rich.table import Table
+
+console = Console()
+
+# Probes import gmail_cleanup from the checkout, not whatever is installed.
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# Top-level packages main.py must not import before arguments are validated.
+HEAVY_MODULES = (
+    "googleapiclient",
+    "google_auth_oauthlib",
+    "google.auth",
+    "httplib2",
+    "requests",
+    "rich",
+    "dateutil",
+)
+
+# Imports the CLI, runs it with argv (unless None), then reports the heavy
+# modules it loaded on the last line of stderr.
+_PROBE = """
+import sys
+from gmail_cleanup.main import app
+argv = {argv!r}
+if argv is not None:
+    try:
+        app(argv)
+    except SystemExit:
+        pass
+loaded = [m for m in {heavy!r} if m in sys.modules]
+print("loaded:" + ",".join(loaded), file=sys.stderr)
+"""
+
+# name -> argv; None means import only.
+CASES = {
+    "import": None,
+    "--help": ["--help"],
+    "argument error": ["--older-than", "3", "--before", "2024-01-01"],
+}
+
+
+def probe(argv: list[str] | None) -> tuple[float, list[str]]:
+    """Run one fresh interpreter; return (seconds, heavy modules it loaded)."""
+    code = _PROBE.format(argv=argv, heavy=HEAVY_MODULES)
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        check=False,
+        cwd=REPO_ROOT,
+    )
+    seconds = time.perf_counter() - start
+    last = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else ""
+    if not last.startswith("loaded:"):
+        raise RuntimeError(f"startup probe failed:\n{result.stderr}")
+    loaded = last.removeprefix("loaded:")
+    return seconds, loaded.split(",") if loaded else []
+
+
+def probe_python() -> float:
+    """Time a bare interpreter start, the floor for every case."""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"], check=True)
+    return time.perf_counter() - start
+
+
+def main(
+    runs: int = typer.Option(10, help="Fresh processes per case.", min=1),
+    max_ms: float | None = typer.Option(
+        None, help="Exit 1 if any case's median exceeds this many milliseconds."
+    ),
+) -> None:
+    """Measure gmail-clean startup time."""
+    baseline = statistics.median(probe_python() for _ in range(runs))
+    table = Table(
+        title=f"Startup, median of {runs} runs (bare interpreter {baseline * 1000:.0f} ms)"
+    )
+    table.add_column("case")
+    table.add_column("median ms", justify="right")
+    table.add_column("min ms", justify="right")
+    table.add_column("heavy modules loaded")
+
+    slow = []
+    for name, argv in CASES.items():
+        samples = []
+        loaded: list[str] = []
+        for _ in range(runs):
+            seconds, loaded = probe(argv)
+            samples.append(seconds)
+        median_ms = statistics.median(samples) * 1000
+        table.add_row(
+            name, f"{median_ms:.0f}", f"{min(samples) * 1000:.0f}", ", ".join(loaded) or "-"
+        )
+        if max_ms is not None and median_ms > max_ms:
+            slow.append(name)
+    console.print(table)
+
+    if slow:
+        typer.echo(f"Error: slower than {max_ms:.0f} ms: {', '.join(slow)}", err=True)
+        raise typer.Exit(code=1)
+
+
+if __name__ == "__main__":
+    typer.run(main)
@@ -0,0 +1,156 @@
+"""Multi-account cleanup — scan and delete several mailboxes at once (--accounts).
+
+The Gmail client is synchronous, so each account's pipeline (the same listing
+and batch_delete code a single-account run uses) runs on its own thread, and
+one asyncio event loop schedules them all and gathers the results. Each
+account gets its own credentials, connection pool and RateLimiter: Gmail's
+250 units/second quota is per user, so accounts never slow each other down
+and a fleet run takes about as long as its slowest mailbox.
+"""
+
+import asyncio
+import time
+from collections.abc import Callable, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+
+from google.auth.exceptions import GoogleAuthError
+from googleapiclient.errors import HttpError
+
+from gmail_cleanup.auth import (
+    AuthenticationRequiredError,
+    get_credentials,
+    service_factory_for,
+)
+from gmail_cleanup.cleaner import batch_delete
+from gmail_cleanup.gmail_client import iter_message_id_pages, iter_sharded_message_id_pages
+from gmail_cleanup.id_store import MessageIdList
+from gmail_cleanup.rate_limit import RateLimiter
+from gmail_cleanup.transport import TransportConfig
+
+# Failures that end one account's run without affecting the others.
+ACCOUNT_ERRORS = (HttpError, OSError, GoogleAuthError, AuthenticationRequiredError)
+
+
+@dataclass
+class AccountRun:
+    """One mailbox in an --accounts run: its quota budget, scan and results."""
+
+    name: str
+    token_path: Path
+    found: int = 0
+    deleted: int = 0
+    scan_seconds: float = 0.0
+    delete_seconds: float = 0.0
+    error: str | None = None
+    rejected: dict[str, int] = field(default_factory=dict, repr=False)  # ID -> HTTP status
+    message_ids: Sequence[str] = field(default_factory=MessageIdList, repr=False)
+    limiter: RateLimiter = field(default_factory=RateLimiter, repr=False)
+    service_factory: Callable[[], object] | None = field(default=None, repr=False)
+
+
+def discover_accounts(directory: Path) -> list[AccountRun]:
+    """Return one AccountRun per *.json token file in directory, sorted by name.
+
+    Each file is a token.json as written by a normal single-account run; the
+    account is named after the file stem.
+    """
+    return [
+        AccountRun(name=path.stem, token_path=path)
+        for path in sorted(directory.glob("*.json"))
+    ]
+
+
+def _scan_account(
+    account: AccountRun,
+    query: str,
+    cutoff: datetime,
+    scan_workers: int,
+    transport: TransportConfig,
+) -> None:
+    start = time.monotonic()
+    try:
+        credentials = get_credentials(account.token_path, interactive=False)
+        account.service_factory = service_factory_for(
+            credentials, transport, account.token_path
+        )
+        if scan_workers > 1:
+            pages = iter_sharded_message_id_pages(
+                account.service_factory,
+                cutoff,
+                workers=scan_workers,
+                limiter=account.limiter,
+            )
+        else:
+            pages = iter_message_id_pages(
+                account.service_factory(), query, account.limiter
+            )
+        ids = MessageIdList()
+        for page in pages:
+            ids.extend(page)
+        account.message_ids = ids
+        account.found = len(ids)
+    except ACCOUNT_ERRORS as exc:
+        account.error = f"scan failed: {exc}"
+    finally:
+        account.scan_seconds = time.monotonic() - start
+
+
+def _delete_account(account: AccountRun, workers: int, trash: bool) -> None:
+    if account.error is not None or not account.message_ids:
+        return
+    assert account.service_factory is not None  # set by a successful scan
+    start = time.monotonic()
+    try:
+        account.deleted = batch_delete(
+            account.service_factory(),
+            account.message_ids,
+            workers=workers,
+            service_factory=account.service_factory,
+            limiter=account.limiter,
+            show_progress=False,
+            trash=trash,
+            on_rejected=account.rejected.update,
+        )
+    except ACCOUNT_ERRORS as exc:
+        account.error = f"delete failed: {exc}"
+    finally:
+        account.delete_seconds = time.monotonic() - start
+
+
+async def _gather(accounts: list[AccountRun], work: Callable[[AccountRun], None]) -> None:
+    # One thread per account so every mailbox makes progress at once; the
+    # default executor is capped at a few dozen threads.
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(
+        max_workers=max(1, len(accounts)), thread_name_prefix="gmail-account"
+    ) as pool:
+        await asyncio.gather(
+            *(loop.run_in_executor(pool, work, account) for account in accounts)
+        )
+
+
+def scan_accounts(
+    accounts: list[AccountRun],
+    query: str,
+    cutoff: datetime,
+    scan_workers: int = 1,
+    transport: TransportConfig | None = None,
+) -> None:
+    """Scan every account concurrently, filling in found, message_ids or error."""
+    transport = transport or TransportConfig()
+    asyncio.run(
+        _gather(
+            accounts,
+            lambda account: _scan_account(account, query, cutoff, scan_workers, transport),
+        )
+    )
+
+
+def delete_accounts(accounts: list[AccountRun], workers: int = 1, trash: bool = False) -> None:
+    """Delete (or trash) every successfully scanned account's messages concurrently."""
+    asyncio.run(
+        _gather(accounts, lambda account: _delete_account(account, workers, trash))
+    )
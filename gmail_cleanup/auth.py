@@ -1,11 +1,21 @@
 """Gmail OAuth authentication with token caching."""
 
+import datetime
+import functools
+import json
+import os
+import tempfile
+import threading
+from collections.abc import Callable
 from pathlib import Path
 
+from google.auth.exceptions import GoogleAuthError
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+
+from gmail_cleanup.transport import PooledHttp, TransportConfig
 
 # https://mail.google.com/ is required for batchDelete.
 # Do NOT use gmail.modify — it returns HTTP 403 on batchDelete.
@@ -22,29 +32,168 @@ TOKEN_PATH = Path.home() / ".config" / "gmail-clean" / "token.json"
 # Do NOT use os.getcwd() — it breaks when tool is invoked from another directory.
 CREDENTIALS_PATH = Path(__file__).parent.parent / "credentials.json"
 
+# Access tokens are refreshed this long before they expire. It must exceed
+# google-auth's own 3m45s threshold, so neither the session nor batch requests
+# ever see an invalid token and refresh it on their own.
+REFRESH_MARGIN = datetime.timedelta(minutes=5)
+
+# Wait before the background thread retries a failed refresh.
+REFRESH_RETRY_SECONDS = 30.0
+
+# One pooled transport per process, shared by every service object (see
+# build_gmail_service). Guarded by _http_lock; replaced by configure_transport.
+# The credential manager outlives transport changes.
+_transport_config = TransportConfig()
+_shared_http: PooledHttp | None = None
+_shared_manager: "CredentialManager | None" = None
+_http_lock = threading.Lock()
+
+
+class AuthenticationRequiredError(Exception):
+    """A token file cannot be used without the interactive browser flow."""
+
+
+def save_token(creds: Credentials, token_path: Path) -> None:
+    """Write creds to token_path atomically, readable by the owner only.
+
+    The JSON goes to a uniquely named file in the same directory that is then
+    renamed over token_path, so concurrent invocations (cron overlapping a
+    manual run) never leave a half-written token behind.
+    """
+    token_path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=token_path.parent, prefix=f".{token_path.name}.")
+    try:
+        with os.fdopen(fd, "w") as file:
+            file.write(creds.to_json())
+        os.chmod(tmp, 0o600)
+        os.replace(tmp, token_path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+class CredentialManager:
+    """Keeps one account's access token fresh for every thread that uses it.
+
+    A background thread (start) refreshes the token REFRESH_MARGIN before it
+    expires and saves it to token_path, so long runs never hit an expired
+    token mid-flight. token() covers the cases the thread misses (the machine
+    slept, a refresh failed): the first caller to see a stale token refreshes
+    it under a lock while the others wait and reuse the result.
+    """
+
+    def __init__(
+        self,
+        credentials: Credentials,
+        token_path: Path | None = None,
+        margin: datetime.timedelta = REFRESH_MARGIN,
+    ) -> None:
+        self.credentials = credentials
+        self.token_path = token_path or TOKEN_PATH
+        self.margin = margin
+        self.refreshes = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def _needs_refresh(self) -> bool:
+        creds = self.credentials
+        if not creds.token:
+            return True
+        if creds.expiry is None:
+            return False
+        # google-auth keeps expiry as a naive UTC datetime.
+        now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        return creds.expiry - self.margin <= now
+
+    def _refresh_locked(self) -> None:
+        self.credentials.refresh(Request())
+        self.refreshes += 1
+        save_token(self.credentials, self.token_path)
+
+    def token(self) -> str:
+        """Return a current access token, refreshing it first if it is about to expire."""
+        if self._needs_refresh():
+            with self._lock:
+                if self._needs_refresh():  # another thread may have just refreshed
+                    self._refresh_locked()
+        return self.credentials.token
+
+    def refresh(self, stale_token: str | None = None) -> None:
+        """Force a refresh, e.g. after a 401.
+
+        With stale_token, nothing happens if the token has already changed
+        since that caller read it: many requests failing together cost one
+        refresh, not one each.
+        """
+        with self._lock:
+            if stale_token is None or self.credentials.token == stale_token:
+                self._refresh_locked()
+
+    def _seconds_until_refresh(self) -> float | None:
+        expiry = self.credentials.expiry
+        if expiry is None:
+            return None
+        now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        return max(0.0, (expiry - self.margin - now).total_seconds())
 
-def get_credentials() -> Credentials:
+    def _run(self) -> None:
+        while not self._stop.wait(self._seconds_until_refresh()):
+            try:
+                self.token()
+            except (GoogleAuthError, OSError):
+                # Left for token() to raise on the next request if it persists.
+                if self._stop.wait(REFRESH_RETRY_SECONDS):
+                    return
+
+    def start(self) -> "CredentialManager":
+        """Start the background refresh thread (a daemon; stop() ends it early)."""
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="gmail-token-refresh", daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+def get_credentials(token_path: Path | None = None, interactive: bool = True) -> Credentials:
     """Load cached credentials or trigger OAuth browser flow.
 
-    First run: opens browser, user grants consent, token saved to TOKEN_PATH.
-    Subsequent runs: loads token from TOKEN_PATH, refreshes silently if expired.
+    First run: opens browser, user grants consent, token saved to token_path
+    (default TOKEN_PATH). Subsequent runs: loads the token, refreshes silently
+    if expired. With interactive=False, a missing or unrefreshable token raises
+    AuthenticationRequiredError instead of opening a browser.
 
     NOTE: If SCOPES is ever changed, delete TOKEN_PATH and re-authenticate.
     The cached token scope is not re-validated at load time.
     """
+    token_path = token_path or TOKEN_PATH
     creds = None
 
-    if TOKEN_PATH.exists():
-        creds = Credentials.from_authorized_user_file(str(TOKEN_PATH), SCOPES)
+    if token_path.exists():
+        creds = Credentials.from_authorized_user_file(str(token_path), SCOPES)
 
     if not creds or not creds.valid:
         if creds and creds.expired and creds.refresh_token:
             # Silent refresh — no browser needed
             creds.refresh(Request())
+        elif not interactive:
+            raise AuthenticationRequiredError(
+                f"{token_path} has no usable token; authenticate it with a normal run first"
+            )
         else:
             # First run: open browser for user consent
             print("Opening browser for Gmail authentication...")
             print("If the browser does not open automatically, visit the URL shown below.")
+            # Only needed on first run; deferred to keep startup light.
+            from google_auth_oauthlib.flow import InstalledAppFlow
+
             flow = InstalledAppFlow.from_client_secrets_file(
                 str(CREDENTIALS_PATH), SCOPES
             )
@@ -57,13 +206,60 @@ def get_credentials() -> Credentials:
             print("Authentication successful.")
 
         # Persist token for next run.
-        # Create directory first — ~/.config/gmail-clean/ may not exist.
-        TOKEN_PATH.parent.mkdir(parents=True, exist_ok=True)
-        TOKEN_PATH.write_text(creds.to_json())
+        save_token(creds, token_path)
 
     return creds
 
 
+def configure_transport(config: TransportConfig) -> None:
+    """Set timeouts and pool size for services built after this call."""
+    global _transport_config, _shared_http
+    with _http_lock:
+        if _shared_http is not None:
+            _shared_http.close()
+        _transport_config = config
+        _shared_http = None
+
+
+@functools.cache
+def _discovery_document() -> dict:
+    """Return the bundled Gmail v1 discovery document, parsed once per process.
+
+    build() would re-read and re-parse the ~150 KB static document for every
+    service object; the worker pools build one per thread.
+    """
+    return json.loads(get_static_doc("gmail", "v1"))
+
+
 def build_gmail_service():
-    """Return authenticated Gmail API service object."""
-    return build("gmail", "v1", credentials=get_credentials())
+    """Return authenticated Gmail API service object.
+
+    Every service shares one thread-safe PooledHttp, so the per-thread service
+    objects built by the scan and delete worker pools reuse warm TLS
+    connections instead of each opening their own. Its token is kept fresh by
+    one CredentialManager for the whole process.
+    """
+    global _shared_http, _shared_manager
+    with _http_lock:
+        if _shared_http is None:
+            if _shared_manager is None:
+                _shared_manager = CredentialManager(get_credentials()).start()
+            _shared_http = PooledHttp(_shared_manager, _transport_config)
+        http = _shared_http
+    return build_from_document(_discovery_document(), http=http)
+
+
+def service_factory_for(
+    credentials: Credentials,
+    config: TransportConfig | None = None,
+    token_path: Path | None = None,
+) -> Callable[[], object]:
+    """Return a build_gmail_service-style factory for one account's credentials.
+
+    Services from the factory share their own PooledHttp and CredentialManager,
+    so accounts never share connections or credentials with each other or with
+    build_gmail_service. Refreshed tokens are saved to token_path.
+    """
+    manager = CredentialManager(credentials, token_path).start()
+    http = PooledHttp(manager, config or _transport_config)
+    return lambda: build_from_document(_discovery_document(), http=http)
@@ -1,33 +1,343 @@
-"""Email deletion logic."""
+"""Email deletion logic — permanent batchDelete, or batched messages.trash."""
+import queue
+import threading
 import time
+from collections.abc import Callable, Container, Iterable, Iterator, Sequence
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 
 from googleapiclient.errors import HttpError
-from rich.progress import track
+from rich.progress import Progress, track
 
+from gmail_cleanup.gmail_client import batch_execute
+from gmail_cleanup.rate_limit import (
+    RETRYABLE_STATUSES,
+    RateLimiter,
+    backoff_delay,
+    retry_after_seconds,
+)
 
-def batch_delete(service, message_ids: list[str]) -> int:
-    """Permanently delete messages in 500-ID chunks. Returns count deleted."""
-    if not message_ids:
-        return 0
+# messages.batchDelete accepts at most 1000 IDs; 500 keeps request bodies small.
+CHUNK_SIZE = 500
 
-    chunks = [message_ids[i:i + 500] for i in range(0, len(message_ids), 500)]
-    deleted = 0
+# Permanent failures that one bad ID (malformed, or stale and unknown to
+# Gmail) can cause for a whole chunk. Chunks failing with these are split to
+# isolate the offending IDs; 401/403 and the like still fail the run.
+ISOLATE_STATUSES = {400, 404}
 
-    for chunk in track(chunks, description="Deleting..."):
-        delay = 1
-        while True:
-            try:
+# Sentinel placed on the stream queue once the page iterator is exhausted.
+_DONE = object()
+
+
+def _delete_chunk(service, chunk: list[str], limiter: RateLimiter) -> int:
+    """Delete one chunk, retrying 429/5xx with jittered backoff. Returns len(chunk).
+
+    A 429 throttles the shared limiter, so every worker slows down and waits out
+    Retry-After together; a 5xx only delays this chunk's own retry. Timeouts and
+    dropped connections are retried like a 5xx: batchDelete is idempotent.
+    """
+    attempt = 0
+    while True:
+        limiter.acquire("batchDelete")
+        try:
+            with limiter.metrics.call("batchDelete"):
                 service.users().messages().batchDelete(
                     userId="me", body={"ids": chunk}
                 ).execute()
-                deleted += len(chunk)
-                break
-            except HttpError as exc:
-                status = int(exc.resp.status)
-                if status in {429, 500, 502, 503, 504}:
-                    time.sleep(delay)
-                    delay = min(delay * 2, 32)
-                else:
+            limiter.on_success()
+            return len(chunk)
+        except (HttpError, OSError) as exc:
+            if isinstance(exc, HttpError):
+                status: int | str = int(exc.resp.status)
+                if status not in RETRYABLE_STATUSES:
                     raise
+                delay = retry_after_seconds(exc)
+            else:
+                status, delay = "error", None
+            limiter.metrics.record_retry("batchDelete", status)
+            if delay is None:
+                delay = backoff_delay(attempt)
+            if status == 429:
+                limiter.on_throttle(delay)  # waited out in the next acquire()
+            else:
+                limiter.metrics.record_backoff(delay)
+                time.sleep(delay)
+            attempt += 1
+
+
+def _delete_isolating(
+    service, chunk: list[str], limiter: RateLimiter, rejected: dict[str, int]
+) -> int:
+    """Delete chunk; if Gmail rejects it over a bad ID, bisect to find that ID.
+
+    A chunk failing with an ISOLATE_STATUSES error is split in half and each
+    half retried, recursively, until the failures are single IDs; those are
+    added to rejected (ID -> HTTP status) and everything else is deleted. Each
+    bad ID costs at most about 2 * log2(len(chunk)) extra calls, so a clean
+    chunk costs one call as before. Returns count deleted.
+    """
+    try:
+        return _delete_chunk(service, chunk, limiter)
+    except HttpError as exc:
+        status = int(exc.resp.status)
+        if status not in ISOLATE_STATUSES:
+            raise
+        if len(chunk) == 1:
+            rejected[chunk[0]] = status
+            return 0
+    middle = len(chunk) // 2
+    return _delete_isolating(service, chunk[:middle], limiter, rejected) + _delete_isolating(
+        service, chunk[middle:], limiter, rejected
+    )
+
+
+def _trash_chunk(
+    service, chunk: list[str], limiter: RateLimiter, rejected: dict[str, int]
+) -> int:
+    """Move one chunk to Trash via batch HTTP requests. Returns count trashed.
+
+    batch_execute packs the per-message trash calls 100 to a batch and re-sends
+    only the sub-requests that fail with 429/5xx, for as long as they keep
+    failing, as _delete_chunk does for batchDelete. A 404 means the message is
+    already gone and is not counted; a 400 is added to rejected, since each
+    sub-request already names a single ID. Any other failure is raised.
+    """
+    # Resolve the resource once: each users().messages() call rebuilds every
+    # method from the discovery document, which costs more than the request.
+    messages = service.users().messages()
+    trashed, failures = batch_execute(
+        service,
+        chunk,
+        lambda message_id: messages.trash(userId="me", id=message_id),
+        "trash",
+        limiter,
+    )
+    for message_id, exc in failures.items():
+        status = int(exc.resp.status)
+        if status == 400:
+            rejected[message_id] = status
+        elif status != 404:
+            raise exc
+    return len(trashed)
+
+
+def _delete_chunks(
+    service,
+    chunks: Iterable[tuple[int, list[str]]],
+    total: int | None,
+    workers: int,
+    service_factory: Callable[[], object] | None,
+    limiter: RateLimiter | None,
+    on_chunk_deleted: Callable[[int], None] | None = None,
+    show_progress: bool = True,
+    trash: bool = False,
+    on_rejected: Callable[[dict[str, int]], None] | None = None,
+) -> int:
+    """Delete (or trash) every (index, chunk) pair, sequentially or on a thread pool.
+
+    on_chunk_deleted(index) is called from the calling thread after each chunk
+    succeeds, and on_rejected(ids) first when Gmail rejected some of its IDs.
+    Returns count deleted.
+    """
+    if limiter is None:
+        limiter = RateLimiter()
+    process_chunk = _trash_chunk if trash else _delete_isolating
+
+    def finish_chunk(index: int, rejected: dict[str, int]) -> None:
+        if rejected and on_rejected is not None:
+            on_rejected(rejected)
+        if on_chunk_deleted is not None:
+            on_chunk_deleted(index)
+
+    description = "Trashing..." if trash else "Deleting..."
+
+    if workers <= 1:
+        deleted = 0
+        for index, chunk in track(
+            chunks, total=total, description=description, disable=not show_progress
+        ):
+            rejected: dict[str, int] = {}
+            deleted += process_chunk(service, chunk, limiter, rejected)
+            finish_chunk(index, rejected)
+        return deleted
+
+    if service_factory is None:
+        raise ValueError("workers > 1 requires a service_factory")
+
+    # httplib2 transports are not thread-safe: one service object per worker thread.
+    local = threading.local()
+
+    def work(chunk: list[str]) -> tuple[int, dict[str, int]]:
+        worker_service = getattr(local, "service", None)
+        if worker_service is None:
+            worker_service = local.service = service_factory()
+        rejected: dict[str, int] = {}
+        return process_chunk(worker_service, chunk, limiter, rejected), rejected
 
+    deleted = 0
+    in_flight: dict[Future, int] = {}
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="gmail-delete")
+    try:
+        with Progress(disable=not show_progress) as progress:
+            task = progress.add_task(description, total=total)
+
+            def reap() -> None:
+                nonlocal deleted
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = in_flight.pop(future)
+                    count, rejected = future.result()
+                    deleted += count
+                    finish_chunk(index, rejected)
+                    progress.advance(task)
+
+            # Cap in-flight chunks so a streaming source is not drained eagerly.
+            for index, chunk in chunks:
+                if len(in_flight) >= workers * 2:
+                    reap()
+                in_flight[pool.submit(work, chunk)] = index
+            while in_flight:
+                reap()
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
     return deleted
+
+
+def batch_delete(
+    service,
+    message_ids: Sequence[str],
+    workers: int = 1,
+    service_factory: Callable[[], object] | None = None,
+    limiter: RateLimiter | None = None,
+    skip_chunks: Container[int] = frozenset(),
+    on_chunk_deleted: Callable[[int], None] | None = None,
+    show_progress: bool = True,
+    trash: bool = False,
+    on_rejected: Callable[[dict[str, int]], None] | None = None,
+) -> int:
+    """Permanently delete messages in 500-ID chunks. Returns count deleted.
+
+    With workers > 1, chunks are deleted concurrently on a thread pool; each
+    worker thread builds its own service via service_factory (typically
+    build_gmail_service) and retries its chunks independently. Every call is
+    paced by limiter — pass the one used for listing so both share one quota.
+
+    Chunk i covers message_ids[i * CHUNK_SIZE:(i + 1) * CHUNK_SIZE]. Indexes in
+    skip_chunks are not sent (already deleted by an earlier run), and
+    on_chunk_deleted(i) is called as each chunk completes.
+
+    A chunk Gmail rejects with 400/404 is bisected down to the offending IDs;
+    the rest of it is still deleted and the chunk still counts as complete.
+    on_rejected({id: status}) receives the isolated IDs, which are not
+    included in the returned count.
+
+    show_progress=False suppresses the progress bar, for callers that run
+    several deletions at once (rich allows one live display at a time).
+
+    trash=True moves messages to Trash instead: each chunk is sent as
+    messages.trash sub-requests in batches of 100, and only failed
+    sub-requests are retried. Trash costs 5 quota units per message against
+    batchDelete's 50 per chunk, so it is bound by quota, not round trips.
+    """
+    if not message_ids:
+        return 0
+
+    # Slice each chunk only when it is about to be sent, so a compact
+    # sequence (MessageIdList, IdFile) is never decoded into strings whole.
+    count = -(-len(message_ids) // CHUNK_SIZE)
+    chunks = (
+        (index, message_ids[start:start + CHUNK_SIZE])
+        for index, start in enumerate(range(0, len(message_ids), CHUNK_SIZE))
+        if index not in skip_chunks
+    )
+    return _delete_chunks(
+        service,
+        chunks,
+        count - sum(1 for index in range(count) if index in skip_chunks),
+        workers,
+        service_factory,
+        limiter,
+        on_chunk_deleted,
+        show_progress,
+        trash,
+        on_rejected,
+    )
+
+
+def stream_delete(
+    service,
+    pages: Iterable[list[str]],
+    queue_depth: int = 4,
+    expected: int | None = None,
+    workers: int = 1,
+    service_factory: Callable[[], object] | None = None,
+    limiter: RateLimiter | None = None,
+    trash: bool = False,
+    on_rejected: Callable[[dict[str, int]], None] | None = None,
+) -> int:
+    """Delete IDs from pages while they are still being listed. Returns count deleted.
+
+    A producer thread drains `pages` into a bounded queue; this thread regroups
+    them into CHUNK_SIZE chunks and deletes each one as soon as it is full, so
+    peak memory is about queue_depth pages instead of the whole result set.
+
+    `service` is used only for batchDelete and must NOT be the service object
+    that backs `pages` — httplib2 transports are not thread-safe. Any error
+    raised by the page iterator is re-raised here. `expected` (e.g. a
+    resultSizeEstimate) only sizes the progress bar. workers,
+    service_factory, limiter, trash and on_rejected behave as in batch_delete.
+    """
+    pending: queue.Queue = queue.Queue(maxsize=queue_depth)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        # Poll so the producer notices when the consumer has given up.
+        while not stop.is_set():
+            try:
+                pending.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        try:
+            for page in pages:
+                if not put(page):
+                    return
+        except BaseException as exc:  # surfaced in the consumer thread
+            put(exc)
+            return
+        put(_DONE)
+
+    def chunks() -> Iterator[list[str]]:
+        buffer: list[str] = []
+        while True:
+            item = pending.get()
+            if item is _DONE:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            buffer.extend(item)
+            while len(buffer) >= CHUNK_SIZE:
+                yield buffer[:CHUNK_SIZE]
+                del buffer[:CHUNK_SIZE]
+        if buffer:
+            yield buffer
+
+    total = -(-expected // CHUNK_SIZE) if expected else None
+    producer = threading.Thread(target=produce, name="gmail-list", daemon=True)
+    producer.start()
+    try:
+        return _delete_chunks(
+            service,
+            enumerate(chunks()),
+            total,
+            workers,
+            service_factory,
+            limiter,
+            trash=trash,
+            on_rejected=on_rejected,
+        )
+    finally:
+        stop.set()
+        producer.join()
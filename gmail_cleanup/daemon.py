@@ -0,0 +1,79 @@
+"""Continuous cleanup (--daemon): each tick deletes only mail that aged past the cutoff.
+
+The journal keeps a watermark per target: the cutoff epoch up to which every
+matching message has been deleted. A tick lists only the window between the
+watermark and the new cutoff (build_window_query), deletes it, and then
+advances the watermark. A steady-state tick therefore costs as much as the
+mail that aged past the cutoff since the last tick, not the whole mailbox.
+
+The watermark moves only after a tick's deletion returns. A tick that fails
+or is interrupted is not recorded, so the next tick lists a wider window that
+still contains whatever was left behind.
+"""
+
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from gmail_cleanup.cleaner import batch_delete
+from gmail_cleanup.date_utils import build_gmail_query, build_window_query
+from gmail_cleanup.gmail_client import list_message_ids
+from gmail_cleanup.journal import RunJournal
+from gmail_cleanup.rate_limit import RateLimiter
+
+
+@dataclass
+class TickResult:
+    """What one tick listed and deleted."""
+
+    query: str | None  # None when no mail had aged past the cutoff yet
+    found: int = 0
+    deleted: int = 0
+    rejected: dict[str, int] = field(default_factory=dict)
+
+
+def tick_query(watermark: int | None, cutoff: datetime) -> str | None:
+    """Return the list query for a tick, or None if the window is empty.
+
+    Without a watermark this is the full before:{cutoff} query of a normal run.
+    """
+    if watermark is None:
+        return build_gmail_query(cutoff)
+    before = int(cutoff.timestamp())
+    if watermark >= before:
+        return None
+    return build_window_query(watermark, before)
+
+
+def run_tick(
+    service,
+    journal: RunJournal,
+    target: str,
+    cutoff: datetime,
+    limiter: RateLimiter | None = None,
+    workers: int = 1,
+    service_factory: Callable[[], object] | None = None,
+    trash: bool = False,
+) -> TickResult:
+    """List and delete the messages that aged past cutoff since target's watermark.
+
+    Raises HttpError if listing or deletion fails; the watermark is then left
+    where it was.
+    """
+    result = TickResult(tick_query(journal.load_watermark(target), cutoff))
+    if result.query is None:
+        return result
+    message_ids = list_message_ids(service, result.query, limiter)
+    result.found = len(message_ids)
+    result.deleted = batch_delete(
+        service,
+        message_ids,
+        workers=workers,
+        service_factory=service_factory,
+        limiter=limiter,
+        show_progress=False,
+        trash=trash,
+        on_rejected=result.rejected.update,
+    )
+    journal.save_watermark(target, int(cutoff.timestamp()))
+    return result
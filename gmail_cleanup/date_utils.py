@@ -2,8 +2,6 @@
 
 from datetime import datetime
 
-from dateutil.relativedelta import relativedelta
-
 
 def months_ago_to_cutoff(months: int) -> datetime:
     """Return local-tz-aware datetime exactly N calendar months before now.
@@ -13,6 +11,9 @@ def months_ago_to_cutoff(months: int) -> datetime:
 
     Returns a tz-aware datetime in the local system timezone (not UTC).
     """
+    # Deferred: this module is imported at CLI startup (see main.py).
+    from dateutil.relativedelta import relativedelta
+
     return datetime.now().astimezone() - relativedelta(months=months)
 
 
@@ -38,3 +39,38 @@ def build_gmail_query(cutoff: datetime) -> str:
     eliminates timezone ambiguity present in date-string formats.
     """
     return f"before:{int(cutoff.timestamp())}"
+
+
+# Gmail launched 2004-04-01; almost no mail predates it, so time shards start here.
+# Anything older still falls into the open-ended first window.
+GMAIL_EPOCH = 1080777600
+
+
+def split_epoch_windows(
+    cutoff: datetime, shards: int, floor: int = GMAIL_EPOCH
+) -> list[tuple[int | None, int]]:
+    """Split the range covered by build_gmail_query(cutoff) into time windows.
+
+    Returns (after, before) epoch pairs: an open-ended window (after=None)
+    for everything before `floor`, then `shards` equal windows from `floor` up
+    to the cutoff. Together they cover exactly the same messages as the single
+    before:{cutoff} query.
+    """
+    end = int(cutoff.timestamp())
+    if shards < 1 or end <= floor:
+        return [(None, end)]
+    step = max(1, (end - floor) // shards)
+    bounds = list(range(floor, end, step))[:shards] + [end]
+    return [(None, floor)] + list(zip(bounds[:-1], bounds[1:]))
+
+
+def build_window_query(after: int | None, before: int) -> str:
+    """Build a Gmail query for one epoch window produced by split_epoch_windows.
+
+    Gmail does not document whether after:/before: bounds are inclusive, so the
+    lower bound is widened by one second: adjacent windows may then overlap on a
+    boundary second but can never leave a gap. Callers de-duplicate IDs.
+    """
+    if after is None:
+        return f"before:{before}"
+    return f"after:{after - 1} before:{before}"
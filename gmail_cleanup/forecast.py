@@ -0,0 +1,138 @@
+"""Predicted cost of deleting a scan's result (--plan).
+
+The forecast combines what the dry run already knows: how many messages
+matched, how deletion splits them into requests (CHUNK_SIZE IDs per
+batchDelete, BATCH_LIMIT sub-requests per trash batch), the quota cost of
+each request, and what the scan observed about this connection and account
+(mean request latency and the share of requests that got 429 or 5xx).
+
+A run is limited either by round trips or by quota. With N workers, round
+trips take calls * latency / N seconds. The quota bucket refills at 250 units
+per second after a one-second burst. The predicted wall time is the larger of
+the two, plus the expected backoff sleeps. Worker counts past the point where
+quota becomes the bound only add 429s, which the forecast marks as
+quota-bound.
+"""
+
+import math
+from dataclasses import dataclass
+
+from gmail_cleanup.cleaner import CHUNK_SIZE
+from gmail_cleanup.gmail_client import BATCH_LIMIT
+from gmail_cleanup.metrics import Metrics
+from gmail_cleanup.rate_limit import (
+    DEFAULT_QUOTA_RATE,
+    MAX_BACKOFF,
+    QUOTA_COSTS,
+    RETRYABLE_STATUSES,
+)
+
+# Per-project daily limit on Gmail API quota units, shared by every user of
+# the OAuth client. Source: https://developers.google.com/gmail/api/reference/quota
+DAILY_PROJECT_QUOTA = 1_000_000_000
+
+# Used when the dry run made no timed requests (e.g. --from-ids).
+DEFAULT_LATENCY = 0.5
+
+# Worker counts shown by default; the run's own --workers is added to them.
+FORECAST_WORKERS = (1, 2, 4, 8, 16)
+
+# Retry attempts summed when estimating backoff; later terms are negligible.
+_MAX_ATTEMPTS = 10
+
+
+@dataclass(frozen=True)
+class ScanObservation:
+    """Request latency and error rate seen while scanning."""
+
+    requests: int
+    latency: float | None  # mean seconds per request; None if nothing was timed
+    retry_rate: float  # share of requests answered with a retryable status
+
+    @classmethod
+    def from_metrics(cls, metrics: Metrics) -> "ScanObservation":
+        data = metrics.to_dict()
+        requests = sum(h["count"] for h in data["latency_seconds"].values())
+        seconds = sum(h["sum"] for h in data["latency_seconds"].values())
+        retryable = sum(
+            count
+            for by_status in data["requests"].values()
+            for status, count in by_status.items()
+            if status.isdigit() and int(status) in RETRYABLE_STATUSES
+        )
+        return cls(
+            requests=requests,
+            latency=seconds / requests if requests else None,
+            retry_rate=retryable / requests if requests else 0.0,
+        )
+
+
+@dataclass(frozen=True)
+class DeleteForecast:
+    """Predicted requests, quota and wall time for one worker count."""
+
+    workers: int
+    calls: int  # batchDelete calls, or trash batch requests
+    retries: int  # extra attempts expected at the observed error rate
+    quota_units: int
+    seconds: float  # predicted wall time, including backoff
+    backoff_seconds: float  # part of seconds spent sleeping before retries
+    quota_bound: bool  # quota, not round trips, sets the pace
+
+    @property
+    def daily_quota_share(self) -> float:
+        """Fraction of the project's daily quota the run would use."""
+        return self.quota_units / DAILY_PROJECT_QUOTA
+
+
+def expected_backoff(retry_rate: float) -> float:
+    """Return the expected seconds of backoff per call at retry_rate.
+
+    Retry k (0-based) happens with probability retry_rate ** (k + 1) and sleeps
+    on average half of min(MAX_BACKOFF, 2 ** k), matching backoff_delay().
+    """
+    return sum(
+        retry_rate ** (attempt + 1) * min(MAX_BACKOFF, 2.0 ** attempt) / 2
+        for attempt in range(_MAX_ATTEMPTS)
+    )
+
+
+def forecast_delete(
+    count: int,
+    workers: int,
+    latency: float,
+    retry_rate: float = 0.0,
+    trash: bool = False,
+    quota_rate: float = DEFAULT_QUOTA_RATE,
+) -> DeleteForecast:
+    """Predict deleting count messages with workers concurrent workers.
+
+    latency is the mean seconds per request; retry_rate the expected share of
+    attempts that fail with a retryable status and are sent again.
+    """
+    # Attempts until success follow a geometric distribution, so each request
+    # is sent retry_rate / (1 - retry_rate) extra times on average.
+    resend = min(retry_rate, 0.9) / (1 - min(retry_rate, 0.9))
+    if trash:
+        # Only the failed sub-requests of a batch are sent again.
+        calls = math.ceil(count / BATCH_LIMIT)
+        resent = math.ceil(count * resend)
+        retries = math.ceil(resent / BATCH_LIMIT)
+        units = QUOTA_COSTS["trash"] * (count + resent)
+    else:
+        calls = math.ceil(count / CHUNK_SIZE)
+        retries = math.ceil(calls * resend)
+        units = QUOTA_COSTS["batchDelete"] * (calls + retries)
+    attempts = calls + retries
+    backoff = calls * expected_backoff(min(retry_rate, 0.9)) / workers
+    round_trips = attempts * latency / workers
+    quota = max(0.0, units - quota_rate) / quota_rate
+    return DeleteForecast(
+        workers=workers,
+        calls=calls,
+        retries=retries,
+        quota_units=units,
+        seconds=max(round_trips, quota) + backoff,
+        backoff_seconds=backoff,
+        quota_bound=quota > round_trips,
+    )
@@ -1,30 +1,542 @@
 """Gmail API operations — message discovery in Phase 3, deletion in Phase 4."""
 
+import math
+import queue
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from datetime import datetime
+
 from googleapiclient.errors import HttpError  # noqa: F401 — re-exported for callers
 
+from gmail_cleanup.date_utils import (
+    build_gmail_query,
+    build_window_query,
+    split_epoch_windows,
+)
+from gmail_cleanup.id_store import MessageIdSet
+from gmail_cleanup.rate_limit import (
+    RETRYABLE_STATUSES,
+    RateLimiter,
+    RetryBudget,
+    backoff_delay,
+    execute_paced,
+    execute_retrying,
+    retry_after_seconds,
+)
+
+# messages.list hard maximum — larger values are silently clamped by the API.
+PAGE_SIZE = 500
+
+# A window whose resultSizeEstimate exceeds this is split in half before listing.
+SHARD_TARGET = 10_000
+
+# Windows are never split below one day — narrower shards only add requests.
+MIN_SHARD_SECONDS = 86_400
+
+# An estimated count's margin is at least this share of its estimated part,
+# since two estimates can agree by chance and still both be off.
+MIN_MARGIN_SHARE = 0.05
+
+# Partial-response masks: ask only for what each caller reads.
+# Full list pages also carry threadId for every message, roughly doubling them.
+LIST_FIELDS = "messages(id),nextPageToken"
+SHARD_FIELDS = "messages(id),nextPageToken,resultSizeEstimate"
+ESTIMATE_FIELDS = "resultSizeEstimate"
+HISTORY_FIELDS = (
+    "history(messagesAdded/message(id,labelIds),messagesDeleted/message/id,"
+    "labelsAdded(labelIds,message(id,labelIds)),labelsRemoved(labelIds,message(id,labelIds))),"
+    "nextPageToken,historyId"
+)
+
+# Labels that hide a message from messages.list (and so from every scan).
+HIDDEN_LABELS = frozenset({"SPAM", "TRASH"})
+
+# Gmail batch HTTP endpoint limit — at most 100 sub-requests per batch.
+BATCH_LIMIT = 100
+
+# Sentinel placed on the shard output queue once every window is listed.
+_DONE = object()
+
+
+class HistoryExpiredError(Exception):
+    """The stored startHistoryId is older than Gmail keeps history for."""
+
+
+@dataclass
+class TransferStats:
+    """Response payload sizes for list pages, shared across listing threads.
+
+    The transport decodes gzip before the client library sees the response and
+    rewrites content-length, so the compressed wire size is not observable
+    here. Instead this records decoded JSON bytes (what a fields mask shrinks,
+    and what gets parsed) and how many responses arrived gzip-encoded.
+    """
+
+    pages: int = 0
+    payload_bytes: int = 0
+    gzip_pages: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record(self, payload_bytes: int, gzipped: bool) -> None:
+        with self._lock:
+            self.pages += 1
+            self.payload_bytes += payload_bytes
+            self.gzip_pages += gzipped
+
+    @property
+    def bytes_per_page(self) -> float:
+        return self.payload_bytes / self.pages if self.pages else 0.0
+
+
+def track_transfer(request, stats: TransferStats | None):
+    """Wrap request.postproc so the response size is recorded into stats."""
+    if stats is None:
+        return request
+    postproc = request.postproc
+
+    def measure(resp, content):
+        stats.record(len(content), resp.get("-content-encoding") == "gzip")
+        return postproc(resp, content)
+
+    request.postproc = measure
+    return request
 
-def list_message_ids(service, query: str) -> list[str]:
+
+def iter_message_id_pages(
+    service,
+    query: str,
+    limiter: RateLimiter | None = None,
+    stats: TransferStats | None = None,
+    budget: RetryBudget | None = None,
+) -> Iterator[list[str]]:
+    """Yield matching message IDs one page at a time.
+
+    Follows nextPageToken with maxResults=PAGE_SIZE, so callers can start
+    working on the first page while later pages are still being fetched.
+    Only one page is held in memory at a time. A page that fails with 429,
+    5xx or a network error is requested again with the same page token (see
+    execute_retrying). Raises HttpError or OSError once budget is spent.
+
+    Args:
+        service: Authenticated Gmail API service object from build_gmail_service().
+        query: Gmail search query string (e.g. "before:2024/01/01").
+        limiter: Optional shared RateLimiter that paces each list call.
+        stats: Optional TransferStats that records each page's payload size.
+        budget: RetryBudget shared by the scan; a default one if omitted.
+
+    Yields:
+        List of message ID strings for each page (empty pages are skipped).
+    """
+    if budget is None:
+        budget = RetryBudget()
+    page_token = None
+    while True:
+        kwargs: dict = {
+            "userId": "me",
+            "q": query,
+            "maxResults": PAGE_SIZE,
+            "fields": LIST_FIELDS,
+        }
+        if page_token:
+            kwargs["pageToken"] = page_token
+        result = execute_retrying(
+            track_transfer(service.users().messages().list(**kwargs), stats),
+            "list",
+            limiter,
+            budget,
+        )
+        ids = [m["id"] for m in result.get("messages", [])]
+        if ids:
+            yield ids
+        page_token = result.get("nextPageToken")
+        if not page_token:
+            break
+
+
+def list_message_ids(
+    service,
+    query: str,
+    limiter: RateLimiter | None = None,
+    stats: TransferStats | None = None,
+    budget: RetryBudget | None = None,
+) -> list[str]:
     """Return all message IDs matching query via paginated API calls.
 
     Uses nextPageToken loop with maxResults=500 per page. Returns every
-    matching message ID — no silent truncation. Raises HttpError on API failure.
+    matching message ID — no silent truncation. Transient failures are retried
+    as in iter_message_id_pages. Raises HttpError on API failure.
 
     Args:
         service: Authenticated Gmail API service object from build_gmail_service().
         query: Gmail search query string (e.g. "before:2024/01/01").
+        limiter: Optional shared RateLimiter that paces each list call.
+        stats: Optional TransferStats that records each page's payload size.
+        budget: RetryBudget for the scan; a default one if omitted.
 
     Returns:
         Flat list of all matching message ID strings.
     """
     ids: list[str] = []
-    page_token = None
-    while True:
-        kwargs: dict = {"userId": "me", "q": query, "maxResults": 500}
-        if page_token:
+    for page in iter_message_id_pages(service, query, limiter, stats, budget):
+        ids.extend(page)
+    return ids
+
+
+def estimate_message_count(
+    service, query: str, limiter: RateLimiter | None = None
+) -> int:
+    """Return Gmail's resultSizeEstimate for query from a single list call.
+
+    The estimate is approximate (Gmail may over- or under-count), but costs one
+    request instead of a full crawl. Raises HttpError on API failure.
+    """
+    result = execute_paced(
+        service.users().messages().list(
+            userId="me", q=query, maxResults=1, fields=ESTIMATE_FIELDS
+        ),
+        "list",
+        limiter,
+    )
+    return int(result.get("resultSizeEstimate", 0))
+
+
+@dataclass
+class CountEstimate:
+    """Match count: exact, or approximate as count ± margin."""
+
+    count: int
+    margin: int  # 0 when exact; at least 1 otherwise
+    requests: int
+    exact: bool = False
+
+
+def estimate_with_margin(
+    service, cutoff: datetime, samples: int = 4, limiter: RateLimiter | None = None
+) -> CountEstimate:
+    """Size build_gmail_query(cutoff) from a handful of requests instead of a crawl.
+
+    Takes Gmail's resultSizeEstimate for the whole range, then samples it as
+    `samples` epoch windows (split_epoch_windows). A window whose first page
+    has no nextPageToken is counted exactly; the others contribute their
+    resultSizeEstimate. The margin is the disagreement between the whole-range
+    estimate and the summed window estimates, applied only to the windows that
+    could not be counted exactly, and never less than MIN_MARGIN_SHARE of
+    them. Raises HttpError on API failure.
+    """
+    whole = estimate_message_count(service, build_gmail_query(cutoff), limiter)
+    requests = 1
+    exact = estimated = 0
+    messages = service.users().messages()
+    for after, before in split_epoch_windows(cutoff, samples):
+        result = execute_paced(
+            messages.list(
+                userId="me",
+                q=build_window_query(after, before),
+                maxResults=PAGE_SIZE,
+                fields=SHARD_FIELDS,
+            ),
+            "list",
+            limiter,
+        )
+        requests += 1
+        if result.get("nextPageToken"):
+            estimated += int(result.get("resultSizeEstimate", 0))
+        else:
+            exact += len(result.get("messages", []))
+    if not estimated:
+        return CountEstimate(exact, 0, requests, exact=True)
+    # Whole-range estimate minus what was counted exactly = its view of the rest.
+    margin = max(abs((whole - exact) - estimated), math.ceil(estimated * MIN_MARGIN_SHARE))
+    return CountEstimate(exact + estimated, margin, requests)
+
+
+def iter_sharded_message_id_pages(
+    service_factory: Callable[[], object],
+    cutoff: datetime,
+    workers: int = 4,
+    limiter: RateLimiter | None = None,
+    shard_target: int = SHARD_TARGET,
+    stats: TransferStats | None = None,
+    budget: RetryBudget | None = None,
+) -> Iterator[list[str]]:
+    """Yield de-duplicated ID pages for build_gmail_query(cutoff), listed in parallel.
+
+    The before: range is split into epoch windows (see split_epoch_windows) that
+    are paged through concurrently on `workers` threads, each with its own
+    service from service_factory. A window whose first page reports a
+    resultSizeEstimate above shard_target is halved and both halves are
+    rescheduled, so a dense period fans out across workers instead of being
+    paged sequentially. Pages are yielded as soon as any window produces them;
+    an ID seen in an earlier page is dropped. stats, if given, records every
+    page's payload size. Transient failures are retried from the same page
+    token; all windows draw on one budget. Raises HttpError or OSError once it
+    is spent.
+    """
+    if budget is None:
+        budget = RetryBudget()
+    out: queue.Queue = queue.Queue(maxsize=workers * 2)
+    stop = threading.Event()
+    local = threading.local()
+
+    def put(item) -> bool:
+        # Poll so workers notice when the consumer has stopped iterating.
+        while not stop.is_set():
+            try:
+                out.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def list_window(after: int | None, before: int) -> list[tuple[int | None, int]]:
+        """Page through one window, or return its two halves if it is too dense."""
+        service = getattr(local, "service", None)
+        if service is None:
+            service = local.service = service_factory()
+        messages = service.users().messages()
+        kwargs: dict = {
+            "userId": "me",
+            "q": build_window_query(after, before),
+            "maxResults": PAGE_SIZE,
+            "fields": SHARD_FIELDS,
+        }
+        result = execute_retrying(
+            track_transfer(messages.list(**kwargs), stats), "list", limiter, budget
+        )
+        if (
+            after is not None
+            and int(result.get("resultSizeEstimate", 0)) > shard_target
+            and before - after >= 2 * MIN_SHARD_SECONDS
+        ):
+            middle = (after + before) // 2
+            return [(after, middle), (middle, before)]
+        while True:
+            ids = [m["id"] for m in result.get("messages", [])]
+            if ids and not put(ids):
+                return []
+            page_token = result.get("nextPageToken")
+            if not page_token or stop.is_set():
+                return []
             kwargs["pageToken"] = page_token
-        result = service.users().messages().list(**kwargs).execute()
-        ids.extend(m["id"] for m in result.get("messages", []))
+            kwargs["fields"] = LIST_FIELDS
+            result = execute_retrying(
+                track_transfer(messages.list(**kwargs), stats), "list", limiter, budget
+            )
+
+    def orchestrate() -> None:
+        pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="gmail-list")
+        try:
+            pending: set[Future] = {
+                pool.submit(list_window, after, before)
+                for after, before in split_epoch_windows(cutoff, workers)
+            }
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    for after, before in future.result():
+                        pending.add(pool.submit(list_window, after, before))
+        except BaseException as exc:  # surfaced in the consumer thread
+            put(exc)
+            return
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+        put(_DONE)
+
+    orchestrator = threading.Thread(target=orchestrate, name="gmail-shards", daemon=True)
+    orchestrator.start()
+    seen = MessageIdSet()
+    try:
+        while True:
+            item = out.get()
+            if item is _DONE:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            fresh = seen.add_new(item)
+            if fresh:
+                yield fresh
+    finally:
+        stop.set()
+        orchestrator.join()
+
+
+def batch_execute(
+    service,
+    keys: Iterable[str],
+    make_request: Callable[[str], object],
+    method: str,
+    limiter: RateLimiter | None = None,
+    max_attempts: int | None = None,
+) -> tuple[dict[str, dict], dict[str, HttpError]]:
+    """Run make_request(key) for every key via Gmail batch HTTP requests.
+
+    Sub-requests are packed BATCH_LIMIT to a batch. Only the sub-requests that
+    fail with a retryable status are re-sent, with jittered backoff; a 429 also
+    throttles limiter. A batch that times out or loses its connection is
+    re-sent whole. Like batchDelete, retries continue until each sub-request
+    succeeds or fails permanently, unless max_attempts caps the rounds; a
+    lost batch still failing then raises its OSError. Each sub-request
+    reserves quota for `method` from limiter.
+
+    Returns:
+        (responses, failures): responses by key, and the final HttpError for
+        each key that failed permanently or ran out of attempts.
+    """
+    responses: dict[str, dict] = {}
+    failures: dict[str, HttpError] = {}
+    pending = list(dict.fromkeys(keys))
+    attempt = 0
+    while pending:
+        retry: dict[str, HttpError | OSError] = {}
+
+        def callback(request_id: str, response: dict, exception: HttpError | None) -> None:
+            if exception is None:
+                responses[request_id] = response
+            elif int(exception.resp.status) in RETRYABLE_STATUSES:
+                retry[request_id] = exception
+            else:
+                failures[request_id] = exception
+
+        for start in range(0, len(pending), BATCH_LIMIT):
+            group = pending[start:start + BATCH_LIMIT]
+            batch = service.new_batch_http_request(callback=callback)
+            for key in group:
+                if limiter is not None:
+                    limiter.acquire(method)
+                batch.add(make_request(key), request_id=key)
+            try:
+                with limiter.metrics.call("batch") if limiter is not None else nullcontext():
+                    batch.execute()
+            except (HttpError, OSError) as exc:
+                # The whole batch was rejected or lost — retry every sub-request in it.
+                if isinstance(exc, HttpError) and int(exc.resp.status) not in RETRYABLE_STATUSES:
+                    raise
+                retry.update((key, exc) for key in group)
+
+        if not retry:
+            break
+        attempt += 1
+        errors = list(retry.values())
+        if max_attempts is not None and attempt >= max_attempts:
+            lost = next((e for e in errors if isinstance(e, OSError)), None)
+            if lost is not None:
+                raise lost
+            failures.update(retry)
+            break
+        statuses = [
+            int(e.resp.status) if isinstance(e, HttpError) else "error" for e in errors
+        ]
+        if limiter is not None:
+            for status in statuses:
+                limiter.metrics.record_retry(method, status)
+        retry_after = (retry_after_seconds(e) for e in errors if isinstance(e, HttpError))
+        delay = max((d or 0.0 for d in retry_after), default=0.0) or backoff_delay(attempt - 1)
+        if limiter is not None and 429 in statuses:
+            limiter.on_throttle(delay)
+        else:
+            if limiter is not None:
+                limiter.metrics.record_backoff(delay)
+            time.sleep(delay)
+        pending = list(retry)
+    return responses, failures
+
+
+def get_history_id(service, limiter: RateLimiter | None = None) -> str:
+    """Return the mailbox's current historyId from users.getProfile."""
+    profile = execute_paced(service.users().getProfile(userId="me"), "getProfile", limiter)
+    return str(profile["historyId"])
+
+
+def list_history_changes(
+    service, start_history_id: str, limiter: RateLimiter | None = None
+) -> tuple[set[str], set[str], str]:
+    """Return messages that entered and left the listable mailbox since start_history_id.
+
+    Pages through users.history.list for message and label changes. Matching
+    messages.list's default of excluding SPAM and TRASH, a message counts as
+    added when it arrives outside them or loses the last of them (restored
+    from Trash), and as deleted when it is deleted or gains one (moved to
+    Trash or Spam, including by --trash). Raises HistoryExpiredError when
+    Gmail no longer has history that far back (HTTP 404), HttpError otherwise.
+
+    Returns:
+        (added, deleted, history_id): ID sets net of each other, and the
+        mailbox historyId the changes bring the caller up to. Restored
+        messages are in added, so callers check their dates like new mail.
+    """
+    added: set[str] = set()
+    deleted: set[str] = set()
+    history_id = start_history_id
+    kwargs: dict = {
+        "userId": "me",
+        "startHistoryId": start_history_id,
+        "historyTypes": ["messageAdded", "messageDeleted", "labelAdded", "labelRemoved"],
+        "maxResults": PAGE_SIZE,
+        "fields": HISTORY_FIELDS,
+    }
+    while True:
+        try:
+            result = execute_paced(service.users().history().list(**kwargs), "history", limiter)
+        except HttpError as exc:
+            if int(exc.resp.status) == 404:
+                raise HistoryExpiredError(start_history_id) from exc
+            raise
+        for record in result.get("history", []):
+            for item in record.get("messagesAdded", []):
+                message = item["message"]
+                if not HIDDEN_LABELS & set(message.get("labelIds", [])):
+                    added.add(message["id"])
+            for item in record.get("labelsRemoved", []):
+                message = item["message"]
+                if HIDDEN_LABELS & set(item.get("labelIds", [])) and not (
+                    HIDDEN_LABELS & set(message.get("labelIds", []))
+                ):
+                    deleted.discard(message["id"])
+                    added.add(message["id"])
+            for item in record.get("labelsAdded", []):
+                if HIDDEN_LABELS & set(item.get("labelIds", [])):
+                    added.discard(item["message"]["id"])
+                    deleted.add(item["message"]["id"])
+            for item in record.get("messagesDeleted", []):
+                message_id = item["message"]["id"]
+                added.discard(message_id)
+                deleted.add(message_id)
+        history_id = str(result.get("historyId", history_id))
         page_token = result.get("nextPageToken")
         if not page_token:
             break
-    return ids
+        kwargs["pageToken"] = page_token
+    return added, deleted, history_id
+
+
+def filter_received_before(
+    service, message_ids: Iterable[str], cutoff: datetime, limiter: RateLimiter | None = None
+) -> set[str]:
+    """Return the subset of message_ids whose internalDate is before cutoff.
+
+    Fetches format=minimal metadata through batch_execute. IDs that no longer
+    exist (HTTP 404) are dropped; any other permanent failure is raised.
+    """
+    messages = service.users().messages()
+    responses, failures = batch_execute(
+        service,
+        message_ids,
+        lambda message_id: messages.get(
+            userId="me", id=message_id, format="minimal", fields="internalDate"
+        ),
+        "get",
+        limiter,
+    )
+    for exc in failures.values():
+        if int(exc.resp.status) != 404:
+            raise exc
+    cutoff_ms = int(cutoff.timestamp()) * 1000
+    return {
+        message_id
+        for message_id, message in responses.items()
+        if int(message.get("internalDate", 0)) < cutoff_ms
+    }
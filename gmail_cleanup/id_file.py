@@ -0,0 +1,184 @@
+"""Scan results on disk (--export-ids / --from-ids), so a scan can be deleted later.
+
+The file is compact and binary:
+
+    magic      b"GMIDS01\\n"
+    length     uint32, little-endian: size of the JSON header
+    header     UTF-8 JSON: query, cutoff (epoch), target, created (ISO 8601 UTC)
+    padding    zero bytes up to a multiple of 8
+    records    one uint64 per message ID, little-endian (see id_store.encode_id)
+
+IdFileWriter appends records as they are written and renames the file into
+place on close(), so an interrupted export never leaves a truncated file at
+the final path. IdFile memory-maps the records and decodes IDs only when they
+are sliced, so batch_delete can read its 500-ID chunks straight from the file
+without the whole result set ever becoming a list.
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from collections.abc import Iterable, Iterator, Sequence
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import overload
+
+from gmail_cleanup.id_store import decode_id, encode_id
+
+MAGIC = b"GMIDS01\n"
+
+# Records are written little-endian whatever the machine, so files move between hosts.
+_SWAP = sys.byteorder != "little"
+
+_LENGTH = struct.Struct("<I")
+_RECORD = struct.Struct("<Q")
+
+
+class IdFileError(Exception):
+    """The file is not an ID export, or it is truncated."""
+
+
+class IdFileWriter:
+    """Streams message IDs into a new ID file; call close() to publish it."""
+
+    def __init__(self, path: Path, query: str, cutoff: int, target: str = "") -> None:
+        self.path = path
+        self.count = 0
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+        self._tmp = Path(tmp)
+        self._file = os.fdopen(fd, "wb")
+        header = json.dumps({
+            "query": query,
+            "cutoff": cutoff,
+            "target": target,
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        }).encode()
+        prefix = MAGIC + _LENGTH.pack(len(header)) + header
+        self._file.write(prefix + b"\0" * (-len(prefix) % 8))
+
+    def write(self, message_ids: Iterable[str]) -> None:
+        """Append message IDs. Raises ValueError for an ID that is not 64-bit hex."""
+        values = array("Q")
+        for message_id in message_ids:
+            value = encode_id(message_id)
+            if value is None:
+                raise ValueError(f"Cannot export non-hex message ID {message_id!r}")
+            values.append(value)
+        if _SWAP:
+            values.byteswap()
+        values.tofile(self._file)
+        self.count += len(values)
+
+    def close(self) -> None:
+        """Flush the file to disk and move it to path."""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        os.replace(self._tmp, self.path)
+
+    def abort(self) -> None:
+        """Discard the partial file."""
+        self._file.close()
+        self._tmp.unlink(missing_ok=True)
+
+    def __enter__(self) -> "IdFileWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class IdFile(Sequence[str]):
+    """Read-only, memory-mapped view of an ID file's records.
+
+    Slicing returns a plain list[str] decoded from just those records, like
+    MessageIdList, so the file can be passed to cleaner.batch_delete as is.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        with path.open("rb") as f:
+            try:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # empty file
+                raise IdFileError(f"{path}: not an ID export file") from None
+        try:
+            self.header = self._read_header(path)
+        except IdFileError:
+            self._mmap.close()
+            raise
+        self._records = memoryview(self._mmap)[self._offset:]
+
+    def _read_header(self, path: Path) -> dict:
+        start = len(MAGIC) + _LENGTH.size
+        if self._mmap[:len(MAGIC)] != MAGIC or len(self._mmap) < start:
+            raise IdFileError(f"{path}: not an ID export file")
+        (length,) = _LENGTH.unpack(self._mmap[len(MAGIC):start])
+        end = start + length
+        self._offset = end + (-end % 8)
+        if len(self._mmap) < self._offset or (len(self._mmap) - self._offset) % 8:
+            raise IdFileError(f"{path}: file is truncated")
+        try:
+            header = json.loads(self._mmap[start:end])
+        except ValueError:
+            raise IdFileError(f"{path}: header is not valid JSON") from None
+        if not (
+            isinstance(header, dict)
+            and isinstance(header.get("query"), str)
+            and type(header.get("cutoff")) is int
+            and isinstance(header.get("created"), str)
+        ):
+            raise IdFileError(f"{path}: header lacks query, cutoff or created")
+        return header
+
+    @property
+    def query(self) -> str:
+        return self.header["query"]
+
+    @property
+    def cutoff(self) -> int:
+        return self.header["cutoff"]
+
+    def close(self) -> None:
+        self._records.release()
+        self._mmap.close()
+
+    def __len__(self) -> int:
+        return len(self._records) // _RECORD.size
+
+    @overload
+    def __getitem__(self, index: int) -> str: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[str]: ...
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            values = array("Q")
+            values.frombytes(self._records[start * _RECORD.size:max(start, stop) * _RECORD.size])
+            if _SWAP:
+                values.byteswap()
+            return [decode_id(value) for value in values]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("IdFile index out of range")
+        return decode_id(_RECORD.unpack_from(self._records, index * _RECORD.size)[0])
+
+    def __iter__(self) -> Iterator[str]:
+        for start in range(0, len(self), 4096):
+            yield from self[start:start + 4096]
+
+    def __repr__(self) -> str:
+        return f"IdFile({len(self):,} ids, {self.query!r})"
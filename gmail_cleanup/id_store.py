@@ -0,0 +1,212 @@
+"""Compact containers for Gmail message IDs.
+
+Gmail message IDs are 64-bit integers rendered as lowercase hex strings
+(e.g. "18c5a3f2b1e4d7a9"). A Python str costs 60+ bytes each; these containers
+store them as 8-byte unsigned integers in array('Q') and only turn them back
+into strings when a caller reads them (for example to build a batchDelete body).
+
+Any ID that does not round-trip through int(id, 16) is kept as a plain string
+on the side, so correctness never depends on the ID format.
+"""
+
+from array import array
+from bisect import bisect_left
+from collections.abc import Iterable, Iterator, Sequence
+from typing import overload
+
+# Insert-buffer size that triggers a merge; it also grows to half the sorted array,
+# so the total merge cost stays O(n log n) however many IDs are added.
+_MERGE_MIN = 65_536
+
+
+def encode_id(message_id: str) -> int | None:
+    """Return message_id as an int, or None if it is not canonical 64-bit hex."""
+    try:
+        value = int(message_id, 16)
+    except ValueError:
+        return None
+    # Rejects leading zeros, upper case, "0x"/underscores and >64-bit values.
+    if value >> 64 or format(value, "x") != message_id:
+        return None
+    return value
+
+
+def decode_id(value: int) -> str:
+    """Inverse of encode_id."""
+    return format(value, "x")
+
+
+class MessageIdList(Sequence[str]):
+    """Append-only, ordered list of message IDs backed by array('Q').
+
+    Slicing returns a plain list[str], so the result can be passed directly to
+    cleaner.batch_delete, which builds each chunk's body from a slice.
+    """
+
+    def __init__(self, ids: Iterable[str] = ()) -> None:
+        self._values = array("Q")
+        self._other: dict[int, str] = {}  # position -> non-hex ID
+        self.extend(ids)
+
+    def append(self, message_id: str) -> None:
+        value = encode_id(message_id)
+        if value is None:
+            self._other[len(self._values)] = message_id
+            value = 0
+        self._values.append(value)
+
+    def extend(self, ids: Iterable[str]) -> None:
+        for message_id in ids:
+            self.append(message_id)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def _decode_at(self, index: int) -> str:
+        other = self._other.get(index)
+        return other if other is not None else decode_id(self._values[index])
+
+    @overload
+    def __getitem__(self, index: int) -> str: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[str]: ...
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._decode_at(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("MessageIdList index out of range")
+        return self._decode_at(index)
+
+    def __iter__(self) -> Iterator[str]:
+        if not self._other:
+            return map(decode_id, self._values)
+        return (self._decode_at(i) for i in range(len(self)))
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, (list, tuple, MessageIdList)):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        return f"MessageIdList({len(self):,} ids)"
+
+
+class MessageIdSet:
+    """Set of message IDs backed by a sorted array('Q') plus a small insert buffer.
+
+    New IDs land in a Python set; once it grows past a fraction of the sorted
+    array it is merged in with one linear pass, so inserts stay amortized cheap
+    and membership is a set lookup or a binary search. Iteration is in numeric
+    order (non-hex IDs last).
+    """
+
+    def __init__(self, ids: Iterable[str] = ()) -> None:
+        self._sorted = array("Q")
+        self._recent: set[int] = set()
+        self._other: set[str] = set()
+        self.update(ids)
+
+    def _in_sorted(self, value: int) -> bool:
+        index = bisect_left(self._sorted, value)
+        return index < len(self._sorted) and self._sorted[index] == value
+
+    def _merge(self) -> None:
+        # Splice the sorted buffer into the array: Python work is per buffered
+        # ID, while the runs between insertion points are copied in C.
+        old = self._sorted
+        merged = array("Q")
+        start = 0
+        for value in sorted(self._recent):
+            index = bisect_left(old, value, start)
+            merged.extend(old[start:index])
+            merged.append(value)
+            start = index
+        merged.extend(old[start:])
+        self._sorted = merged
+        self._recent.clear()
+
+    def add(self, message_id: str) -> bool:
+        """Add message_id. Returns True if it was not already present."""
+        return bool(self.add_new((message_id,)))
+
+    def update(self, ids: Iterable[str]) -> None:
+        self.add_new(ids)
+
+    def add_new(self, ids: Iterable[str]) -> list[str]:
+        """Add ids and return the ones that were not already present, in order."""
+        # Hot path for page-at-a-time de-duplication: encode_id and _in_sorted
+        # are inlined to keep per-ID overhead low.
+        fresh: list[str] = []
+        recent = self._recent
+        for message_id in ids:
+            try:
+                value = int(message_id, 16)
+            except ValueError:
+                value = -1
+            if value < 0 or value >> 64 or format(value, "x") != message_id:
+                if message_id not in self._other:
+                    self._other.add(message_id)
+                    fresh.append(message_id)
+                continue
+            if value in recent:
+                continue
+            values = self._sorted
+            index = bisect_left(values, value)
+            if index < len(values) and values[index] == value:
+                continue
+            recent.add(value)
+            fresh.append(message_id)
+            if len(recent) >= max(_MERGE_MIN, len(values) // 2):
+                self._merge()
+        return fresh
+
+    def difference_update(self, ids: Iterable[str]) -> None:
+        """Remove every ID in ids that is present (one pass over the array)."""
+        drop: set[int] = set()
+        for message_id in ids:
+            value = encode_id(message_id)
+            if value is None:
+                self._other.discard(message_id)
+            elif value in self._recent:
+                self._recent.discard(value)
+            elif self._in_sorted(value):
+                drop.add(value)
+        if drop:
+            self._sorted = array("Q", (v for v in self._sorted if v not in drop))
+
+    def __isub__(self, ids: Iterable[str]) -> "MessageIdSet":
+        self.difference_update(ids)
+        return self
+
+    def __contains__(self, message_id: object) -> bool:
+        if not isinstance(message_id, str):
+            return False
+        value = encode_id(message_id)
+        if value is None:
+            return message_id in self._other
+        return value in self._recent or self._in_sorted(value)
+
+    def __len__(self) -> int:
+        return len(self._sorted) + len(self._recent) + len(self._other)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, (set, frozenset, MessageIdSet)):
+            return NotImplemented
+        return len(self) == len(other) and all(i in self for i in other)
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        return f"MessageIdSet({len(self):,} ids)"
+
+    def __iter__(self) -> Iterator[str]:
+        if self._recent:
+            self._merge()
+        yield from map(decode_id, self._sorted)
+        yield from sorted(self._other)
@@ -0,0 +1,242 @@
+"""SQLite run journal — lets an interrupted --execute run resume where it stopped."""
+
+import sqlite3
+import time
+from collections.abc import Iterable
+from dataclasses import dataclass
+from pathlib import Path
+
+from gmail_cleanup.auth import TOKEN_PATH
+from gmail_cleanup.id_store import MessageIdList, MessageIdSet
+
+# Lives next to the cached token so it follows the same XDG location rules.
+JOURNAL_PATH = TOKEN_PATH.with_name("journal.db")
+
+# Scanned IDs are buffered and written in one transaction per this many IDs.
+FLUSH_SIZE = 5000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    target TEXT NOT NULL,
+    query TEXT NOT NULL,
+    cutoff INTEGER NOT NULL,
+    page_token TEXT,
+    scan_complete INTEGER NOT NULL DEFAULT 0,
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS scanned (
+    run_id INTEGER NOT NULL,
+    message_id TEXT NOT NULL,
+    UNIQUE (run_id, message_id)
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    run_id INTEGER NOT NULL,
+    chunk_index INTEGER NOT NULL,
+    PRIMARY KEY (run_id, chunk_index)
+);
+CREATE TABLE IF NOT EXISTS snapshot (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    history_id TEXT NOT NULL,
+    cutoff INTEGER NOT NULL,
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS snapshot_ids (
+    message_id TEXT PRIMARY KEY
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS watermarks (
+    target TEXT PRIMARY KEY,
+    cutoff INTEGER NOT NULL,
+    updated REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+@dataclass
+class ScanSnapshot:
+    """The mailbox historyId at which a before:{cutoff} scan was taken."""
+
+    history_id: str
+    cutoff: int
+
+
+@dataclass
+class JournalRun:
+    """One journaled run: the query it scanned and how far the scan got."""
+
+    id: int
+    target: str
+    query: str
+    cutoff: int
+    page_token: str | None
+    scan_complete: bool
+
+
+class RunJournal:
+    """Records scanned IDs and completed deletion chunks for resumable runs.
+
+    A run is keyed by its CLI target (e.g. "older-than:12"), not by its query:
+    --older-than produces a new cutoff every second, so resuming must reuse the
+    query stored by the interrupted run. Not thread-safe — call from the main
+    thread only.
+    """
+
+    def __init__(self, path: Path | None = None) -> None:
+        path = path or JOURNAL_PATH
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path))
+        # WAL + NORMAL: durable across process crashes, cheap per commit.
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._pending: list[str] = []
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def find_unfinished(self, target: str) -> JournalRun | None:
+        """Return the most recent run for target that has not been finished."""
+        row = self._conn.execute(
+            "SELECT id, target, query, cutoff, page_token, scan_complete FROM runs "
+            "WHERE target = ? ORDER BY id DESC LIMIT 1",
+            (target,),
+        ).fetchone()
+        if row is None:
+            return None
+        return JournalRun(*row[:5], scan_complete=bool(row[5]))
+
+    def start(self, target: str, query: str, cutoff: int) -> JournalRun:
+        """Begin a fresh run for target, discarding any earlier one."""
+        with self._conn:
+            for (run_id,) in self._conn.execute(
+                "SELECT id FROM runs WHERE target = ?", (target,)
+            ).fetchall():
+                self._delete_run(run_id)
+            cursor = self._conn.execute(
+                "INSERT INTO runs (target, query, cutoff, created) VALUES (?, ?, ?, ?)",
+                (target, query, cutoff, time.time()),
+            )
+        return JournalRun(cursor.lastrowid, target, query, cutoff, None, False)
+
+    def record_page(
+        self, run: JournalRun, ids: Iterable[str], next_page_token: str | None = None
+    ) -> None:
+        """Buffer one page of scanned IDs; flush once FLUSH_SIZE IDs are pending.
+
+        next_page_token is stored only together with a flush, so a resumed scan
+        never skips IDs that were buffered but not yet written.
+        """
+        self._pending.extend(ids)
+        if len(self._pending) >= FLUSH_SIZE:
+            self.flush(run, next_page_token)
+
+    def flush(self, run: JournalRun, next_page_token: str | None = None) -> None:
+        """Write buffered IDs and the scan position in one transaction."""
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO scanned (run_id, message_id) VALUES (?, ?)",
+                ((run.id, message_id) for message_id in self._pending),
+            )
+            if next_page_token is not None:
+                self._conn.execute(
+                    "UPDATE runs SET page_token = ? WHERE id = ?",
+                    (next_page_token, run.id),
+                )
+        self._pending.clear()
+        if next_page_token is not None:
+            run.page_token = next_page_token
+
+    def complete_scan(self, run: JournalRun) -> None:
+        """Flush remaining IDs and mark the scan as finished."""
+        self.flush(run)
+        with self._conn:
+            self._conn.execute(
+                "UPDATE runs SET scan_complete = 1, page_token = NULL WHERE id = ?",
+                (run.id,),
+            )
+        run.scan_complete = True
+        run.page_token = None
+
+    def scanned_ids(self, run: JournalRun) -> MessageIdList:
+        """Return the run's scanned IDs in scan order (stable chunk boundaries)."""
+        return MessageIdList(
+            message_id
+            for (message_id,) in self._conn.execute(
+                "SELECT message_id FROM scanned WHERE run_id = ? ORDER BY rowid",
+                (run.id,),
+            )
+        )
+
+    def mark_chunk_done(self, run: JournalRun, chunk_index: int) -> None:
+        """Record that a deletion chunk succeeded. Committed immediately."""
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO chunks (run_id, chunk_index) VALUES (?, ?)",
+                (run.id, chunk_index),
+            )
+
+    def done_chunks(self, run: JournalRun) -> set[int]:
+        """Return indexes of deletion chunks already completed for run."""
+        return {
+            index
+            for (index,) in self._conn.execute(
+                "SELECT chunk_index FROM chunks WHERE run_id = ?", (run.id,)
+            )
+        }
+
+    def finish(self, run: JournalRun) -> None:
+        """Drop a fully deleted run so the journal does not grow without bound."""
+        with self._conn:
+            self._delete_run(run.id)
+
+    def load_snapshot(self) -> ScanSnapshot | None:
+        """Return the stored scan snapshot, if any (see save_snapshot)."""
+        row = self._conn.execute(
+            "SELECT history_id, cutoff FROM snapshot WHERE id = 1"
+        ).fetchone()
+        return ScanSnapshot(*row) if row else None
+
+    def snapshot_ids(self) -> MessageIdSet:
+        """Return the message IDs of the stored scan snapshot."""
+        return MessageIdSet(
+            message_id
+            for (message_id,) in self._conn.execute("SELECT message_id FROM snapshot_ids")
+        )
+
+    def save_snapshot(self, history_id: str, cutoff: int, ids: Iterable[str]) -> None:
+        """Replace the stored snapshot: every ID matching before:{cutoff} as of history_id.
+
+        Only one snapshot is kept — it can seed any later scan whose cutoff is
+        the same or newer.
+        """
+        with self._conn:
+            self._conn.execute("DELETE FROM snapshot_ids")
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO snapshot_ids (message_id) VALUES (?)",
+                ((message_id,) for message_id in ids),
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO snapshot (id, history_id, cutoff, created) "
+                "VALUES (1, ?, ?, ?)",
+                (history_id, cutoff, time.time()),
+            )
+
+    def load_watermark(self, target: str) -> int | None:
+        """Return the cutoff epoch up to which target's mail has been deleted."""
+        row = self._conn.execute(
+            "SELECT cutoff FROM watermarks WHERE target = ?", (target,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def save_watermark(self, target: str, cutoff: int) -> None:
+        """Record that every message of target before cutoff has been deleted."""
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO watermarks (target, cutoff, updated) VALUES (?, ?, ?)",
+                (target, cutoff, time.time()),
+            )
+
+    def _delete_run(self, run_id: int) -> None:
+        self._conn.execute("DELETE FROM scanned WHERE run_id = ?", (run_id,))
+        self._conn.execute("DELETE FROM chunks WHERE run_id = ?", (run_id,))
+        self._conn.execute("DELETE FROM runs WHERE id = ?", (run_id,))
@@ -1,22 +1,44 @@
-"""Gmail Cleanup CLI — delete old Gmail messages from the command line."""
+"""Gmail Cleanup CLI — delete old Gmail messages from the command line.
 
+Only the standard library and typer are imported at module load. The Gmail
+client, OAuth, rich and the cleanup modules are imported inside the functions
+that use them, so --help and argument errors return without loading them
+(see benchmarks/startup.py and tests/test_startup.py).
+"""
+
+from __future__ import annotations
+
+import functools
 import time
-from typing import Optional
+from collections.abc import Callable, Iterable, Sequence
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
 
 import typer
-from googleapiclient.errors import HttpError
-from rich.console import Console
 
-from gmail_cleanup.auth import build_gmail_service
-from gmail_cleanup.cleaner import batch_delete
 from gmail_cleanup.date_utils import (
     build_gmail_query,
+    build_window_query,
     months_ago_to_cutoff,
     parse_date_to_cutoff,
 )
-from gmail_cleanup.gmail_client import list_message_ids
+from gmail_cleanup.transport import (
+    DEFAULT_CONNECT_TIMEOUT,
+    DEFAULT_POOL_SIZE,
+    DEFAULT_READ_TIMEOUT,
+    TransportConfig,
+)
 
-console = Console()
+if TYPE_CHECKING:
+    from rich.console import Console
+
+    from gmail_cleanup.gmail_client import TransferStats
+    from gmail_cleanup.id_file import IdFile
+    from gmail_cleanup.journal import JournalRun, RunJournal
+    from gmail_cleanup.metrics import Metrics
+    from gmail_cleanup.policy import Plan
+    from gmail_cleanup.rate_limit import RateLimiter
 
 app = typer.Typer(
     name="gmail-clean",
@@ -25,6 +47,729 @@ app = typer.Typer(
 )
 
 
+@functools.cache
+def _console() -> Console:
+    from rich.console import Console
+
+    return Console()
+
+
+def _confirm_or_exit(trash: bool = False) -> None:
+    """Prompt for deletion confirmation; exit cleanly with code 0 on refusal."""
+    # typer.confirm() appends " [y/N]: " automatically — do not include in message
+    try:
+        confirmed = typer.confirm("Move to Trash" if trash else "Delete permanently")
+    except (KeyboardInterrupt, typer.Abort):
+        typer.echo("\nCancelled.")
+        raise typer.Exit(code=0)
+
+    if not confirmed:
+        typer.echo("Deletion cancelled.")
+        raise typer.Exit(code=0)
+
+
+def _deleted_summary(count: int, trash: bool) -> str:
+    """Return the rich markup announcing how many messages were removed."""
+    if trash:
+        return f"[bold green]Moved {count:,} emails to Trash[/bold green]"
+    return f"[bold green]Deleted {count:,} emails[/bold green]"
+
+
+def _print_rejected(rejected: dict[str, int]) -> None:
+    """Warn about IDs Gmail refused (isolated by bisecting their chunks)."""
+    if not rejected:
+        return
+    shown = ", ".join(
+        f"{message_id} ({status})" for message_id, status in list(rejected.items())[:5]
+    )
+    more = f" and {len(rejected) - 5:,} more" if len(rejected) > 5 else ""
+    _console().print(
+        f"[yellow]Skipped {len(rejected):,} emails Gmail rejected:[/yellow] {shown}{more}"
+    )
+
+
+def _run_stream(
+    service,
+    query: str,
+    cutoff: datetime,
+    workers: int,
+    scan_workers: int,
+    limiter: RateLimiter,
+    trash: bool = False,
+) -> None:
+    """--execute --stream path: confirm on an estimate, then delete while listing."""
+    from googleapiclient.errors import HttpError
+
+    from gmail_cleanup.auth import build_gmail_service
+    from gmail_cleanup.cleaner import stream_delete
+    from gmail_cleanup.gmail_client import (
+        estimate_message_count,
+        iter_message_id_pages,
+        iter_sharded_message_id_pages,
+    )
+
+    try:
+        estimate = estimate_message_count(service, query, limiter)
+    except HttpError as exc:
+        typer.echo(f"Error: Failed to estimate result size. {exc}. Try again.", err=True)
+        raise typer.Exit(code=1)
+
+    # The exact count is unknown until the scan finishes — confirm on the estimate.
+    cutoff_display = cutoff.strftime("%Y-%m-%d %H:%M:%S %Z").strip()
+    typer.echo(f"Found about {estimate:,} emails before {cutoff_display} (estimate).")
+    _confirm_or_exit(trash)
+
+    start_time = time.monotonic()
+    rejected: dict[str, int] = {}
+    # Deletion runs on its own service object: the listing thread owns `service`.
+    delete_service = build_gmail_service()
+    if scan_workers > 1:
+        pages = iter_sharded_message_id_pages(
+            build_gmail_service, cutoff, workers=scan_workers, limiter=limiter
+        )
+    else:
+        pages = iter_message_id_pages(service, query, limiter)
+    try:
+        deleted = stream_delete(
+            delete_service,
+            pages,
+            expected=estimate,
+            workers=workers,
+            service_factory=build_gmail_service,
+            limiter=limiter,
+            trash=trash,
+            on_rejected=rejected.update,
+        )
+    except (HttpError, OSError) as exc:
+        typer.echo(f"Error: Streaming deletion failed. {exc}. Try again.", err=True)
+        raise typer.Exit(code=1)
+    elapsed = time.monotonic() - start_time
+    limiter.metrics.record_phase("stream", elapsed, deleted)
+    _console().print(f"{_deleted_summary(deleted, trash)} in [bold]{elapsed:.1f}s[/bold].")
+    _print_rejected(rejected)
+
+
+def _scan(
+    service,
+    query: str,
+    cutoff: datetime,
+    scan_workers: int,
+    limiter: RateLimiter,
+    journal: RunJournal | None = None,
+    run: JournalRun | None = None,
+    stats: TransferStats | None = None,
+    on_page: Callable[[Iterable[str]], None] | None = None,
+) -> Sequence[str]:
+    """Collect every matching message ID while updating the scan spinner.
+
+    With a journal, each page is recorded as it arrives, an interrupted
+    sequential scan continues from the run's saved page token, and the result
+    is read back from the journal so chunk boundaries match across resumes.
+    on_page(ids) also receives each page as it arrives (--export-ids).
+
+    Transient page failures are retried from the last good page token within
+    one RetryBudget. Once it is spent, a journaled sequential scan saves the
+    IDs and page token it has reached, so --resume continues from there.
+    """
+    from googleapiclient.errors import HttpError
+
+    from gmail_cleanup.auth import build_gmail_service
+    from gmail_cleanup.gmail_client import (
+        LIST_FIELDS,
+        iter_sharded_message_id_pages,
+        track_transfer,
+    )
+    from gmail_cleanup.id_store import MessageIdList
+    from gmail_cleanup.rate_limit import RetryBudget, execute_retrying
+
+    if journal is not None and run is not None and run.scan_complete:
+        return journal.scanned_ids(run)
+
+    message_ids = MessageIdList()
+    found = 0
+    budget = RetryBudget()
+
+    def record(page: list[str], next_page_token: str | None = None) -> None:
+        nonlocal found
+        found += len(page)
+        if journal is not None and run is not None:
+            journal.record_page(run, page, next_page_token)
+        else:
+            message_ids.extend(page)
+        if on_page is not None:
+            on_page(page)
+        status.update(f"Scanning... {found:,} emails found")
+
+    with _console().status("Scanning... 0 emails found", spinner="dots") as status:
+        if scan_workers > 1:
+            try:
+                for page in iter_sharded_message_id_pages(
+                    build_gmail_service,
+                    cutoff,
+                    workers=scan_workers,
+                    limiter=limiter,
+                    stats=stats,
+                    budget=budget,
+                ):
+                    record(page)
+            except (HttpError, OSError) as exc:
+                typer.echo(
+                    f"Error: Failed to scan results after {budget.used} retries. {exc}. "
+                    "Try again.",
+                    err=True,
+                )
+                raise typer.Exit(code=1)
+        else:
+            # Inline pagination — main.py drives the loop so it can update the spinner per page
+            page_token = run.page_token if run is not None else None
+            page_num = 0
+            while True:
+                page_num += 1
+                kwargs: dict = {
+                    "userId": "me",
+                    "q": query,
+                    "maxResults": 500,
+                    "fields": LIST_FIELDS,
+                }
+                if page_token:
+                    kwargs["pageToken"] = page_token
+                try:
+                    result = execute_retrying(
+                        track_transfer(service.users().messages().list(**kwargs), stats),
+                        "list",
+                        limiter,
+                        budget,
+                    )
+                except (HttpError, OSError) as exc:
+                    typer.echo(
+                        f"Error: Failed to fetch page {page_num} of results after "
+                        f"{budget.used} retries. {exc}.",
+                        err=True,
+                    )
+                    if journal is not None and run is not None and page_token:
+                        # Everything before page_token is buffered; save both.
+                        journal.flush(run, page_token)
+                        typer.echo(
+                            "Run again with --resume to continue the scan from this page.",
+                            err=True,
+                        )
+                    else:
+                        typer.echo("Try again.", err=True)
+                    raise typer.Exit(code=1)
+                page_token = result.get("nextPageToken")
+                record([m["id"] for m in result.get("messages", [])], page_token)
+                if not page_token:
+                    break
+
+    if journal is not None and run is not None:
+        journal.complete_scan(run)
+        return journal.scanned_ids(run)
+    return message_ids
+
+
+def _policy_scan(
+    service,
+    plan: Plan,
+    limiter: RateLimiter,
+    journal: RunJournal | None = None,
+    run: JournalRun | None = None,
+    stats: TransferStats | None = None,
+    on_page: Callable[[Iterable[str]], None] | None = None,
+) -> tuple[Sequence[str], dict[str, int] | None]:
+    """Collect the IDs of every planned policy query, each message once.
+
+    Returns the IDs and the number of new IDs per rule. A resumed run whose
+    scan had completed reads its IDs back from the journal and has no per-rule
+    counts; an incomplete one is listed again from the start (the journal
+    ignores IDs it already holds).
+    """
+    from googleapiclient.errors import HttpError
+
+    from gmail_cleanup.id_store import MessageIdList
+    from gmail_cleanup.policy import iter_plan_pages
+
+    if journal is not None and run is not None and run.scan_complete:
+        return journal.scanned_ids(run), None
+
+    message_ids = MessageIdList()
+    counts = dict.fromkeys((rule.name for rule in plan.rules), 0)
+    found = 0
+    with _console().status("Scanning... 0 emails found", spinner="dots") as status:
+        try:
+            for rule, page in iter_plan_pages(service, plan, limiter, stats):
+                counts[rule] += len(page)
+                found += len(page)
+                if journal is not None and run is not None:
+                    journal.record_page(run, page)
+                else:
+                    message_ids.extend(page)
+                if on_page is not None:
+                    on_page(page)
+                status.update(f"Scanning... {found:,} emails found ({rule})")
+        except (HttpError, OSError) as exc:
+            typer.echo(f"Error: Failed to scan results. {exc}. Try again.", err=True)
+            raise typer.Exit(code=1)
+
+    if journal is not None and run is not None:
+        journal.complete_scan(run)
+        return journal.scanned_ids(run), counts
+    return message_ids, counts
+
+
+def _print_policy_counts(plan: Plan, counts: dict[str, int]) -> None:
+    """Print one row per policy rule: its cutoff, planned query and new matches."""
+    from rich.table import Table
+
+    queries = {planned.rule: planned.query for planned in plan.queries}
+    table = Table(title="Policy rules")
+    table.add_column("Rule")
+    table.add_column("Before")
+    table.add_column("Query")
+    table.add_column("Emails", justify="right")
+    for rule in plan.rules:
+        if rule.name in plan.covered:
+            query = f"[dim]covered by {plan.covered[rule.name]}[/dim]"
+        else:
+            query = queries[rule.name]
+        table.add_row(
+            rule.name, rule.cutoff.strftime("%Y-%m-%d"), query, f"{counts[rule.name]:,}"
+        )
+    _console().print(table)
+
+
+def _incremental_scan(
+    service,
+    query: str,
+    cutoff: datetime,
+    scan_workers: int,
+    limiter: RateLimiter,
+    journal: RunJournal | None,
+    run: JournalRun | None,
+    stats: TransferStats | None = None,
+    on_page: Callable[[Iterable[str]], None] | None = None,
+) -> Sequence[str]:
+    """Scan via the stored snapshot and users.history.list, or fall back to _scan.
+
+    A snapshot taken at an older or equal cutoff is brought up to date by
+    applying history since its historyId and listing only the window between
+    the two cutoffs. Either way, the result is saved as the new snapshot.
+    """
+    from googleapiclient.errors import HttpError
+
+    from gmail_cleanup.gmail_client import (
+        HistoryExpiredError,
+        filter_received_before,
+        get_history_id,
+        list_history_changes,
+        list_message_ids,
+    )
+    from gmail_cleanup.id_store import MessageIdList
+    from gmail_cleanup.journal import RunJournal
+
+    store = journal if journal is not None else RunJournal()
+    cutoff_epoch = int(cutoff.timestamp())
+    snapshot = store.load_snapshot()
+
+    if snapshot is not None and snapshot.cutoff <= cutoff_epoch:
+        try:
+            with _console().status("Applying mailbox changes since last scan...", spinner="dots"):
+                added, deleted, history_id = list_history_changes(
+                    service, snapshot.history_id, limiter
+                )
+                ids = store.snapshot_ids()
+                if snapshot.cutoff < cutoff_epoch:
+                    # Mail that aged past the cutoff since last time is not in history.
+                    window = build_window_query(snapshot.cutoff, cutoff_epoch)
+                    ids.update(list_message_ids(service, window, limiter, stats))
+                new_ids = [message_id for message_id in added if message_id not in ids]
+                ids.update(filter_received_before(service, new_ids, cutoff, limiter))
+                ids -= deleted
+        except HistoryExpiredError:
+            typer.echo("Mailbox history has expired — running a full scan.")
+        except HttpError as exc:
+            typer.echo(f"Error: Failed to apply mailbox history. {exc}. Try again.", err=True)
+            raise typer.Exit(code=1)
+        else:
+            store.save_snapshot(history_id, cutoff_epoch, ids)
+            if on_page is not None:
+                on_page(ids)
+            if journal is not None and run is not None:
+                journal.record_page(run, ids)
+                journal.complete_scan(run)
+                return journal.scanned_ids(run)
+            return MessageIdList(ids)
+
+    # Take the historyId before scanning so changes made mid-scan are replayed next time.
+    try:
+        history_id = get_history_id(service, limiter)
+    except HttpError as exc:
+        typer.echo(f"Error: Failed to read mailbox history ID. {exc}. Try again.", err=True)
+        raise typer.Exit(code=1)
+    message_ids = _scan(
+        service, query, cutoff, scan_workers, limiter, journal, run, stats, on_page
+    )
+    store.save_snapshot(history_id, cutoff_epoch, message_ids)
+    return message_ids
+
+
+def _run_estimate(
+    service, cutoff: datetime, cutoff_display: str, limiter: RateLimiter
+) -> None:
+    """--estimate path: print a sampled count with its error margin, then exit."""
+    from googleapiclient.errors import HttpError
+
+    from gmail_cleanup.gmail_client import estimate_with_margin
+
+    start_time = time.monotonic()
+    try:
+        with _console().status("Estimating...", spinner="dots"):
+            result = estimate_with_margin(service, cutoff, limiter=limiter)
+    except HttpError as exc:
+        typer.echo(f"Error: Failed to estimate result size. {exc}. Try again.", err=True)
+        raise typer.Exit(code=1)
+    elapsed = time.monotonic() - start_time
+    if result.exact:
+        found = f"{result.count:,} emails[/bold]"
+    else:
+        found = f"about {result.count:,} emails[/bold] (±{result.margin:,})"
+    _console().print(
+        f"[bold]Found {found} before {cutoff_display} "
+        f"[dim]({elapsed:.1f}s, {result.requests} requests, estimate)[/dim]"
+    )
+    typer.echo("Run without --estimate for an exact count, or with --execute to delete permanently.")
+    raise typer.Exit(code=0)
+
+
+def _run_report(service, message_ids: Sequence[str], limiter: RateLimiter) -> None:
+    """--report path: read sender, label and size metadata, then print the top entries."""
+    from googleapiclient.errors import HttpError
+    from rich.progress import Progress
+    from rich.table import Table
+
+    from gmail_cleanup.report import REPORT_TOP, MetadataCache, build_report
+
+    start_time = time.monotonic()
+    cache = MetadataCache()
+    try:
+        with Progress(console=_console(), transient=True) as progress:
+            task = progress.add_task("Reading metadata...", total=len(message_ids))
+            report = build_report(
+                service,
+                message_ids,
+                cache,
+                limiter,
+                on_progress=lambda done: progress.advance(task, done),
+            )
+    except HttpError as exc:
+        typer.echo(f"Error: Failed to fetch message metadata. {exc}. Try again.", err=True)
+        raise typer.Exit(code=1)
+    finally:
+        cache.close()
+    elapsed = time.monotonic() - start_time
+    limiter.metrics.record_phase("report", elapsed, len(message_ids))
+
+    senders = Table(title="Top senders by size")
+    senders.add_column("Sender")
+    senders.add_column("Emails", justify="right")
+    senders.add_column("Size", justify="right")
+    for sender, count, size in report.top_senders(REPORT_TOP):
+        senders.add_row(sender, f"{count:,}", _format_bytes(size))
+    labels = Table(title="Top labels")
+    labels.add_column("Label")
+    labels.add_column("Emails", justify="right")
+    for label, count in report.top_labels(REPORT_TOP):
+        labels.add_row(label, f"{count:,}")
+    _console().print(senders)
+    _console().print(labels)
+    gone = f", {report.missing:,} no longer exist" if report.missing else ""
+    _console().print(
+        f"[bold]{_format_bytes(report.total_bytes)} reclaimable[/bold] "
+        f"[dim]({report.cached:,} from cache, {report.fetched:,} fetched{gone}; "
+        f"{elapsed:.1f}s)[/dim]"
+    )
+
+
+def _print_forecast(count: int, workers: int, metrics: Metrics) -> None:
+    """--plan path: predict requests, quota and wall time for deleting count messages."""
+    from rich.table import Table
+
+    from gmail_cleanup.forecast import (
+        DEFAULT_LATENCY,
+        FORECAST_WORKERS,
+        ScanObservation,
+        forecast_delete,
+    )
+
+    observed = ScanObservation.from_metrics(metrics)
+    if observed.latency is not None:
+        latency = observed.latency
+        basis = (
+            f"{latency * 1000:,.0f} ms per request over {observed.requests:,} scan requests, "
+            f"{observed.retry_rate:.1%} answered 429/5xx"
+        )
+    else:
+        latency = DEFAULT_LATENCY
+        basis = f"no timed scan requests; assuming {latency * 1000:,.0f} ms per request"
+
+    table = Table(title="Deletion forecast")
+    table.add_column("Workers", justify="right")
+    table.add_column("Wall time", justify="right")
+    table.add_column("Backoff", justify="right")
+    table.add_column("Limited by")
+    for count_workers in sorted({*FORECAST_WORKERS, workers}):
+        forecast = forecast_delete(count, count_workers, latency, observed.retry_rate)
+        table.add_row(
+            f"{count_workers}",
+            _format_duration(forecast.seconds),
+            _format_duration(forecast.backoff_seconds),
+            "quota" if forecast.quota_bound else "round trips",
+            style="bold" if count_workers == workers else None,
+        )
+    _console().print(table)
+
+    forecast = forecast_delete(count, workers, latency, observed.retry_rate)
+    trash = forecast_delete(count, workers, latency, observed.retry_rate, trash=True)
+    _console().print(
+        f"[bold]{forecast.calls:,} batchDelete calls[/bold] "
+        f"(+{forecast.retries:,} expected retries), {forecast.quota_units:,} quota units "
+        f"({forecast.daily_quota_share:.4%} of the daily project quota)"
+    )
+    _console().print(
+        f"[dim]With --trash: {trash.calls + trash.retries:,} batch requests, "
+        f"{trash.quota_units:,} quota units, about {_format_duration(trash.seconds)} "
+        f"with {workers} worker{'s' if workers > 1 else ''}.[/dim]"
+    )
+    _console().print(f"[dim]Based on {basis}.[/dim]")
+
+
+def _format_duration(seconds: float) -> str:
+    """Return seconds rounded for display, e.g. "42s", "12m 05s" or "3h 20m"."""
+    seconds = round(seconds)
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}m {seconds % 60:02d}s"
+    return f"{seconds // 3600}h {seconds % 3600 // 60:02d}m"
+
+
+def _format_bytes(size: int) -> str:
+    """Return size with a binary unit, e.g. "12.3 MiB"."""
+    value = float(size)
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if value < 1024 or unit == "GiB":
+            break
+        value /= 1024
+    return f"{size:,} B" if unit == "B" else f"{value:,.1f} {unit}"
+
+
+def _run_daemon(
+    service,
+    older_than: int,
+    workers: int,
+    scan_workers: int,
+    interval: float,
+    limiter: RateLimiter,
+    trash: bool = False,
+    metrics_out: Path | None = None,
+) -> None:
+    """--daemon path: delete what ages past the cutoff every interval seconds.
+
+    Confirmation is asked only when the target has no watermark yet, before the
+    first full scan is deleted. Later ticks, including those of a restarted
+    daemon, run unattended. Metrics are written after every tick.
+    """
+    from googleapiclient.errors import HttpError
+
+    from gmail_cleanup.auth import build_gmail_service
+    from gmail_cleanup.cleaner import batch_delete
+    from gmail_cleanup.daemon import run_tick
+    from gmail_cleanup.journal import RunJournal
+
+    journal = RunJournal()
+    target = _target_key(older_than, None, trash)
+    watermark = journal.load_watermark(target)
+    if watermark is None:
+        cutoff = months_ago_to_cutoff(older_than)
+        cutoff_display = cutoff.strftime("%Y-%m-%d %H:%M:%S %Z").strip()
+        start_time = time.monotonic()
+        message_ids = _scan(service, build_gmail_query(cutoff), cutoff, scan_workers, limiter)
+        limiter.metrics.record_phase("scan", time.monotonic() - start_time, len(message_ids))
+        typer.echo(f"Found {len(message_ids):,} emails before {cutoff_display}.")
+        typer.echo(f"Afterwards, mail that ages past the cutoff is removed every {interval:g}s.")
+        _confirm_or_exit(trash)
+        rejected: dict[str, int] = {}
+        delete_start = time.monotonic()
+        try:
+            deleted = batch_delete(
+                service,
+                message_ids,
+                workers=workers,
+                service_factory=build_gmail_service,
+                limiter=limiter,
+                trash=trash,
+                on_rejected=rejected.update,
+            )
+        except (HttpError, OSError) as exc:
+            typer.echo(f"Error: Deletion failed. {exc}. Try again.", err=True)
+            raise typer.Exit(code=1)
+        limiter.metrics.record_phase("delete", time.monotonic() - delete_start, deleted)
+        journal.save_watermark(target, int(cutoff.timestamp()))
+        _console().print(f"{_deleted_summary(deleted, trash)} before {cutoff_display}.")
+        _print_rejected(rejected)
+    else:
+        since = datetime.fromtimestamp(watermark).astimezone().strftime("%Y-%m-%d %H:%M:%S %Z")
+        typer.echo(f"Continuing from the last watermark, {since.strip()}.")
+
+    try:
+        while True:
+            if metrics_out is not None:
+                limiter.metrics.write(metrics_out)
+            time.sleep(interval)
+            start_time = time.monotonic()
+            cutoff = months_ago_to_cutoff(older_than)
+            try:
+                result = run_tick(
+                    service, journal, target, cutoff, limiter, workers, build_gmail_service, trash
+                )
+            except (HttpError, OSError) as exc:
+                typer.echo(f"Error: Tick failed. {exc}. Retrying in {interval:g}s.", err=True)
+                continue
+            elapsed = time.monotonic() - start_time
+            limiter.metrics.record_phase("tick", elapsed, result.deleted)
+            _console().print(
+                f"[dim]{datetime.now():%Y-%m-%d %H:%M:%S}[/dim] "
+                f"{_deleted_summary(result.deleted, trash)} "
+                f"[dim]({result.found:,} aged past the cutoff, {elapsed:.1f}s)[/dim]"
+            )
+            _print_rejected(result.rejected)
+    except KeyboardInterrupt:
+        typer.echo("\nStopped.")
+        raise typer.Exit(code=0)
+
+
+def _run_accounts(
+    directory: Path,
+    query: str,
+    cutoff: datetime,
+    execute: bool,
+    workers: int,
+    scan_workers: int,
+    transport: TransportConfig,
+    metrics: Metrics,
+    trash: bool = False,
+) -> None:
+    """--accounts path: scan every mailbox at once, confirm, delete at once, report."""
+    from gmail_cleanup.accounts import delete_accounts, discover_accounts, scan_accounts
+    from gmail_cleanup.rate_limit import RateLimiter
+
+    accounts = discover_accounts(directory)
+    if not accounts:
+        typer.echo(f"Error: No token files (*.json) found in {directory}.", err=True)
+        raise typer.Exit(code=1)
+    # Each mailbox keeps its own quota budget but reports into one Metrics.
+    for account in accounts:
+        account.limiter = RateLimiter(metrics=metrics)
+
+    cutoff_display = cutoff.strftime("%Y-%m-%d %H:%M:%S %Z").strip()
+    start_time = time.monotonic()
+    with _console().status(f"Scanning {len(accounts)} mailboxes...", spinner="dots"):
+        scan_accounts(accounts, query, cutoff, scan_workers, transport)
+    found = sum(account.found for account in accounts)
+    metrics.record_phase("scan", time.monotonic() - start_time, found)
+
+    if execute and found:
+        _print_account_report(accounts, f"Found before {cutoff_display}", deleting=False)
+        typer.echo(f"Found {found:,} emails across {len(accounts)} mailboxes.")
+        _confirm_or_exit(trash)
+        delete_start = time.monotonic()
+        action = "Trashing in" if trash else "Deleting from"
+        with _console().status(f"{action} {len(accounts)} mailboxes...", spinner="dots"):
+            delete_accounts(accounts, workers, trash)
+        metrics.record_phase(
+            "delete", time.monotonic() - delete_start, sum(a.deleted for a in accounts)
+        )
+
+    elapsed = time.monotonic() - start_time
+    _print_account_report(accounts, f"Before {cutoff_display}", deleting=execute)
+    slowest = max(account.scan_seconds + account.delete_seconds for account in accounts)
+    if execute:
+        summary = _deleted_summary(sum(a.deleted for a in accounts), trash)
+    else:
+        summary = f"[bold]Found {found:,} emails[/bold]"
+    _console().print(
+        f"{summary} across {len(accounts)} mailboxes "
+        f"[dim]({elapsed:.1f}s; slowest mailbox {slowest:.1f}s"
+        f"{'' if execute else ', dry run'})[/dim]"
+    )
+    if not execute:
+        typer.echo("Run with --execute to delete permanently.")
+    if any(account.error for account in accounts):
+        raise typer.Exit(code=1)
+
+
+def _print_account_report(accounts, title: str, deleting: bool) -> None:
+    """Print one row per AccountRun: counts, per-phase seconds and any error."""
+    from rich.table import Table
+
+    table = Table(title=title)
+    table.add_column("Mailbox")
+    table.add_column("Found", justify="right")
+    if deleting:
+        table.add_column("Deleted", justify="right")
+    table.add_column("Scan", justify="right")
+    if deleting:
+        table.add_column("Delete", justify="right")
+    table.add_column("Status")
+    for account in accounts:
+        row = [account.name, f"{account.found:,}"]
+        if deleting:
+            row.append(f"{account.deleted:,}")
+        row.append(f"{account.scan_seconds:.1f}s")
+        if deleting:
+            row.append(f"{account.delete_seconds:.1f}s")
+        if account.error:
+            row.append(f"[red]{account.error}[/red]")
+        elif account.rejected:
+            row.append(f"[yellow]ok, {len(account.rejected):,} rejected[/yellow]")
+        else:
+            row.append("ok")
+        table.add_row(*row)
+    _console().print(table)
+
+
+def _print_transfer_stats(stats: TransferStats) -> None:
+    """Print list-page payload totals collected during the scan."""
+    _console().print(
+        f"[dim]Listed {stats.pages:,} pages: {stats.payload_bytes / 1024:,.1f} KiB decoded, "
+        f"{stats.bytes_per_page / 1024:,.1f} KiB/page, "
+        f"{stats.gzip_pages:,}/{stats.pages:,} gzip-encoded[/dim]"
+    )
+
+
+def _target_key(
+    older_than: Optional[int],
+    before: Optional[str],
+    trash: bool = False,
+    policy: Optional[Path] = None,
+    id_file: Optional[IdFile] = None,
+) -> str:
+    """Return the journal key for the CLI targeting arguments.
+
+    Trash runs get their own key so --resume never finishes a trash run with
+    permanent deletion, or the other way round. An ID file is keyed by its
+    export time too, so a re-exported file never resumes the old file's chunks.
+    """
+    if policy is not None:
+        key = f"policy:{policy.resolve()}"
+    elif id_file is not None:
+        key = f"ids:{id_file.path.resolve()}@{id_file.header['created']}"
+    elif older_than is not None:
+        key = f"older-than:{older_than}"
+    else:
+        key = f"before:{before}"
+    return f"trash:{key}" if trash else key
+
+
 def validate_date(value: Optional[str]) -> Optional[str]:
     """Validate --before argument is YYYY-MM-DD format."""
     if value is None:
@@ -38,6 +783,7 @@ def validate_date(value: Optional[str]) -> Optional[str]:
 
 @app.command()
 def main(
+    ctx: typer.Context,
     older_than: Optional[int] = typer.Option(
         None,
         "--older-than",
@@ -51,39 +797,306 @@ def main(
         callback=validate_date,
         is_eager=False,
     ),
+    policy: Optional[Path] = typer.Option(
+        None,
+        "--policy",
+        help="Target the messages matched by the rules in a TOML policy FILE.",
+        exists=True,
+        file_okay=True,
+        dir_okay=False,
+    ),
+    from_ids: Optional[Path] = typer.Option(
+        None,
+        "--from-ids",
+        help="Target the message IDs in a FILE written by --export-ids (no scan).",
+        exists=True,
+        file_okay=True,
+        dir_okay=False,
+    ),
     execute: bool = typer.Option(
         False,
         "--execute",
         help="Perform live deletion. Dry-run is the default.",
     ),
+    trash: bool = typer.Option(
+        False,
+        "--trash",
+        help="With --execute: move messages to Trash instead of deleting permanently.",
+    ),
+    stream: bool = typer.Option(
+        False,
+        "--stream",
+        help="With --execute: delete while scanning instead of scanning first.",
+    ),
+    workers: int = typer.Option(
+        1,
+        "--workers",
+        help="Number of concurrent batchDelete workers.",
+        min=1,
+    ),
+    scan_workers: int = typer.Option(
+        1,
+        "--scan-workers",
+        help="List N date windows in parallel instead of paging sequentially.",
+        min=1,
+    ),
+    daemon: bool = typer.Option(
+        False,
+        "--daemon",
+        help="With --execute --older-than: keep running, deleting mail as it ages past the cutoff.",
+    ),
+    interval: float = typer.Option(
+        3600.0,
+        "--interval",
+        help="With --daemon: seconds between ticks.",
+        min=1.0,
+    ),
+    resume: bool = typer.Option(
+        False,
+        "--resume",
+        help="With --execute: continue the last interrupted run for this target.",
+    ),
+    incremental: bool = typer.Option(
+        False,
+        "--incremental",
+        help="Update the last scan from Gmail history instead of rescanning.",
+    ),
+    transfer_stats: bool = typer.Option(
+        False,
+        "--transfer-stats",
+        help="Report response bytes per list page after the scan.",
+    ),
+    estimate: bool = typer.Option(
+        False,
+        "--estimate",
+        help="Dry run: estimate the count from a few requests instead of scanning.",
+    ),
+    report: bool = typer.Option(
+        False,
+        "--report",
+        help="Dry run: show top senders, labels and bytes reclaimed (metadata is cached).",
+    ),
+    forecast: bool = typer.Option(
+        False,
+        "--plan",
+        help="Dry run: predict batchDelete calls, quota units and wall time per worker count.",
+    ),
+    export_ids: Optional[Path] = typer.Option(
+        None,
+        "--export-ids",
+        help="Dry run: write the scanned message IDs to PATH for a later --from-ids.",
+        dir_okay=False,
+    ),
+    connect_timeout: float = typer.Option(
+        DEFAULT_CONNECT_TIMEOUT,
+        "--connect-timeout",
+        help="Seconds to wait for a connection to the Gmail API.",
+        min=0.1,
+    ),
+    timeout: float = typer.Option(
+        DEFAULT_READ_TIMEOUT,
+        "--timeout",
+        help="Seconds to wait for each Gmail API response.",
+        min=0.1,
+    ),
+    accounts: Optional[Path] = typer.Option(
+        None,
+        "--accounts",
+        help="Clean every mailbox with a token file (*.json) in DIR concurrently.",
+        exists=True,
+        file_okay=False,
+        dir_okay=True,
+    ),
+    metrics_out: Optional[Path] = typer.Option(
+        None,
+        "--metrics-out",
+        help="Write per-call API metrics to PATH: Prometheus text if it ends in .prom, else JSON.",
+        dir_okay=False,
+    ),
 ) -> None:
     """Delete old Gmail messages. Runs in dry-run mode by default.
 
-    Exactly one of --older-than or --before must be provided.
+    Exactly one of --older-than, --before, --policy or --from-ids must be provided.
     Pass --execute to perform live deletion after confirmation.
     """
     # Mutual exclusion: require exactly one targeting argument
-    if older_than is None and before is None:
+    targets = sum(value is not None for value in (older_than, before, policy, from_ids))
+    if targets == 0:
+        typer.echo(
+            "Error: Provide --older-than N (months), --before YYYY-MM-DD, --policy FILE "
+            "or --from-ids FILE.",
+            err=True,
+        )
+        raise typer.Exit(code=1)
+    if targets > 1:
+        typer.echo(
+            "Error: Use only one of --older-than, --before, --policy or --from-ids.",
+            err=True,
+        )
+        raise typer.Exit(code=1)
+    if trash and not execute:
+        typer.echo("Error: --trash requires --execute.", err=True)
+        raise typer.Exit(code=1)
+    if stream and not execute:
+        typer.echo("Error: --stream requires --execute.", err=True)
+        raise typer.Exit(code=1)
+    if resume and (stream or not execute):
+        typer.echo("Error: --resume requires --execute and cannot be used with --stream.", err=True)
+        raise typer.Exit(code=1)
+    if incremental and stream:
+        typer.echo("Error: Use --incremental or --stream, not both.", err=True)
+        raise typer.Exit(code=1)
+    if estimate and execute:
+        typer.echo("Error: --estimate is a dry run and cannot be used with --execute.", err=True)
+        raise typer.Exit(code=1)
+    if report and (execute or estimate or accounts is not None):
+        typer.echo(
+            "Error: --report is a dry run and cannot be used with --execute, "
+            "--estimate or --accounts.",
+            err=True,
+        )
+        raise typer.Exit(code=1)
+    if accounts is not None and (stream or resume or incremental or estimate):
+        typer.echo(
+            "Error: --accounts cannot be combined with --stream, --resume, "
+            "--incremental or --estimate.",
+            err=True,
+        )
+        raise typer.Exit(code=1)
+    if daemon and (not execute or older_than is None):
+        typer.echo("Error: --daemon requires --execute and --older-than.", err=True)
+        raise typer.Exit(code=1)
+    if daemon and (stream or resume or incremental or report or accounts is not None):
+        typer.echo(
+            "Error: --daemon cannot be combined with --stream, --resume, --incremental, "
+            "--report or --accounts.",
+            err=True,
+        )
+        raise typer.Exit(code=1)
+    if forecast and (execute or estimate or accounts is not None):
+        typer.echo(
+            "Error: --plan is a dry run and cannot be used with --execute, "
+            "--estimate or --accounts.",
+            err=True,
+        )
+        raise typer.Exit(code=1)
+    if export_ids is not None and (execute or estimate or accounts is not None):
         typer.echo(
-            "Error: Provide --older-than N (months) or --before YYYY-MM-DD.",
+            "Error: --export-ids is a dry run and cannot be used with --execute, "
+            "--estimate or --accounts.",
             err=True,
         )
         raise typer.Exit(code=1)
-    if older_than is not None and before is not None:
+    if from_ids is not None and (
+        stream or incremental or estimate or accounts is not None or export_ids is not None
+    ):
         typer.echo(
-            "Error: Use --older-than or --before, not both.",
+            "Error: --from-ids cannot be combined with --stream, --incremental, --estimate, "
+            "--accounts or --export-ids.",
+            err=True,
+        )
+        raise typer.Exit(code=1)
+    if policy is not None and (
+        stream or incremental or estimate or accounts is not None or scan_workers > 1
+    ):
+        typer.echo(
+            "Error: --policy cannot be combined with --stream, --incremental, --estimate, "
+            "--accounts or --scan-workers.",
             err=True,
         )
         raise typer.Exit(code=1)
 
     # Build Gmail query from CLI argument
-    if older_than is not None:
+    plan: Plan | None = None
+    id_file: IdFile | None = None
+    if policy is not None:
+        from gmail_cleanup.policy import PolicyError, load_policy, plan_queries
+
+        try:
+            plan = plan_queries(load_policy(policy))
+        except PolicyError as exc:
+            typer.echo(f"Error: Invalid policy file. {exc}", err=True)
+            raise typer.Exit(code=1)
+        cutoff = plan.cutoff
+        # Only recorded in the journal: policy scans run plan.queries.
+        query = " | ".join(planned.query for planned in plan.queries)
+    elif from_ids is not None:
+        from gmail_cleanup.id_file import IdFile, IdFileError
+
+        try:
+            id_file = IdFile(from_ids)
+        except IdFileError as exc:
+            typer.echo(f"Error: Cannot read ID file. {exc}", err=True)
+            raise typer.Exit(code=1)
+        ctx.call_on_close(id_file.close)
+        cutoff = datetime.fromtimestamp(id_file.cutoff).astimezone()
+        query = id_file.query
+    elif older_than is not None:
         cutoff = months_ago_to_cutoff(older_than)
+        query = build_gmail_query(cutoff)
     else:
         cutoff = parse_date_to_cutoff(before)  # type: ignore[arg-type]
+        query = build_gmail_query(cutoff)
+
+    # Every scan and delete worker can hold a connection at once (both pools
+    # run concurrently with --stream), plus the main thread.
+    transport = TransportConfig(
+        connect_timeout=connect_timeout,
+        read_timeout=timeout,
+        pool_size=max(DEFAULT_POOL_SIZE, workers + scan_workers + 1),
+    )
+
+    # Written when the command exits for any reason, so failed and cancelled
+    # runs still leave their metrics behind.
+    from gmail_cleanup.metrics import Metrics
+
+    metrics = Metrics()
+    if metrics_out is not None:
+        ctx.call_on_close(lambda: metrics.write(metrics_out))
+
+    if accounts is not None:
+        _run_accounts(
+            accounts, query, cutoff, execute, workers, scan_workers, transport, metrics, trash
+        )
+        return
+
+    # Arguments are valid — now load the Gmail client stack.
+    from googleapiclient.errors import HttpError
+
+    from gmail_cleanup.auth import build_gmail_service, configure_transport
+    from gmail_cleanup.cleaner import CHUNK_SIZE, batch_delete
+    from gmail_cleanup.gmail_client import TransferStats
+    from gmail_cleanup.journal import RunJournal
+    from gmail_cleanup.rate_limit import RateLimiter
+
+    # Journal every --execute run except --stream and --daemon (which keeps a
+    # watermark instead) so that --resume can pick it up. Runs are keyed by the
+    # CLI target; a resumed run reuses its stored query, since --older-than
+    # yields a new cutoff on every invocation.
+    journal: RunJournal | None = None
+    run: JournalRun | None = None
+    target = _target_key(older_than, before, trash, policy, id_file)
+    if execute and not (stream or daemon):
+        journal = RunJournal()
+        run = journal.find_unfinished(target) if resume else None
+        if run is not None:
+            query = run.query
+            cutoff = datetime.fromtimestamp(run.cutoff).astimezone()
+        else:
+            if resume:
+                typer.echo("No interrupted run found — starting a fresh scan.")
+            run = journal.start(target, query, int(cutoff.timestamp()))
 
-    query = build_gmail_query(cutoff)
     cutoff_display = cutoff.strftime("%Y-%m-%d %H:%M:%S %Z").strip()
+    if policy is not None:
+        target_display = f"matching the rules in {policy.name}"
+    elif id_file is not None:
+        target_display = (
+            f"in {id_file.path.name} ({id_file.query}, exported {id_file.header['created']})"
+        )
+    else:
+        target_display = f"before {cutoff_display}"
+    configure_transport(transport)
 
     # Authenticate and fetch matching message IDs
     try:
@@ -92,64 +1105,123 @@ def main(
         typer.echo(f"Error: credentials.json not found — {exc}", err=True)
         raise typer.Exit(code=1)
 
+    # One limiter for the whole run so listing and deletion share the quota budget.
+    limiter = RateLimiter(metrics=metrics)
+
+    if stream:
+        _run_stream(service, query, cutoff, workers, scan_workers, limiter, trash)
+        return
+
+    if daemon:
+        _run_daemon(
+            service,
+            older_than,  # type: ignore[arg-type]
+            workers,
+            scan_workers,
+            interval,
+            limiter,
+            trash,
+            metrics_out,
+        )
+        return
+
+    if estimate:
+        _run_estimate(service, cutoff, cutoff_display, limiter)
+
     start_time = time.monotonic()
-    message_ids: list[str] = []
+    stats = TransferStats() if transfer_stats else None
+    rule_counts: dict[str, int] | None = None
+    # The export is written page by page and only moved into place once the scan completes.
+    writer = None
+    if export_ids is not None:
+        from gmail_cleanup.id_file import IdFileWriter
+
+        writer = IdFileWriter(export_ids, query, int(cutoff.timestamp()), target)
+    on_page = writer.write if writer is not None else None
     try:
-        with console.status("Scanning... 0 emails found", spinner="dots") as status:
-            # Inline pagination — main.py drives the loop so it can update the spinner per page
-            page_token = None
-            page_num = 0
-            while True:
-                page_num += 1
-                kwargs: dict = {"userId": "me", "q": query, "maxResults": 500}
-                if page_token:
-                    kwargs["pageToken"] = page_token
-                try:
-                    result = service.users().messages().list(**kwargs).execute()
-                except HttpError as exc:
-                    typer.echo(
-                        f"Error: Failed to fetch page {page_num} of results. {exc}. Try again.",
-                        err=True,
-                    )
-                    raise typer.Exit(code=1)
-                message_ids.extend(m["id"] for m in result.get("messages", []))
-                status.update(f"Scanning... {len(message_ids):,} emails found")
-                page_token = result.get("nextPageToken")
-                if not page_token:
-                    break
-    except typer.Exit:
-        raise  # re-raise Exit so typer handles it
+        if id_file is not None:
+            message_ids: Sequence[str] = id_file
+        elif plan is not None:
+            message_ids, rule_counts = _policy_scan(
+                service, plan, limiter, journal, run, stats, on_page
+            )
+        elif incremental and not (run is not None and run.scan_complete):
+            message_ids = _incremental_scan(
+                service, query, cutoff, scan_workers, limiter, journal, run, stats, on_page
+            )
+        else:
+            message_ids = _scan(
+                service, query, cutoff, scan_workers, limiter, journal, run, stats, on_page
+            )
+    except BaseException:
+        if writer is not None:
+            writer.abort()
+        raise
+    if writer is not None:
+        writer.close()
+    if stats is not None:
+        _print_transfer_stats(stats)
 
     count = len(message_ids)
+    if id_file is None:
+        metrics.record_phase("scan", time.monotonic() - start_time, count)
+    if plan is not None and rule_counts is not None:
+        _print_policy_counts(plan, rule_counts)
 
     if not execute:
         elapsed = time.monotonic() - start_time
-        console.print(
-            f"[bold]Found {count:,} emails[/bold] before {cutoff_display} "
+        _console().print(
+            f"[bold]Found {count:,} emails[/bold] {target_display} "
             f"[dim]({elapsed:.1f}s, dry run)[/dim]"
         )
+        if writer is not None:
+            typer.echo(f"Wrote {writer.count:,} message IDs to {export_ids}.")
+        # Before --report, so only scan requests inform the forecast.
+        if forecast and count:
+            _print_forecast(count, workers, metrics)
+        if report and count:
+            _run_report(service, message_ids, limiter)
         typer.echo("Run with --execute to delete permanently.")
         raise typer.Exit(code=0)
 
-    # --execute path: show count and require explicit confirmation
-    # typer.confirm() appends " [y/N]: " automatically — do not include in message
-    typer.echo(f"Found {count:,} emails before {cutoff_display}.")
-    try:
-        confirmed = typer.confirm("Delete permanently")
-    except (KeyboardInterrupt, typer.Abort):
-        typer.echo("\nCancelled.")
-        raise typer.Exit(code=0)
+    assert journal is not None and run is not None  # --execute always journals
+    done_chunks = journal.done_chunks(run)
+    # Sizes from the chunk arithmetic: slicing would decode the IDs just to count them.
+    already = sum(
+        max(0, min(CHUNK_SIZE, count - i * CHUNK_SIZE)) for i in done_chunks
+    )
 
-    if not confirmed:
-        typer.echo("Deletion cancelled.")
-        raise typer.Exit(code=0)
+    # --execute path: show count and require explicit confirmation
+    typer.echo(f"Found {count - already:,} emails {target_display}.")
+    if already:
+        done = "moved to Trash" if trash else "deleted"
+        typer.echo(f"Resuming: {already:,} emails were already {done} by the interrupted run.")
+    _confirm_or_exit(trash)
 
-    deleted = batch_delete(service, message_ids)
+    delete_start = time.monotonic()
+    rejected: dict[str, int] = {}
+    try:
+        deleted = batch_delete(
+            service,
+            message_ids,
+            workers=workers,
+            service_factory=build_gmail_service,
+            limiter=limiter,
+            skip_chunks=done_chunks,
+            on_chunk_deleted=lambda index: journal.mark_chunk_done(run, index),
+            trash=trash,
+            on_rejected=rejected.update,
+        )
+    except (HttpError, OSError) as exc:
+        typer.echo(
+            f"Error: Deletion failed. {exc}. Run again with --resume to continue.", err=True
+        )
+        raise typer.Exit(code=1)
+    metrics.record_phase("delete", time.monotonic() - delete_start, deleted)
+    journal.finish(run)
     elapsed = time.monotonic() - start_time
-    console.print(
-        f"[bold green]Deleted {deleted:,} emails[/bold green] "
-        f"in [bold]{elapsed:.1f}s[/bold]."
-    )
+    _console().print(f"{_deleted_summary(deleted, trash)} in [bold]{elapsed:.1f}s[/bold].")
+    _print_rejected(rejected)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,226 @@
+"""Per-call metrics for Gmail API traffic, exported by --metrics-out.
+
+Every RateLimiter carries a Metrics instance, so each code path that already
+paces its calls through the limiter (listing, history, batch gets and
+batchDelete) is instrumented without threading a second object around. The
+output answers one question about a slow run: was it API latency, throttling
+(limiter waits and backoff sleeps), or our own code (phase time not spent in
+either)?
+"""
+
+import json
+import os
+import threading
+import time
+from collections import Counter
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from googleapiclient.errors import HttpError
+
+# Upper bounds (seconds) of the latency histogram buckets; a final +Inf bucket
+# catches the rest. Covers a fast list page up to a read timeout.
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_PREFIX = "gmail_clean"
+
+
+@dataclass
+class Histogram:
+    """Latency histogram for one API method; counts are per bucket, not cumulative."""
+
+    counts: list[int] = field(default_factory=lambda: [0] * (len(LATENCY_BUCKETS) + 1))
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+
+    def observe(self, seconds: float) -> None:
+        index = next(
+            (i for i, bound in enumerate(LATENCY_BUCKETS) if seconds <= bound),
+            len(LATENCY_BUCKETS),
+        )
+        self.counts[index] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def cumulative(self) -> list[tuple[str, int]]:
+        """Return (le, cumulative count) pairs, Prometheus-style, ending in +Inf."""
+        running = 0
+        pairs = []
+        for bound, count in zip((*map(str, LATENCY_BUCKETS), "+Inf"), self.counts):
+            running += count
+            pairs.append((bound, running))
+        return pairs
+
+
+@dataclass
+class Phase:
+    """Wall time and messages handled by one phase of the run (scan, delete)."""
+
+    seconds: float = 0.0
+    messages: int = 0
+
+    @property
+    def messages_per_second(self) -> float:
+        return self.messages / self.seconds if self.seconds else 0.0
+
+
+class Metrics:
+    """Thread-safe counters and latency histograms for one run.
+
+    status labels are the HTTP status as a string, or "error" for a transport
+    failure (timeout, connection reset) that never produced a response.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.latency: dict[str, Histogram] = {}
+        self.requests: Counter[tuple[str, str]] = Counter()  # (method, status)
+        self.retries: Counter[tuple[str, str]] = Counter()  # (method, status)
+        self.quota_units: Counter[str] = Counter()
+        self.limiter_wait_seconds = 0.0
+        self.backoff_seconds = 0.0
+        self.phases: dict[str, Phase] = {}
+
+    @contextmanager
+    def call(self, method: str) -> Iterator[None]:
+        """Time one HTTP request for method and count it by outcome."""
+        start = time.monotonic()
+        status = "200"
+        try:
+            yield
+        except HttpError as exc:
+            status = str(exc.resp.status)
+            raise
+        except OSError:
+            status = "error"
+            raise
+        finally:
+            seconds = time.monotonic() - start
+            with self._lock:
+                self.latency.setdefault(method, Histogram()).observe(seconds)
+                self.requests[method, status] += 1
+
+    def record_quota(self, method: str, units: int, waited: float) -> None:
+        """Record quota reserved for one call and how long the limiter held it."""
+        with self._lock:
+            self.quota_units[method] += units
+            self.limiter_wait_seconds += waited
+
+    def record_retry(self, method: str, status: int | str) -> None:
+        with self._lock:
+            self.retries[method, str(status)] += 1
+
+    def record_backoff(self, seconds: float) -> None:
+        """Record a backoff sleep taken outside the limiter (5xx retries)."""
+        with self._lock:
+            self.backoff_seconds += seconds
+
+    def record_phase(self, name: str, seconds: float, messages: int) -> None:
+        with self._lock:
+            phase = self.phases.setdefault(name, Phase())
+            phase.seconds += seconds
+            phase.messages += messages
+
+    def to_dict(self) -> dict:
+        """Return every metric as plain JSON-serialisable data."""
+        with self._lock:
+            return {
+                "latency_seconds": {
+                    method: {
+                        "count": h.count,
+                        "sum": round(h.total, 6),
+                        "max": round(h.max, 6),
+                        "buckets": dict(h.cumulative()),
+                    }
+                    for method, h in sorted(self.latency.items())
+                },
+                "requests": _nest(self.requests),
+                "retries": _nest(self.retries),
+                "quota_units": dict(sorted(self.quota_units.items())),
+                "limiter_wait_seconds": round(self.limiter_wait_seconds, 6),
+                "backoff_seconds": round(self.backoff_seconds, 6),
+                "phases": {
+                    name: {
+                        "seconds": round(p.seconds, 6),
+                        "messages": p.messages,
+                        "messages_per_second": round(p.messages_per_second, 3),
+                    }
+                    for name, p in self.phases.items()
+                },
+            }
+
+    def to_prometheus(self) -> str:
+        """Render the metrics in the Prometheus text exposition format."""
+        data = self.to_dict()
+        lines: list[str] = []
+
+        def family(name: str, kind: str, help_text: str) -> str:
+            full = f"{_PREFIX}_{name}"
+            lines.append(f"# HELP {full} {help_text}")
+            lines.append(f"# TYPE {full} {kind}")
+            return full
+
+        name = family("request_duration_seconds", "histogram", "Gmail API request latency.")
+        for method, h in data["latency_seconds"].items():
+            for le, count in h["buckets"].items():
+                lines.append(f'{name}_bucket{{method="{method}",le="{le}"}} {count}')
+            lines.append(f'{name}_sum{{method="{method}"}} {h["sum"]}')
+            lines.append(f'{name}_count{{method="{method}"}} {h["count"]}')
+
+        for key, help_text in (
+            ("requests", "Gmail API requests by outcome."),
+            ("retries", "Retried Gmail API calls by the status that caused them."),
+        ):
+            name = family(f"{key}_total", "counter", help_text)
+            for method, by_status in data[key].items():
+                for status, count in by_status.items():
+                    lines.append(f'{name}{{method="{method}",status="{status}"}} {count}')
+
+        name = family("quota_units_total", "counter", "Gmail quota units reserved.")
+        for method, units in data["quota_units"].items():
+            lines.append(f'{name}{{method="{method}"}} {units}')
+
+        name = family(
+            "limiter_wait_seconds_total", "counter", "Time callers waited on the quota limiter."
+        )
+        lines.append(f"{name} {data['limiter_wait_seconds']}")
+        name = family(
+            "backoff_seconds_total", "counter", "Time slept in backoff outside the limiter."
+        )
+        lines.append(f"{name} {data['backoff_seconds']}")
+
+        for key, help_text in (
+            ("seconds", "Wall time of each run phase."),
+            ("messages", "Messages handled by each run phase."),
+            ("messages_per_second", "Throughput of each run phase."),
+        ):
+            name = family(f"phase_{key}", "gauge", help_text)
+            for phase, values in data["phases"].items():
+                lines.append(f'{name}{{phase="{phase}"}} {values[key]}')
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: Path) -> None:
+        """Write to path atomically: Prometheus text for *.prom, JSON otherwise.
+
+        The atomic rename matters for the node_exporter textfile collector,
+        which may read the file at any moment.
+        """
+        if path.suffix == ".prom":
+            text = self.to_prometheus()
+        else:
+            text = json.dumps(self.to_dict(), indent=2) + "\n"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.tmp")
+        tmp.write_text(text)
+        os.replace(tmp, path)
+
+
+def _nest(counter: Counter[tuple[str, str]]) -> dict[str, dict[str, int]]:
+    nested: dict[str, dict[str, int]] = {}
+    for (method, status), count in sorted(counter.items()):
+        nested.setdefault(method, {})[status] = count
+    return nested
@@ -0,0 +1,202 @@
+"""Retention policy files (--policy): several rules, planned into few list queries.
+
+A policy is a TOML file of [[rule]] tables, each a Gmail search plus an age:
+
+    [[rule]]
+    name = "promotions"
+    query = "category:promotions"
+    older_than = 1          # months; or before = "YYYY-MM-DD"
+
+    [[rule]]
+    name = "everything"
+    older_than = 60         # no query: matches every message
+
+Scanning each rule separately lists the same old mail once per rule. The
+planner avoids that overlap: rules with the same search keep only the latest
+cutoff, and when a catch-all rule exists every other rule lists only the
+window between the catch-all cutoff and its own, or nothing at all when the
+catch-all already covers it. IDs that still appear in more than one query
+(a message matching two filtered rules) are counted and deleted once, under
+the first rule in the file that listed them.
+"""
+
+import re
+import tomllib
+from collections.abc import Iterator
+from dataclasses import dataclass
+from datetime import date, datetime
+from pathlib import Path
+
+from gmail_cleanup.date_utils import (
+    build_gmail_query,
+    build_window_query,
+    months_ago_to_cutoff,
+    parse_date_to_cutoff,
+)
+from gmail_cleanup.gmail_client import TransferStats, iter_message_id_pages
+from gmail_cleanup.id_store import MessageIdSet
+from gmail_cleanup.rate_limit import RateLimiter, RetryBudget
+
+_RULE_KEYS = {"name", "query", "older_than", "before"}
+
+# Dates come from older_than/before only; a date operator in the query would
+# silently fight the planner's own before:/after: bounds.
+_DATE_OPERATOR = re.compile(r"\b(before|after|older|newer|older_than|newer_than):", re.I)
+
+
+class PolicyError(Exception):
+    """The policy file is unreadable or one of its rules is invalid."""
+
+
+@dataclass(frozen=True)
+class Rule:
+    """One policy rule: messages matching query and received before cutoff."""
+
+    name: str
+    query: str  # Gmail search terms without dates; "" matches every message
+    cutoff: datetime
+
+
+@dataclass(frozen=True)
+class PlannedQuery:
+    """One messages.list query and the rule its new IDs are counted under."""
+
+    rule: str
+    query: str
+
+
+@dataclass
+class Plan:
+    """The queries that together list every message any rule matches."""
+
+    rules: list[Rule]
+    queries: list[PlannedQuery]
+    covered: dict[str, str]  # rule name -> rule whose query already lists its messages
+
+    @property
+    def cutoff(self) -> datetime:
+        """The latest cutoff of any rule — nothing newer is ever listed."""
+        return max(rule.cutoff for rule in self.rules)
+
+
+def load_policy(path: Path) -> list[Rule]:
+    """Read and validate the [[rule]] tables of a TOML policy file.
+
+    older_than counts calendar months back from now (months_ago_to_cutoff);
+    before is a YYYY-MM-DD string or TOML date (parse_date_to_cutoff).
+    Raises PolicyError naming the file and rule on any problem.
+    """
+    try:
+        with path.open("rb") as f:
+            data = tomllib.load(f)
+    except (OSError, tomllib.TOMLDecodeError) as exc:
+        raise PolicyError(f"{path}: {exc}") from exc
+
+    entries = data.get("rule")
+    if not isinstance(entries, list) or not entries:
+        raise PolicyError(f"{path}: no [[rule]] tables found")
+    rules = [_parse_rule(entry, index) for index, entry in enumerate(entries, 1)]
+    names = [rule.name for rule in rules]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise PolicyError(f"{path}: duplicate rule name {duplicates[0]!r}")
+    return rules
+
+
+def _parse_rule(entry: dict, index: int) -> Rule:
+    where = f"rule {index}"
+    unknown = sorted(set(entry) - _RULE_KEYS)
+    if unknown:
+        raise PolicyError(f"{where}: unknown key {unknown[0]!r}")
+    name = entry.get("name")
+    if not isinstance(name, str) or not name.strip():
+        raise PolicyError(f"{where}: name is required")
+    where = f"rule {name!r}"
+
+    query = entry.get("query", "")
+    if not isinstance(query, str):
+        raise PolicyError(f"{where}: query must be a string")
+    if _DATE_OPERATOR.search(query):
+        raise PolicyError(f"{where}: put the age in older_than or before, not in the query")
+
+    older_than = entry.get("older_than")
+    before = entry.get("before")
+    if (older_than is None) == (before is None):
+        raise PolicyError(f"{where}: set exactly one of older_than or before")
+    if older_than is not None:
+        if isinstance(older_than, bool) or not isinstance(older_than, int) or older_than < 1:
+            raise PolicyError(f"{where}: older_than must be a whole number of months, 1 or more")
+        cutoff = months_ago_to_cutoff(older_than)
+    else:
+        if isinstance(before, date) and not isinstance(before, datetime):
+            before = before.isoformat()
+        try:
+            cutoff = parse_date_to_cutoff(before)
+        except (TypeError, ValueError):
+            raise PolicyError(f"{where}: before must be YYYY-MM-DD, got {before!r}")
+    return Rule(name=name.strip(), query=" ".join(query.split()), cutoff=cutoff)
+
+
+def plan_queries(rules: list[Rule]) -> Plan:
+    """Merge rules into the fewest messages.list queries that cover them all.
+
+    Rules sharing a query keep the one with the latest cutoff. A catch-all
+    rule (empty query) lists everything before its cutoff, so each filtered
+    rule only needs the window from there up to its own cutoff — and no query
+    at all if its cutoff is not later. Queries are in rule order.
+    """
+    by_query: dict[str, Rule] = {}
+    covered: dict[str, str] = {}
+    for rule in rules:
+        current = by_query.get(rule.query)
+        if current is None:
+            by_query[rule.query] = rule
+        elif rule.cutoff > current.cutoff:
+            covered[current.name] = rule.name
+            by_query[rule.query] = rule
+        else:
+            covered[rule.name] = current.name
+
+    catch_all = by_query.get("")
+    queries: list[PlannedQuery] = []
+    for query, rule in by_query.items():
+        if catch_all is None or rule is catch_all:
+            dates = build_gmail_query(rule.cutoff)
+        elif rule.cutoff <= catch_all.cutoff:
+            covered[rule.name] = catch_all.name
+            continue
+        else:
+            dates = build_window_query(
+                int(catch_all.cutoff.timestamp()), int(rule.cutoff.timestamp())
+            )
+        # Parenthesised so an OR inside the rule's query cannot swallow the dates.
+        queries.append(PlannedQuery(rule.name, f"({query}) {dates}" if query else dates))
+
+    # A rule merged into another that was itself superseded points at the survivor.
+    for name, target in covered.items():
+        while target in covered:
+            target = covered[target]
+        covered[name] = target
+    return Plan(rules=rules, queries=queries, covered=covered)
+
+
+def iter_plan_pages(
+    service,
+    plan: Plan,
+    limiter: RateLimiter | None = None,
+    stats: TransferStats | None = None,
+) -> Iterator[tuple[str, list[str]]]:
+    """Yield (rule name, new IDs) for each list page of each planned query.
+
+    IDs already yielded by an earlier query are dropped, so every message is
+    produced once, under the first rule that listed it. Transient failures are
+    retried within one RetryBudget for the whole plan. Raises HttpError on
+    API failure.
+    """
+    seen = MessageIdSet()
+    budget = RetryBudget()
+    for planned in plan.queries:
+        for page in iter_message_id_pages(service, planned.query, limiter, stats, budget):
+            new = [message_id for message_id in page if message_id not in seen]
+            seen.update(new)
+            yield planned.rule, new
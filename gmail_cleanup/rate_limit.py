@@ -0,0 +1,239 @@
+"""Quota-aware request pacing shared by listing and deletion."""
+
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+from googleapiclient.errors import HttpError
+
+from gmail_cleanup.metrics import Metrics
+
+# Gmail per-user quota is 250 units/second (moving average).
+# Source: https://developers.google.com/gmail/api/reference/quota
+DEFAULT_QUOTA_RATE = 250.0
+
+# Quota units per call, keyed by the short method name used at call sites.
+QUOTA_COSTS = {
+    "list": 5,
+    "get": 5,
+    "batchDelete": 50,
+    "trash": 5,
+    "history": 2,
+    "getProfile": 1,
+    "labels": 1,
+}
+
+# Rate limits and transient server errors; anything else fails immediately.
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+# Backoff ceiling — matches the old fixed 1s → 32s schedule.
+MAX_BACKOFF = 32.0
+
+# After a decrease, ignore further 429s for this long so that a burst of
+# concurrent rejections halves the rate once, not once per worker.
+DECREASE_COOLDOWN = 1.0
+
+# Default RetryBudget: retries allowed across one whole scan, and how long a
+# single page may keep failing before the scan gives up on it.
+SCAN_MAX_RETRIES = 50
+SCAN_RETRY_TIMEOUT = 300.0
+
+
+def backoff_delay(attempt: int) -> float:
+    """Return a full-jitter backoff delay for the given 0-based retry attempt.
+
+    Draws uniformly from [0, min(MAX_BACKOFF, 2**attempt)] so concurrent
+    callers that failed together do not retry together.
+    """
+    return random.uniform(0, min(MAX_BACKOFF, 2.0 ** attempt))
+
+
+def retry_after_seconds(exc: HttpError) -> float | None:
+    """Return the Retry-After delay from an HttpError response, if present.
+
+    Accepts both delta-seconds and HTTP-date forms. Returns None when the header
+    is missing or unparseable.
+    """
+    # httplib2.Response is a dict of lower-cased header names.
+    value = exc.resp.get("retry-after") if isinstance(exc.resp, dict) else None
+    if not isinstance(value, str):
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+class RateLimiter:
+    """Thread-safe token bucket denominated in Gmail quota units.
+
+    Callers reserve units with acquire() before each request and report the
+    outcome with on_success() / on_throttle(). The refill rate adapts with
+    additive increase on success and multiplicative decrease on HTTP 429, and a
+    throttle pauses every caller until the server's Retry-After has passed.
+
+    Reservations may drive the bucket negative; each caller then sleeps exactly
+    long enough for its own reservation to be covered, in a single sleep.
+
+    metrics records quota units and waits here, and call latencies wherever the
+    limiter is used; a fresh Metrics is created if none is passed.
+    """
+
+    def __init__(
+        self,
+        rate: float = DEFAULT_QUOTA_RATE,
+        min_rate: float = 10.0,
+        increase: float = 5.0,
+        decrease: float = 0.5,
+        metrics: Metrics | None = None,
+    ) -> None:
+        self.metrics = metrics or Metrics()
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min_rate
+        self.increase = increase
+        self.decrease = decrease
+        self._tokens = rate  # one second of burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._last_decrease = float("-inf")
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.rate, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, method: str) -> float:
+        """Reserve quota for one call to method, sleeping if needed. Returns seconds slept."""
+        cost = QUOTA_COSTS[method]
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= cost
+            wait = max(-self._tokens / self.rate, self._paused_until - now, 0.0)
+        self.metrics.record_quota(method, cost, wait)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def on_success(self) -> None:
+        """Additive increase: creep back toward the configured maximum rate."""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttle(self, delay: float) -> None:
+        """Multiplicative decrease after a 429, and pause all callers for delay seconds."""
+        with self._lock:
+            now = time.monotonic()
+            self._paused_until = max(self._paused_until, now + delay)
+            if now - self._last_decrease >= DECREASE_COOLDOWN:
+                self._refill(now)
+                self.rate = max(self.min_rate, self.rate * self.decrease)
+                self._tokens = min(self._tokens, self.rate)
+                self._last_decrease = now
+
+
+def execute_paced(request, method: str, limiter: RateLimiter | None):
+    """Execute a prepared API request under limiter, without retrying.
+
+    Reserves quota first, feeds the outcome back to the limiter, and re-raises
+    any HttpError for the caller to handle. With limiter=None this is just
+    request.execute().
+    """
+    try:
+        return _execute_metered(request, method, limiter)
+    except HttpError as exc:
+        if limiter is not None and int(exc.resp.status) == 429:
+            delay = retry_after_seconds(exc)
+            limiter.on_throttle(delay if delay is not None else backoff_delay(0))
+        raise
+
+
+def _execute_metered(request, method: str, limiter: RateLimiter | None):
+    """Reserve quota, execute and time request; throttling is left to the caller."""
+    if limiter is None:
+        return request.execute()
+    limiter.acquire(method)
+    with limiter.metrics.call(method):
+        result = request.execute()
+    limiter.on_success()
+    return result
+
+
+class RetryBudget:
+    """Retries allowed across one scan, shared by all of its listing threads.
+
+    Each retried call spends one unit; once max_retries are spent, the next
+    failure is raised. A call is also given up once it has been failing for
+    timeout seconds, so a long outage ends the scan instead of hanging it.
+    """
+
+    def __init__(
+        self, max_retries: int = SCAN_MAX_RETRIES, timeout: float = SCAN_RETRY_TIMEOUT
+    ) -> None:
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def spend(self, failing_since: float, delay: float) -> bool:
+        """Take one retry for a call failing since failing_since (monotonic), if allowed."""
+        if time.monotonic() + delay - failing_since > self.timeout:
+            return False
+        with self._lock:
+            if self.used >= self.max_retries:
+                return False
+            self.used += 1
+            return True
+
+
+def execute_retrying(
+    request, method: str, limiter: RateLimiter | None, budget: RetryBudget
+):
+    """Execute request like execute_paced, retrying transient failures within budget.
+
+    429 and 5xx responses, timeouts and dropped connections are retried with
+    full-jitter backoff, or for exactly Retry-After when the server sends it.
+    The same request is sent again, so a list call resumes from the page token
+    it was built with. Anything else, or a failure once budget is exhausted,
+    is raised.
+
+    The delay is chosen once per attempt: a 429 pauses the limiter for it
+    (every caller waits), anything else sleeps it here, and the budget's
+    timeout is charged the same value.
+    """
+    attempt = 0
+    failing_since = None
+    while True:
+        try:
+            return _execute_metered(request, method, limiter)
+        except (HttpError, OSError) as exc:
+            if isinstance(exc, HttpError):
+                status: int | str = int(exc.resp.status)
+                if status not in RETRYABLE_STATUSES:
+                    raise
+                delay = retry_after_seconds(exc)
+            else:
+                status, delay = "error", None
+            if delay is None:
+                delay = backoff_delay(attempt)
+            if status == 429 and limiter is not None:
+                # The next acquire() waits the pause out.
+                limiter.on_throttle(delay)
+            if failing_since is None:
+                failing_since = time.monotonic()
+            if not budget.spend(failing_since, delay):
+                raise
+            if limiter is not None:
+                limiter.metrics.record_retry(method, status)
+            if status != 429 or limiter is None:
+                if limiter is not None:
+                    limiter.metrics.record_backoff(delay)
+                time.sleep(delay)
+            attempt += 1
@@ -0,0 +1,238 @@
+"""Dry-run report of what a cleanup would remove (--report).
+
+For every matched message, messages.get(format=metadata) supplies the sender,
+labels and sizeEstimate, sent through batch HTTP requests like the other
+per-message calls. A message's sender and size never change, so results are
+kept in an SQLite cache keyed by message ID and a repeat dry run only fetches
+messages it has not seen. The cache holds at most max_entries rows and evicts
+the least recently used ones beyond that.
+"""
+
+import sqlite3
+import time
+from collections import Counter
+from collections.abc import Callable, Iterable, Sequence
+from dataclasses import dataclass, field
+from email.utils import parseaddr
+from pathlib import Path
+
+from gmail_cleanup.auth import TOKEN_PATH
+from gmail_cleanup.gmail_client import batch_execute
+from gmail_cleanup.rate_limit import RateLimiter, execute_paced
+
+# Lives next to the cached token and the journal.
+METADATA_CACHE_PATH = TOKEN_PATH.with_name("metadata.db")
+
+# About 100 bytes a row: the default bound keeps the file near 50 MB.
+DEFAULT_MAX_ENTRIES = 500_000
+
+# IDs looked up, fetched and cached per round, so an interrupted report keeps
+# everything fetched before it stopped.
+REPORT_BLOCK = 1000
+
+# Rows shown in each table of the printed report.
+REPORT_TOP = 10
+
+# Only the From header, labels and size are read.
+METADATA_FIELDS = "id,labelIds,sizeEstimate,payload/headers"
+
+# SQLite limits bound parameters per statement; stay well below it.
+_LOOKUP_CHUNK = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS metadata (
+    message_id TEXT PRIMARY KEY,
+    sender TEXT NOT NULL,
+    labels TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    used REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS metadata_used ON metadata (used);
+"""
+
+
+@dataclass(frozen=True)
+class MessageMetadata:
+    """The parts of a message the report reads."""
+
+    sender: str
+    labels: tuple[str, ...]
+    size: int
+
+    @classmethod
+    def from_message(cls, message: dict) -> "MessageMetadata":
+        """Build from a format=metadata message resource."""
+        headers = message.get("payload", {}).get("headers", [])
+        raw = next((h["value"] for h in headers if h["name"].lower() == "from"), "")
+        address = parseaddr(raw)[1].lower()
+        return cls(
+            sender=address or raw or "(unknown)",
+            labels=tuple(message.get("labelIds", [])),
+            size=int(message.get("sizeEstimate", 0)),
+        )
+
+
+class MetadataCache:
+    """On-disk MessageMetadata by message ID, bounded to max_entries rows.
+
+    Reads refresh a row's last-used time; writes evict the least recently used
+    rows once the table is over its bound. Not thread-safe — call from the
+    main thread only.
+    """
+
+    def __init__(self, path: Path | None = None, max_entries: int = DEFAULT_MAX_ENTRIES) -> None:
+        path = path or METADATA_CACHE_PATH
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self._conn = sqlite3.connect(str(path))
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM metadata").fetchone()[0]
+
+    def get_many(self, message_ids: Sequence[str]) -> dict[str, MessageMetadata]:
+        """Return cached metadata for whichever of message_ids are present."""
+        found: dict[str, MessageMetadata] = {}
+        for start in range(0, len(message_ids), _LOOKUP_CHUNK):
+            chunk = list(message_ids[start:start + _LOOKUP_CHUNK])
+            placeholders = ",".join("?" * len(chunk))
+            for message_id, sender, labels, size in self._conn.execute(
+                "SELECT message_id, sender, labels, size FROM metadata "
+                f"WHERE message_id IN ({placeholders})",
+                chunk,
+            ):
+                found[message_id] = MessageMetadata(sender, tuple(labels.split()), size)
+        if found:
+            now = time.time()
+            with self._conn:
+                self._conn.executemany(
+                    "UPDATE metadata SET used = ? WHERE message_id = ?",
+                    ((now, message_id) for message_id in found),
+                )
+        return found
+
+    def put_many(self, metadata: dict[str, MessageMetadata]) -> None:
+        """Store metadata, then evict least recently used rows over the bound."""
+        now = time.time()
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO metadata (message_id, sender, labels, size, used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    (message_id, m.sender, " ".join(m.labels), m.size, now)
+                    for message_id, m in metadata.items()
+                ),
+            )
+            excess = len(self) - self.max_entries
+            if excess > 0:
+                self._conn.execute(
+                    "DELETE FROM metadata WHERE message_id IN "
+                    "(SELECT message_id FROM metadata ORDER BY used LIMIT ?)",
+                    (excess,),
+                )
+
+
+@dataclass
+class Report:
+    """Totals over the matched messages, by sender and by label."""
+
+    messages: int = 0
+    total_bytes: int = 0
+    sender_messages: Counter[str] = field(default_factory=Counter)
+    sender_bytes: Counter[str] = field(default_factory=Counter)
+    label_messages: Counter[str] = field(default_factory=Counter)
+    label_names: dict[str, str] = field(default_factory=dict)
+    cached: int = 0  # served from the cache
+    fetched: int = 0  # fetched from the API this run
+    missing: int = 0  # gone since the scan (HTTP 404)
+
+    def add(self, metadata: MessageMetadata) -> None:
+        self.messages += 1
+        self.total_bytes += metadata.size
+        self.sender_messages[metadata.sender] += 1
+        self.sender_bytes[metadata.sender] += metadata.size
+        self.label_messages.update(metadata.labels)
+
+    def top_senders(self, n: int) -> list[tuple[str, int, int]]:
+        """Return (sender, messages, bytes) for the n senders with the most bytes."""
+        return [
+            (sender, self.sender_messages[sender], size)
+            for sender, size in self.sender_bytes.most_common(n)
+        ]
+
+    def top_labels(self, n: int) -> list[tuple[str, int]]:
+        """Return (label name, messages) for the n most common labels."""
+        return [
+            (self.label_names.get(label, label), count)
+            for label, count in self.label_messages.most_common(n)
+        ]
+
+
+def fetch_metadata(
+    service, message_ids: Iterable[str], limiter: RateLimiter | None = None
+) -> dict[str, MessageMetadata]:
+    """Fetch metadata for message_ids via batched messages.get calls.
+
+    IDs that no longer exist (HTTP 404) are left out; any other permanent
+    failure is raised.
+    """
+    messages = service.users().messages()
+    responses, failures = batch_execute(
+        service,
+        message_ids,
+        lambda message_id: messages.get(
+            userId="me",
+            id=message_id,
+            format="metadata",
+            metadataHeaders=["From"],
+            fields=METADATA_FIELDS,
+        ),
+        "get",
+        limiter,
+    )
+    for exc in failures.values():
+        if int(exc.resp.status) != 404:
+            raise exc
+    return {
+        message_id: MessageMetadata.from_message(message)
+        for message_id, message in responses.items()
+    }
+
+
+def build_report(
+    service,
+    message_ids: Sequence[str],
+    cache: MetadataCache,
+    limiter: RateLimiter | None = None,
+    on_progress: Callable[[int], None] | None = None,
+) -> Report:
+    """Aggregate sender, label and size totals for message_ids.
+
+    Works in blocks of REPORT_BLOCK IDs: cached metadata is read, the rest is
+    fetched and cached before the next block starts. on_progress(n) is called
+    with the size of each finished block.
+    """
+    report = Report()
+    labels = execute_paced(service.users().labels().list(userId="me"), "labels", limiter)
+    report.label_names = {label["id"]: label["name"] for label in labels.get("labels", [])}
+
+    for start in range(0, len(message_ids), REPORT_BLOCK):
+        block = message_ids[start:start + REPORT_BLOCK]
+        cached = cache.get_many(block)
+        fetched = fetch_metadata(
+            service, [message_id for message_id in block if message_id not in cached], limiter
+        )
+        cache.put_many(fetched)
+        for metadata in (*cached.values(), *fetched.values()):
+            report.add(metadata)
+        report.cached += len(cached)
+        report.fetched += len(fetched)
+        report.missing += len(block) - len(cached) - len(fetched)
+        if on_progress is not None:
+            on_progress(len(block))
+    return report
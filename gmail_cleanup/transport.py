@@ -0,0 +1,126 @@
+"""Pooled keep-alive HTTP transport for the Gmail API client.
+
+googleapiclient talks to an httplib2.Http-shaped object. The default one opens a
+connection per Http instance and is not thread-safe, so every worker thread used
+to pay its own TCP + TLS handshake. PooledHttp keeps the httplib2 interface but
+sends requests through a requests session whose urllib3 pool is shared by all
+threads, so warm connections are reused across pages, chunks and workers.
+
+requests and httplib2 are imported inside PooledHttp so the CLI can read
+TransportConfig defaults without loading them.
+"""
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import httplib2
+
+    from gmail_cleanup.auth import CredentialManager
+
+DEFAULT_CONNECT_TIMEOUT = 10.0
+DEFAULT_READ_TIMEOUT = 60.0
+
+# Kept connections per host. Callers beyond this wait for a free connection
+# rather than opening a throwaway one.
+DEFAULT_POOL_SIZE = 16
+
+
+@dataclass(frozen=True)
+class TransportConfig:
+    """Timeouts (seconds) and connection pool size for PooledHttp."""
+
+    connect_timeout: float = DEFAULT_CONNECT_TIMEOUT
+    read_timeout: float = DEFAULT_READ_TIMEOUT
+    pool_size: int = DEFAULT_POOL_SIZE
+
+
+class PooledHttp:
+    """Thread-safe, httplib2.Http-compatible adapter over a pooled requests session.
+
+    With a CredentialManager, every request carries its current bearer token,
+    and a 401 triggers one shared refresh and a single retry. Without, requests
+    are unauthenticated (used against the local fake server in benchmarks/).
+
+    Timeouts surface as TimeoutError and connection failures as ConnectionError,
+    the same exception types httplib2 raises.
+    """
+
+    def __init__(
+        self, manager: "CredentialManager | None" = None, config: TransportConfig | None = None
+    ) -> None:
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        self.config = config or TransportConfig()
+        # Retries belong to the callers (they know the quota cost and backoff),
+        # so the adapter never retries on its own.
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=self.config.pool_size,
+            pool_block=True,
+            max_retries=0,
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        self.manager = manager
+        # Read by googleapiclient to sign the sub-requests inside a batch.
+        self.credentials = manager.credentials if manager is not None else None
+        self._session = session
+
+    def request(
+        self,
+        uri: str,
+        method: str = "GET",
+        body=None,
+        headers: dict | None = None,
+        redirections: int = 5,
+        connection_type=None,
+    ) -> tuple["httplib2.Response", bytes]:
+        """Send one request; same signature and return shape as httplib2.Http.request."""
+        import httplib2
+        import requests
+
+        def send(token: str | None) -> "requests.Response":
+            request_headers = dict(headers or {})
+            if token is not None:
+                request_headers["authorization"] = f"Bearer {token}"
+            try:
+                return self._session.request(
+                    method,
+                    uri,
+                    data=body,
+                    headers=request_headers,
+                    timeout=(self.config.connect_timeout, self.config.read_timeout),
+                    allow_redirects=redirections > 0,
+                )
+            except requests.Timeout as exc:
+                raise TimeoutError(f"{method} {uri} timed out: {exc}") from exc
+            except requests.ConnectionError as exc:
+                raise ConnectionError(f"{method} {uri} failed: {exc}") from exc
+
+        token = self.manager.token() if self.manager is not None else None
+        response = send(token)
+        if response.status_code == 401 and self.manager is not None:
+            # Revoked or expired early: refresh once (shared with any other
+            # thread that saw the same token rejected) and retry.
+            self.manager.refresh(token)
+            response = send(self.manager.token())
+
+        content = response.content
+        info = {key.lower(): value for key, value in response.headers.items()}
+        # urllib3 has already decoded gzip; record it the way httplib2 does so
+        # TransferStats can still count compressed pages.
+        encoding = info.pop("content-encoding", None)
+        if encoding is not None:
+            info["-content-encoding"] = encoding
+            info["content-length"] = str(len(content))
+        info["status"] = str(response.status_code)
+        resp = httplib2.Response(info)
+        resp.reason = response.reason
+        return resp, content
+
+    def close(self) -> None:
+        """Close every pooled connection."""
+        self._session.close()
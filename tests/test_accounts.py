@@ -0,0 +1,119 @@
+"""Unit tests for the --accounts engine in gmail_cleanup.accounts."""
+import time
+from contextlib import ExitStack
+from datetime import datetime, timezone
+from functools import partial
+from unittest.mock import patch
+
+import pytest
+
+from benchmarks.fake_gmail import MAILBOX_END, FakeGmailConfig, FakeGmailServer, service_for
+from gmail_cleanup.accounts import delete_accounts, discover_accounts, scan_accounts
+from gmail_cleanup.auth import AuthenticationRequiredError
+from gmail_cleanup.date_utils import build_gmail_query
+from gmail_cleanup.transport import PooledHttp
+
+CUTOFF = datetime.fromtimestamp(MAILBOX_END, tz=timezone.utc)
+QUERY = build_gmail_query(CUTOFF)
+
+
+@pytest.fixture
+def fleet(tmp_path):
+    """Token files for three accounts, each backed by its own fake mailbox."""
+    sizes = {"alice": 700, "bob": 0, "carol": 1200}
+    with ExitStack() as stack:
+        servers = {
+            name: stack.enter_context(
+                FakeGmailServer(FakeGmailConfig(messages=size, seed=index))
+            )
+            for index, (name, size) in enumerate(sizes.items())
+        }
+        for name in servers:
+            (tmp_path / f"{name}.json").write_text("{}")
+
+        # Credentials are the token path itself; the factory routes each
+        # account to its own server.
+        def get_credentials(token_path, interactive=True):
+            return token_path
+
+        def service_factory_for(credentials, config=None, token_path=None):
+            return partial(service_for, servers[credentials.stem].url, PooledHttp())
+
+        stack.enter_context(patch("gmail_cleanup.accounts.get_credentials", get_credentials))
+        stack.enter_context(
+            patch("gmail_cleanup.accounts.service_factory_for", service_factory_for)
+        )
+        yield tmp_path, servers
+
+
+class TestAccounts:
+
+    def test_discover_accounts_sorted_by_name(self, tmp_path):
+        """Every *.json token file is one account, named after its stem."""
+        for name in ("zed.json", "amy.json", "notes.txt"):
+            (tmp_path / name).write_text("{}")
+        assert [a.name for a in discover_accounts(tmp_path)] == ["amy", "zed"]
+
+    def test_scan_and_delete_every_mailbox(self, fleet):
+        """Each account is scanned and emptied against its own mailbox."""
+        directory, servers = fleet
+        accounts = discover_accounts(directory)
+        scan_accounts(accounts, QUERY, CUTOFF)
+        assert {a.name: a.found for a in accounts} == {"alice": 700, "bob": 0, "carol": 1200}
+
+        delete_accounts(accounts, workers=2)
+        assert {a.name: a.deleted for a in accounts} == {"alice": 700, "bob": 0, "carol": 1200}
+        assert servers["bob"].stats.batch_delete == 0
+        assert all(a.error is None for a in accounts)
+
+    def test_sharded_scan_per_account(self, fleet):
+        """scan_workers > 1 uses the sharded scan inside each account."""
+        directory, _ = fleet
+        accounts = discover_accounts(directory)
+        scan_accounts(accounts, QUERY, CUTOFF, scan_workers=3)
+        assert [a.found for a in accounts] == [700, 0, 1200]
+
+    def test_failed_account_does_not_stop_others(self, fleet):
+        """An account whose token cannot be used is reported; the rest complete."""
+        directory, _ = fleet
+
+        def get_credentials(token_path, interactive=True):
+            if token_path.stem == "bob":
+                raise AuthenticationRequiredError("no usable token")
+            return token_path
+
+        accounts = discover_accounts(directory)
+        with patch("gmail_cleanup.accounts.get_credentials", get_credentials):
+            scan_accounts(accounts, QUERY, CUTOFF)
+        delete_accounts(accounts)
+        results = {a.name: (a.deleted, a.error) for a in accounts}
+        assert results["alice"] == (700, None)
+        assert results["carol"] == (1200, None)
+        assert results["bob"][0] == 0 and "no usable token" in results["bob"][1]
+
+    def test_accounts_run_concurrently(self, tmp_path):
+        """Four slow mailboxes take about as long as one, not four times as long."""
+        with ExitStack() as stack:
+            servers = [
+                stack.enter_context(FakeGmailServer(FakeGmailConfig(messages=10, latency=0.3)))
+                for _ in range(4)
+            ]
+            for index in range(4):
+                (tmp_path / f"{index}.json").write_text("{}")
+            stack.enter_context(
+                patch("gmail_cleanup.accounts.get_credentials", lambda path, interactive: path)
+            )
+            stack.enter_context(
+                patch(
+                    "gmail_cleanup.accounts.service_factory_for",
+                    lambda path, config, token_path: partial(
+                        service_for, servers[int(path.stem)].url
+                    ),
+                )
+            )
+            accounts = discover_accounts(tmp_path)
+            start = time.monotonic()
+            scan_accounts(accounts, QUERY, CUTOFF)
+            elapsed = time.monotonic() - start
+        assert [a.found for a in accounts] == [10] * 4
+        assert elapsed < 1.0  # sequential would be >= 1.2s
@@ -0,0 +1,116 @@
+"""Unit tests for CredentialManager and save_token in gmail_cleanup.auth."""
+import datetime
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+
+from gmail_cleanup.auth import CredentialManager, save_token
+from gmail_cleanup.transport import PooledHttp
+
+
+class FakeCredentials:
+    """Stand-in for google.oauth2 Credentials: each refresh issues token-N."""
+
+    def __init__(self, expires_in: float, refresh_seconds: float = 0.0):
+        self.token = "token-0"
+        self.expiry = self._utc_in(expires_in)
+        self.refresh_seconds = refresh_seconds
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _utc_in(seconds: float) -> datetime.datetime:
+        now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        return now + datetime.timedelta(seconds=seconds)
+
+    def refresh(self, request):
+        time.sleep(self.refresh_seconds)
+        with self._lock:
+            self.calls += 1
+            self.token = f"token-{self.calls}"
+        self.expiry = self._utc_in(3600)
+
+    def to_json(self):
+        return json.dumps({"token": self.token})
+
+
+class TestCredentialManager:
+
+    def test_fresh_token_is_not_refreshed(self, tmp_path):
+        """A token well before its refresh margin is used as is."""
+        creds = FakeCredentials(expires_in=3600)
+        manager = CredentialManager(creds, tmp_path / "token.json")
+        assert manager.token() == "token-0"
+        assert creds.calls == 0
+
+    def test_concurrent_callers_share_one_refresh(self, tmp_path):
+        """Twenty threads finding the token inside the margin trigger one refresh."""
+        creds = FakeCredentials(expires_in=60, refresh_seconds=0.1)
+        manager = CredentialManager(creds, tmp_path / "token.json")
+        with ThreadPoolExecutor(max_workers=20) as pool:
+            tokens = list(pool.map(lambda _: manager.token(), range(20)))
+        assert tokens == ["token-1"] * 20
+        assert creds.calls == 1
+        assert json.loads((tmp_path / "token.json").read_text()) == {"token": "token-1"}
+
+    def test_background_thread_refreshes_ahead_of_expiry(self, tmp_path):
+        """start() refreshes once the token enters the margin, before any caller asks."""
+        margin = datetime.timedelta(seconds=60)
+        creds = FakeCredentials(expires_in=60.2)
+        manager = CredentialManager(creds, tmp_path / "token.json", margin=margin).start()
+        try:
+            deadline = time.monotonic() + 2
+            while creds.calls == 0 and time.monotonic() < deadline:
+                time.sleep(0.02)
+        finally:
+            manager.stop()
+        assert creds.calls == 1
+        assert manager.token() == "token-1"
+
+    def test_refresh_after_401_is_shared(self, tmp_path):
+        """Several callers reporting the same rejected token cause one refresh."""
+        creds = FakeCredentials(expires_in=3600)
+        manager = CredentialManager(creds, tmp_path / "token.json")
+        for _ in range(5):
+            manager.refresh("token-0")
+        assert creds.calls == 1
+
+    def test_pooled_http_retries_401_with_new_token(self, tmp_path):
+        """A 401 refreshes the token and the request is sent once more with it."""
+        creds = FakeCredentials(expires_in=3600)
+        http = PooledHttp(CredentialManager(creds, tmp_path / "token.json"))
+        sent = []
+
+        def request(method, uri, headers, **kwargs):
+            sent.append(headers["authorization"])
+            status = 401 if len(sent) == 1 else 200
+            return MagicMock(status_code=status, reason="", content=b"{}", headers={})
+
+        http._session.request = request
+        resp, _ = http.request("https://example.invalid/")
+        assert resp.status == 200
+        assert sent == ["Bearer token-0", "Bearer token-1"]
+        assert http.credentials is creds
+
+
+class TestSaveToken:
+
+    def test_owner_only_and_no_temp_files(self, tmp_path):
+        """The token is written with mode 0600 and the temporary file is renamed away."""
+        path = tmp_path / "config" / "token.json"
+        save_token(FakeCredentials(expires_in=3600), path)
+        assert path.stat().st_mode & 0o777 == 0o600
+        assert [p.name for p in path.parent.iterdir()] == ["token.json"]
+
+    def test_concurrent_writers_leave_valid_json(self, tmp_path):
+        """Racing writers never leave a truncated or interleaved token file."""
+        path = tmp_path / "token.json"
+        creds = [FakeCredentials(expires_in=3600) for _ in range(8)]
+        for index, c in enumerate(creds):
+            c.token = f"token-{index}" * 500
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(lambda c: [save_token(c, path) for _ in range(20)], creds))
+        assert json.loads(path.read_text())["token"] in {c.token for c in creds}
+        assert [p.name for p in tmp_path.iterdir()] == ["token.json"]
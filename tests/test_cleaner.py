@@ -3,7 +3,8 @@ import pytest
 from unittest.mock import MagicMock, patch
 from googleapiclient.errors import HttpError
 
-from gmail_cleanup.cleaner import batch_delete
+from gmail_cleanup.cleaner import batch_delete, stream_delete
+from gmail_cleanup.rate_limit import RateLimiter
 
 
 def make_http_error(status: int) -> HttpError:
@@ -28,6 +29,22 @@ class TestBatchDelete:
         result = batch_delete(mock_service, ids)
         assert mock_service.users().messages().batchDelete.call_count == 2
 
+    def test_chunks_are_sliced_as_they_are_sent(self):
+        """Each chunk is read from the ID sequence just before its batchDelete, not up front."""
+        events = []
+
+        class LoggedIds(list):
+            def __getitem__(self, index):
+                events.append("slice")
+                return super().__getitem__(index)
+
+        mock_service = MagicMock()
+        mock_service.users().messages().batchDelete.side_effect = (
+            lambda **kwargs: events.append("send") or MagicMock()
+        )
+        assert batch_delete(mock_service, LoggedIds(map(str, range(1200)))) == 1200
+        assert events == ["slice", "send"] * 3
+
     def test_success_returns_count(self):
         """3 IDs, success path returns 3."""
         mock_service = MagicMock()
@@ -48,6 +65,18 @@ class TestBatchDelete:
         assert result == 2
         mock_sleep.assert_called_once()
 
+    def test_429_throttles_shared_limiter(self):
+        """A 429 halves the limiter rate that listing shares with deletion."""
+        mock_service = MagicMock()
+        mock_service.users().messages().batchDelete().execute.side_effect = [
+            make_http_error(429),
+            None,
+        ]
+        limiter = RateLimiter(rate=200)
+        with patch("time.sleep"):
+            batch_delete(mock_service, ["a"], limiter=limiter)
+        assert limiter.rate < 200
+
     def test_no_retry_on_403(self):
         """HttpError(403) raises immediately; batchDelete called once; sleep not called."""
         mock_service = MagicMock()
@@ -71,3 +100,322 @@ class TestBatchDelete:
             result = batch_delete(mock_service, ids)
         assert result == 3
         assert mock_sleep.call_count == 2
+
+    def test_retry_on_connection_error(self):
+        """A dropped connection or timeout is retried like a 5xx, not raised."""
+        mock_service = MagicMock()
+        mock_service.users().messages().batchDelete().execute.side_effect = [
+            ConnectionError("reset"),
+            TimeoutError("timed out"),
+            None,
+        ]
+        limiter = RateLimiter()
+        with patch("time.sleep") as mock_sleep:
+            assert batch_delete(mock_service, ["a", "b"], limiter=limiter) == 2
+        assert mock_sleep.call_count == 2
+        assert limiter.metrics.to_dict()["retries"]["batchDelete"] == {"error": 2}
+
+
+class TestStreamDelete:
+
+    def test_regroups_pages_into_full_chunks(self):
+        """Pages of 300 IDs are deleted as 500-ID chunks plus a remainder."""
+        mock_service = MagicMock()
+        pages = [[f"{p}_{i}" for i in range(300)] for p in range(3)]
+        result = stream_delete(mock_service, iter(pages))
+        assert result == 900
+        calls = mock_service.users().messages().batchDelete.call_args_list
+        sizes = [len(c.kwargs["body"]["ids"]) for c in calls if c.kwargs]
+        assert sizes == [500, 400]
+
+    def test_empty_stream(self):
+        mock_service = MagicMock()
+        assert stream_delete(mock_service, iter([])) == 0
+        mock_service.users().messages().batchDelete.assert_not_called()
+
+    def test_listing_error_is_reraised(self):
+        """An HttpError raised by the page iterator surfaces in the caller."""
+        def pages():
+            yield ["a"]
+            raise make_http_error(500)
+
+        with pytest.raises(HttpError):
+            stream_delete(MagicMock(), pages())
+
+    def test_retries_chunk_on_429(self):
+        mock_service = MagicMock()
+        mock_service.users().messages().batchDelete().execute.side_effect = [
+            make_http_error(429),
+            None,
+        ]
+        with patch("time.sleep") as mock_sleep:
+            result = stream_delete(mock_service, iter([["a", "b"]]))
+        assert result == 2
+        mock_sleep.assert_called_once()
+
+
+class TestBatchDeleteWorkers:
+
+    def test_workers_delete_every_chunk(self):
+        """1201 IDs across 3 workers -> 3 chunks deleted, full count returned."""
+        services = []
+
+        def factory():
+            svc = MagicMock()
+            services.append(svc)
+            return svc
+
+        ids = [str(i) for i in range(1201)]
+        result = batch_delete(MagicMock(), ids, workers=3, service_factory=factory)
+        assert result == 1201
+        calls = sum(
+            len([c for c in s.users().messages().batchDelete.call_args_list if c.kwargs])
+            for s in services
+        )
+        assert calls == 3
+
+    def test_each_worker_gets_its_own_service(self):
+        """The shared service passed in is never used by worker threads."""
+        shared = MagicMock()
+        ids = [str(i) for i in range(1000)]
+        batch_delete(shared, ids, workers=2, service_factory=MagicMock)
+        shared.users().messages().batchDelete.assert_not_called()
+
+    def test_workers_require_factory(self):
+        with pytest.raises(ValueError):
+            batch_delete(MagicMock(), ["a"], workers=2)
+
+    def test_worker_retries_on_503(self):
+        svc = MagicMock()
+        svc.users().messages().batchDelete().execute.side_effect = [
+            make_http_error(503),
+            None,
+        ]
+        with patch("time.sleep") as mock_sleep:
+            result = batch_delete(MagicMock(), ["a"], workers=2, service_factory=lambda: svc)
+        assert result == 1
+        mock_sleep.assert_called_once()
+
+    def test_worker_error_propagates(self):
+        svc = MagicMock()
+        svc.users().messages().batchDelete().execute.side_effect = make_http_error(403)
+        with pytest.raises(HttpError):
+            batch_delete(MagicMock(), ["a", "b"], workers=2, service_factory=lambda: svc)
+
+
+class TestBatchDeleteResume:
+
+    def test_skip_chunks_are_not_sent(self):
+        """Chunk 0 already deleted -> only chunk 1 is sent."""
+        mock_service = MagicMock()
+        ids = [str(i) for i in range(700)]
+        result = batch_delete(mock_service, ids, skip_chunks={0})
+        assert result == 200
+        calls = [c for c in mock_service.users().messages().batchDelete.call_args_list if c.kwargs]
+        assert [c.kwargs["body"]["ids"] for c in calls] == [ids[500:]]
+
+    def test_on_chunk_deleted_reports_indexes(self):
+        done = []
+        ids = [str(i) for i in range(1200)]
+        batch_delete(MagicMock(), ids, on_chunk_deleted=done.append)
+        assert done == [0, 1, 2]
+
+    def test_on_chunk_deleted_with_workers(self):
+        done = []
+        ids = [str(i) for i in range(1200)]
+        batch_delete(MagicMock(), ids, workers=2, service_factory=MagicMock, on_chunk_deleted=done.append)
+        assert sorted(done) == [0, 1, 2]
+
+
+def unpaced() -> RateLimiter:
+    # Bisecting and trashing send many calls; lift the quota so tests are not paced.
+    return RateLimiter(rate=1_000_000)
+
+
+def reject_ids(bad: set[str], status: int = 400):
+    """batchDelete side effect that fails any request naming an ID in bad."""
+    calls: list[list[str]] = []
+
+    def batch_delete_request(userId, body):
+        calls.append(body["ids"])
+        request = MagicMock()
+        if bad & set(body["ids"]):
+            request.execute.side_effect = make_http_error(status)
+        return request
+
+    return batch_delete_request, calls
+
+
+class TestBatchDeleteIsolation:
+
+    def test_single_bad_id_is_isolated(self):
+        """One stale ID in a 500-ID chunk is reported; the other 499 are deleted."""
+        ids = [str(i) for i in range(500)]
+        service = MagicMock()
+        side_effect, calls = reject_ids({"137"})
+        service.users().messages().batchDelete.side_effect = side_effect
+        rejected: dict[str, int] = {}
+        done: list[int] = []
+        result = batch_delete(
+            service,
+            ids,
+            limiter=unpaced(),
+            on_rejected=rejected.update,
+            on_chunk_deleted=done.append,
+        )
+        assert result == 499
+        assert rejected == {"137": 400}
+        assert done == [0]
+        # 1 failed chunk + 2 calls per halving level (9 levels for 500 IDs)
+        assert len(calls) <= 1 + 2 * 9
+        deleted = {i for call in calls for i in call if not {"137"} & set(call)}
+        assert deleted == set(ids) - {"137"}
+
+    def test_extra_calls_scale_with_bad_ids_not_chunks(self):
+        """Clean chunks still cost one call each when a different chunk has bad IDs."""
+        ids = [str(i) for i in range(2000)]
+        service = MagicMock()
+        side_effect, calls = reject_ids({"5", "6"}, status=404)
+        service.users().messages().batchDelete.side_effect = side_effect
+        rejected: dict[str, int] = {}
+        assert batch_delete(service, ids, limiter=unpaced(), on_rejected=rejected.update) == 1998
+        assert rejected == {"5": 404, "6": 404}
+        assert len([call for call in calls if len(call) == 500]) == 4
+        assert len(calls) <= 4 + 2 * 2 * 9
+
+    def test_isolation_with_workers(self):
+        """Rejected IDs found on worker threads reach on_rejected."""
+        service = MagicMock()
+        side_effect, _ = reject_ids({"3", "700"})
+        service.users().messages().batchDelete.side_effect = side_effect
+        rejected: dict[str, int] = {}
+        result = batch_delete(
+            service,
+            [str(i) for i in range(1000)],
+            workers=2,
+            service_factory=lambda: service,
+            limiter=unpaced(),
+            on_rejected=rejected.update,
+        )
+        assert result == 998
+        assert set(rejected) == {"3", "700"}
+
+    def test_auth_errors_are_not_bisected(self):
+        """A 403 fails the run at once instead of splitting the chunk."""
+        service = MagicMock()
+        side_effect, calls = reject_ids({"1"}, status=403)
+        service.users().messages().batchDelete.side_effect = side_effect
+        with pytest.raises(HttpError):
+            batch_delete(service, ["1", "2", "3"])
+        assert len(calls) == 1
+
+
+class FakeTrashBatch:
+    """Stand-in for BatchHttpRequest: answers each trash sub-request via respond(id)."""
+
+    def __init__(self, respond, callback, sizes):
+        self._respond = respond
+        self._callback = callback
+        self._sizes = sizes
+        self._ids = []
+
+    def add(self, request, request_id):
+        self._ids.append(request_id)
+
+    def execute(self):
+        self._sizes.append(len(self._ids))
+        for message_id in self._ids:
+            outcome = self._respond(message_id)
+            if isinstance(outcome, HttpError):
+                self._callback(message_id, None, outcome)
+            else:
+                self._callback(message_id, outcome, None)
+
+
+def make_trash_service(respond=lambda message_id: {"id": message_id}):
+    service = MagicMock()
+    sizes: list[int] = []
+    service.new_batch_http_request.side_effect = (
+        lambda callback: FakeTrashBatch(respond, callback, sizes)
+    )
+    return service, sizes
+
+
+class TestBatchTrash:
+
+    def test_trash_packs_100_per_batch(self):
+        """250 IDs go out as batches of 100, 100 and 50; batchDelete is never called."""
+        service, sizes = make_trash_service()
+        ids = [str(i) for i in range(250)]
+        assert batch_delete(service, ids, trash=True, limiter=unpaced()) == 250
+        assert sizes == [100, 100, 50]
+        service.users().messages().batchDelete.assert_not_called()
+
+    def test_trash_chunks_match_batch_delete(self):
+        """Chunks are still 500 IDs, so resume indexes mean the same in both modes."""
+        service, sizes = make_trash_service()
+        done = []
+        batch_delete(
+            service,
+            [str(i) for i in range(501)],
+            limiter=unpaced(),
+            on_chunk_deleted=done.append,
+            trash=True,
+        )
+        assert done == [0, 1]
+        assert sizes == [100] * 5 + [1]
+
+    def test_only_failed_subrequests_are_retried(self):
+        """A 503 on one message re-sends only that message."""
+        calls: dict[str, int] = {}
+
+        def respond(message_id):
+            calls[message_id] = calls.get(message_id, 0) + 1
+            if message_id == "b" and calls[message_id] == 1:
+                return make_http_error(503)
+            return {"id": message_id}
+
+        service, sizes = make_trash_service(respond)
+        with patch("time.sleep"):
+            assert batch_delete(service, ["a", "b", "c"], trash=True, limiter=unpaced()) == 3
+        assert sizes == [3, 1]
+
+    def test_missing_message_is_skipped(self):
+        """A 404 means already gone: not counted, not raised."""
+        service, _ = make_trash_service(
+            lambda message_id: make_http_error(404) if message_id == "b" else {"id": message_id}
+        )
+        assert batch_delete(service, ["a", "b", "c"], trash=True, limiter=unpaced()) == 2
+
+    def test_invalid_id_is_rejected(self):
+        """A 400 on one sub-request rejects that ID only."""
+        service, _ = make_trash_service(
+            lambda message_id: make_http_error(400) if message_id == "b" else {"id": message_id}
+        )
+        rejected: dict[str, int] = {}
+        result = batch_delete(
+            service, ["a", "b", "c"], limiter=unpaced(), trash=True, on_rejected=rejected.update
+        )
+        assert result == 2
+        assert rejected == {"b": 400}
+
+    def test_permanent_failure_raises(self):
+        """A 403 on any message fails the run."""
+        service, _ = make_trash_service(lambda message_id: make_http_error(403))
+        with pytest.raises(HttpError):
+            batch_delete(service, ["a"], trash=True, limiter=unpaced())
+
+    def test_stream_trash_with_workers(self):
+        """stream_delete trashes on worker threads when trash=True."""
+        service, sizes = make_trash_service()
+        pages = [[str(i) for i in range(300)], [str(i) for i in range(300, 700)]]
+        result = stream_delete(
+            service,
+            iter(pages),
+            workers=2,
+            service_factory=lambda: service,
+            limiter=unpaced(),
+            trash=True,
+        )
+        assert result == 700
+        assert sum(sizes) == 700
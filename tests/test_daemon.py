@@ -0,0 +1,92 @@
+"""Tests for gmail_cleanup.daemon — watermark windows and --daemon ticks."""
+from datetime import datetime, timezone
+from unittest.mock import MagicMock, patch
+
+import httplib2
+import pytest
+import typer
+from googleapiclient.errors import HttpError
+
+from benchmarks.fake_gmail import FakeGmailConfig, FakeGmailServer, service_for
+from gmail_cleanup.daemon import run_tick, tick_query
+from gmail_cleanup.journal import RunJournal
+from gmail_cleanup.main import _run_daemon, _target_key
+from gmail_cleanup.rate_limit import RateLimiter
+
+TARGET = "older-than:12"
+
+
+def at(epoch: int) -> datetime:
+    return datetime.fromtimestamp(epoch, tz=timezone.utc)
+
+
+@pytest.fixture
+def journal(tmp_path):
+    j = RunJournal(tmp_path / "journal.db")
+    yield j
+    j.close()
+
+
+class TestTickQuery:
+
+    def test_first_tick_is_a_full_scan(self):
+        """Without a watermark the tick lists everything before the cutoff."""
+        assert tick_query(None, at(2000)) == "before:2000"
+
+    def test_later_ticks_list_only_the_new_window(self):
+        """With a watermark only the window up to the new cutoff is listed."""
+        assert tick_query(1000, at(2000)) == "after:999 before:2000"
+        assert tick_query(2000, at(2000)) is None
+
+
+class TestRunTick:
+
+    def test_second_tick_deletes_only_aged_mail(self, journal):
+        """A tick after the first lists and deletes just the window between cutoffs."""
+        with FakeGmailServer(FakeGmailConfig(messages=2000)) as server:
+            epochs = [epoch for epoch, _ in server.mailbox.keys]
+            first, second = epochs[1500], epochs[1600]
+            service = service_for(server.url)
+
+            result = run_tick(service, journal, TARGET, at(first))
+            assert result.deleted == 1500
+            assert journal.load_watermark(TARGET) == first
+
+            lists = server.stats.list
+            result = run_tick(service, journal, TARGET, at(second))
+            assert result.query == f"after:{first - 1} before:{second}"
+            assert result.found == result.deleted == 100
+            assert server.stats.list - lists == 1
+            assert journal.load_watermark(TARGET) == second
+            assert server.mailbox.deleted == {key[1] for key in server.mailbox.keys[:1600]}
+
+    def test_failed_tick_keeps_watermark(self, journal):
+        """A listing error propagates and the watermark does not move."""
+        journal.save_watermark(TARGET, 1000)
+        service = MagicMock()
+        service.users().messages().list().execute.side_effect = HttpError(
+            resp=httplib2.Response({"status": "403"}), content=b"forbidden"
+        )
+        with pytest.raises(HttpError):
+            run_tick(service, journal, TARGET, at(2000))
+        assert journal.load_watermark(TARGET) == 1000
+
+
+class TestDaemonLoop:
+
+    def test_network_error_is_retried_next_interval(self, tmp_path, capsys):
+        """A tick that dies with ConnectionError is reported and the next tick still runs."""
+        journal = RunJournal(tmp_path / "journal.db")
+        journal.save_watermark(_target_key(12, None, False), 1000)
+        journal.close()
+        ticks = MagicMock(side_effect=[ConnectionError("reset"), KeyboardInterrupt])
+        with (
+            patch("gmail_cleanup.journal.JOURNAL_PATH", tmp_path / "journal.db"),
+            patch("gmail_cleanup.daemon.run_tick", ticks),
+            patch("gmail_cleanup.main.time.sleep"),
+            pytest.raises(typer.Exit) as excinfo,
+        ):
+            _run_daemon(MagicMock(), 12, 1, 1, 60, RateLimiter())
+        assert excinfo.value.exit_code == 0
+        assert ticks.call_count == 2
+        assert "Tick failed. reset. Retrying in 60s." in capsys.readouterr().err
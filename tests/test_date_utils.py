@@ -5,9 +5,12 @@ import pytest
 from dateutil.relativedelta import relativedelta
 
 from gmail_cleanup.date_utils import (
+    GMAIL_EPOCH,
     build_gmail_query,
+    build_window_query,
     months_ago_to_cutoff,
     parse_date_to_cutoff,
+    split_epoch_windows,
 )
 
 
@@ -88,3 +91,30 @@ class TestBuildGmailQuery:
         result = build_gmail_query(cutoff)
         epoch_part = result[7:]
         assert epoch_part.isdigit()
+
+
+class TestSplitEpochWindows:
+    def test_windows_are_contiguous_up_to_cutoff(self):
+        cutoff = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        windows = split_epoch_windows(cutoff, 4)
+        assert windows[0] == (None, GMAIL_EPOCH)
+        assert windows[-1][1] == int(cutoff.timestamp())
+        for (_, prev_end), (start, _) in zip(windows, windows[1:]):
+            assert start == prev_end
+
+    def test_shard_count(self):
+        cutoff = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        assert len(split_epoch_windows(cutoff, 4)) == 5  # 4 shards + open-ended
+
+    def test_cutoff_before_floor_is_single_window(self):
+        cutoff = datetime(2000, 1, 1, tzinfo=timezone.utc)
+        assert split_epoch_windows(cutoff, 4) == [(None, int(cutoff.timestamp()))]
+
+
+class TestBuildWindowQuery:
+    def test_open_window_matches_build_gmail_query(self):
+        cutoff = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        assert build_window_query(None, int(cutoff.timestamp())) == build_gmail_query(cutoff)
+
+    def test_lower_bound_widened_by_one_second(self):
+        assert build_window_query(1000, 2000) == "after:999 before:2000"
@@ -0,0 +1,153 @@
+"""End-to-end tests of the real client code against benchmarks.fake_gmail."""
+from datetime import datetime, timezone
+from functools import partial
+from unittest.mock import patch
+
+import pytest
+from googleapiclient.errors import HttpError
+from typer.testing import CliRunner
+
+from benchmarks.fake_gmail import (
+    MAILBOX_END,
+    FakeGmailConfig,
+    FakeGmailServer,
+    service_for,
+)
+from benchmarks.run_bench import _scenarios
+from gmail_cleanup import main as cli
+from gmail_cleanup.cleaner import batch_delete
+from gmail_cleanup.date_utils import build_gmail_query
+from gmail_cleanup.gmail_client import iter_sharded_message_id_pages, list_message_ids
+from gmail_cleanup.rate_limit import RateLimiter, RetryBudget
+
+CUTOFF = datetime.fromtimestamp(MAILBOX_END, tz=timezone.utc)
+
+
+@pytest.fixture
+def server():
+    with FakeGmailServer(FakeGmailConfig(messages=1200, page_size=100)) as server:
+        yield server
+
+
+class TestFakeGmail:
+
+    def test_list_pages_through_mailbox(self, server):
+        """list_message_ids returns every message once, one call per server page."""
+        ids = list_message_ids(service_for(server.url), build_gmail_query(CUTOFF))
+        assert sorted(ids) == sorted(key[1] for key in server.mailbox.keys)
+        assert server.stats.list == 12
+
+    def test_sharded_scan_matches_sequential(self, server):
+        """Epoch-window shards cover the mailbox exactly once."""
+        pages = iter_sharded_message_id_pages(
+            partial(service_for, server.url), CUTOFF, workers=3, shard_target=200
+        )
+        ids = [message_id for page in pages for message_id in page]
+        assert len(ids) == len(set(ids)) == 1200
+
+    def test_batch_delete_empties_mailbox(self, server):
+        """Parallel batch_delete removes every listed ID from the fake mailbox."""
+        service = service_for(server.url)
+        query = build_gmail_query(CUTOFF)
+        ids = list_message_ids(service, query)
+        deleted = batch_delete(
+            service,
+            ids,
+            workers=2,
+            service_factory=partial(service_for, server.url),
+            limiter=RateLimiter(rate=10_000),
+        )
+        assert deleted == server.stats.deleted == 1200
+        assert list_message_ids(service, query) == []
+
+    def test_stale_id_is_isolated(self, server):
+        """An ID unknown to the server is reported and every real message is still deleted."""
+        ids = [message_id for _, message_id in server.mailbox.keys]
+        ids.insert(700, "123456789abcdef")
+        rejected: dict[str, int] = {}
+        deleted = batch_delete(
+            service_for(server.url),
+            ids,
+            limiter=RateLimiter(rate=10_000),
+            on_rejected=rejected.update,
+        )
+        assert deleted == server.stats.deleted == 1200
+        assert rejected == {"123456789abcdef": 400}
+
+    def test_trash_survives_subrequest_errors(self):
+        """Batched trash retries the sub-requests the server fails and trashes every ID."""
+        # Heavy enough that some sub-requests fail many rounds in a row. One
+        # worker draws the server's seeded error rolls in a fixed order.
+        config = FakeGmailConfig(messages=600, rate_5xx=0.4, seed=3)
+        with FakeGmailServer(config) as server, patch("time.sleep"):
+            # IDs come straight from the mailbox so only trashing meets the errors.
+            ids = [message_id for _, message_id in server.mailbox.keys]
+            service = service_for(server.url)
+            trashed = batch_delete(
+                service,
+                ids,
+                limiter=RateLimiter(rate=10_000),
+                show_progress=False,
+                trash=True,
+            )
+            assert trashed == server.stats.trashed == 600
+            assert server.stats.errors_5xx > 0
+            assert server.stats.batch > 6  # 600 IDs fit in 6 batches without retries
+            assert server.stats.batch_delete == 0
+            server.config.rate_5xx = 0.0
+            assert list_message_ids(service, build_gmail_query(CUTOFF)) == []
+
+    def test_injected_429_surfaces_as_http_error(self):
+        """Fault injection reaches the client as a real HttpError with Retry-After."""
+        config = FakeGmailConfig(messages=10, rate_429=1.0, retry_after=3)
+        with FakeGmailServer(config) as server:
+            with pytest.raises(HttpError) as excinfo:
+                list_message_ids(
+                    service_for(server.url),
+                    build_gmail_query(CUTOFF),
+                    budget=RetryBudget(max_retries=0),
+                )
+        assert excinfo.value.resp.status == 429
+        assert excinfo.value.resp["retry-after"] == "3"
+
+
+class TestBenchHarness:
+
+    def test_cli_scenarios_run(self, server):
+        """The cli-* benchmark scenarios drive the real command to completion."""
+        scenarios = _scenarios(server, workers=2, quota_rate=1_000_000, transport="pooled")
+        assert scenarios["cli-dry-run"]() == 1200
+        assert server.mailbox.deleted == set()
+        assert scenarios["cli-execute"]() == 1200
+        assert len(server.mailbox.deleted) == 1200
+
+
+class TestIncrementalHistory:
+
+    def run(self, server, tmp_path, args: list[str]) -> str:
+        with (
+            patch("gmail_cleanup.auth.build_gmail_service", partial(service_for, server.url)),
+            patch(
+                "gmail_cleanup.rate_limit.RateLimiter",
+                lambda **kwargs: RateLimiter(rate=1_000_000, **kwargs),
+            ),
+            patch("gmail_cleanup.journal.JOURNAL_PATH", tmp_path / "journal.db"),
+        ):
+            result = CliRunner().invoke(cli.app, args, input="y\n")
+        assert result.exit_code == 0, result.output
+        return result.output
+
+    def test_trashed_then_restored_mail_is_tracked(self, server, tmp_path):
+        """--trash moves mail out of an --incremental rescan; restoring it brings it back."""
+        everything = ["--before", "2026-01-01", "--incremental"]
+        assert "Found 1,200 emails" in self.run(server, tmp_path, everything)
+
+        self.run(server, tmp_path, ["--before", "2015-01-01", "--execute", "--trash"])
+        trashed = len(server.mailbox.trashed)
+        assert 0 < trashed < 1200
+        lists = server.stats.list
+        assert f"Found {1200 - trashed:,} emails" in self.run(server, tmp_path, everything)
+        assert server.stats.list == lists  # answered from history, not a crawl
+
+        server.mailbox.set_trashed(next(iter(server.mailbox.trashed)), False)
+        assert f"Found {1200 - trashed + 1:,} emails" in self.run(server, tmp_path, everything)
@@ -0,0 +1,61 @@
+"""Tests for gmail_cleanup.forecast — --plan predictions from scan metrics."""
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+from gmail_cleanup.forecast import (
+    ScanObservation,
+    expected_backoff,
+    forecast_delete,
+)
+from gmail_cleanup.metrics import Metrics
+
+
+class TestForecastDelete:
+
+    def test_calls_and_quota_follow_chunk_size(self):
+        """1,001 messages take three 500-ID batchDelete calls at 50 units each."""
+        forecast = forecast_delete(1001, workers=1, latency=0.1)
+        assert (forecast.calls, forecast.retries, forecast.quota_units) == (3, 0, 150)
+        assert forecast.backoff_seconds == 0
+
+    def test_workers_help_until_quota_binds(self):
+        """Slow round trips are split across workers until the quota bucket sets the pace."""
+        one = forecast_delete(50_000, workers=1, latency=1.0)
+        assert not one.quota_bound and one.seconds == pytest.approx(100.0)
+        sixteen = forecast_delete(50_000, workers=16, latency=1.0)
+        assert sixteen.quota_bound
+        assert sixteen.seconds == pytest.approx((5000 - 250) / 250)
+
+    def test_trash_is_quota_bound(self):
+        """Trash costs 5 units per message, in batch requests of 100."""
+        forecast = forecast_delete(10_000, workers=4, latency=0.2, trash=True)
+        assert (forecast.calls, forecast.quota_units) == (100, 50_000)
+        assert forecast.quota_bound
+        assert forecast.seconds == pytest.approx((50_000 - 250) / 250)
+
+    def test_retries_add_attempts_quota_and_backoff(self):
+        """At a 50% error rate each call is sent twice on average and sleeps in backoff."""
+        forecast = forecast_delete(5000, workers=2, latency=0.1, retry_rate=0.5)
+        assert (forecast.calls, forecast.retries, forecast.quota_units) == (10, 10, 1000)
+        assert forecast.backoff_seconds == pytest.approx(10 * expected_backoff(0.5) / 2)
+        assert expected_backoff(0.5) > expected_backoff(0.1) > expected_backoff(0.0) == 0
+
+
+class TestScanObservation:
+
+    def test_mean_latency_and_retryable_share(self):
+        """Latency is averaged over every timed call; 429/5xx count toward the error rate."""
+        metrics = Metrics()
+        for status in (None, None, None, 503):
+            try:
+                with metrics.call("list"):
+                    if status is not None:
+                        raise HttpError(httplib2.Response({"status": str(status)}), b"")
+            except HttpError:
+                pass
+        observed = ScanObservation.from_metrics(metrics)
+        assert observed.requests == 4
+        assert observed.latency is not None and observed.latency >= 0
+        assert observed.retry_rate == 0.25
+        assert ScanObservation.from_metrics(Metrics()).latency is None
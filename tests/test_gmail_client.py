@@ -1,10 +1,27 @@
 """Tests for gmail_cleanup.gmail_client — paginated message ID fetching."""
-from unittest.mock import MagicMock, call
+import re
+from datetime import datetime, timezone
+from unittest.mock import MagicMock, call, patch
 
+import httplib2
 import pytest
+from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
+from googleapiclient.http import HttpMockSequence
 
-from gmail_cleanup.gmail_client import list_message_ids
+from gmail_cleanup.gmail_client import (
+    LIST_FIELDS,
+    HistoryExpiredError,
+    TransferStats,
+    batch_execute,
+    estimate_message_count,
+    estimate_with_margin,
+    filter_received_before,
+    list_history_changes,
+    iter_message_id_pages,
+    iter_sharded_message_id_pages,
+    list_message_ids,
+)
 
 
 def make_mock_service(pages):
@@ -59,11 +76,26 @@ class TestListMessageIds:
     def test_http_error_propagates(self):
         """Service raises HttpError on execute() -> HttpError raised from list_message_ids."""
         mock_service = MagicMock()
-        http_error = HttpError(resp=MagicMock(status=500), content=b"Internal Server Error")
+        http_error = HttpError(resp=MagicMock(status=403), content=b"Forbidden")
         mock_service.users.return_value.messages.return_value.list.return_value.execute.side_effect = http_error
         with pytest.raises(HttpError):
             list_message_ids(mock_service, "before:2024/01/01")
 
+    @patch("gmail_cleanup.rate_limit.time.sleep")
+    def test_transient_error_resumes_from_last_page_token(self, sleep):
+        """A 503 on page 2 retries page 2 with the same pageToken; page 1 is not re-fetched."""
+        service = make_mock_service([
+            {"messages": [{"id": "a"}], "nextPageToken": "tok"},
+            http_error(503),
+            ConnectionError("reset"),
+            {"messages": [{"id": "b"}]},
+        ])
+        assert list_message_ids(service, "before:2024/01/01") == ["a", "b"]
+        list_mock = service.users.return_value.messages.return_value.list
+        assert [c.kwargs.get("pageToken") for c in list_mock.call_args_list] == [None, "tok"]
+        assert list_mock.return_value.execute.call_count == 4
+        assert sleep.call_count == 2
+
     def test_pagetoken_passed_on_second_call(self):
         """Verify list() is called with pageToken= argument on second call."""
         pages = [
@@ -90,3 +122,327 @@ class TestListMessageIds:
         list_calls = service.users.return_value.messages.return_value.list.call_args_list
         for c in list_calls:
             assert c.kwargs.get("maxResults") == 500
+
+
+class TestIterMessageIdPages:
+    def test_yields_one_list_per_page(self):
+        """Two pages -> two yielded lists, in order."""
+        pages = [
+            {"messages": [{"id": "a"}, {"id": "b"}], "nextPageToken": "tok"},
+            {"messages": [{"id": "c"}]},
+        ]
+        service = make_mock_service(pages)
+        result = list(iter_message_id_pages(service, "q=test"))
+        assert result == [["a", "b"], ["c"]]
+
+    def test_is_lazy(self):
+        """No API call happens until the first page is requested."""
+        service = make_mock_service([{"messages": [{"id": "a"}]}])
+        pages = iter_message_id_pages(service, "q=test")
+        service.users.return_value.messages.return_value.list.assert_not_called()
+        assert next(pages) == ["a"]
+
+    def test_empty_pages_are_skipped(self):
+        """A page with no 'messages' key yields nothing."""
+        service = make_mock_service([{}])
+        assert list(iter_message_id_pages(service, "q=test")) == []
+
+
+class TestEstimateMessageCount:
+    def test_returns_result_size_estimate(self):
+        service = make_mock_service([{"resultSizeEstimate": 1234, "messages": [{"id": "a"}]}])
+        assert estimate_message_count(service, "q=test") == 1234
+
+    def test_missing_estimate_is_zero(self):
+        service = make_mock_service([{}])
+        assert estimate_message_count(service, "q=test") == 0
+
+
+def make_windowed_service(epochs: dict[str, int], page_size: int = 2, skew: float = 1.0):
+    """Mock service whose messages.list answers after:/before: window queries.
+
+    Args:
+        epochs: message ID -> internal date epoch.
+        page_size: IDs per page, so windows span several pages.
+        skew: factor applied to resultSizeEstimate for open-ended (before: only) queries.
+    """
+    def list_(userId, q, maxResults, pageToken=None, fields=None):
+        after = re.search(r"after:(\d+)", q)
+        before = int(re.search(r"before:(\d+)", q).group(1))
+        low = int(after.group(1)) if after else -1
+        # Inclusive bounds on both sides — the worst case for overlap.
+        ids = sorted(i for i, t in epochs.items() if low <= t <= before)
+        start = int(pageToken or 0)
+        page = ids[start:start + page_size]
+        estimate = len(ids) if after else int(len(ids) * skew)
+        result = {"messages": [{"id": i} for i in page], "resultSizeEstimate": estimate}
+        if start + page_size < len(ids):
+            result["nextPageToken"] = str(start + page_size)
+        request = MagicMock()
+        request.execute.return_value = result
+        return request
+
+    service = MagicMock()
+    service.users.return_value.messages.return_value.list.side_effect = list_
+    return service
+
+
+class TestIterShardedMessageIdPages:
+    CUTOFF = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    def _epochs(self):
+        end = int(self.CUTOFF.timestamp())
+        # Spread across 2005-2023, plus one pre-floor message and one past the cutoff.
+        epochs = {f"m{i:03d}": 1_104_537_600 + i * 5_000_000 for i in range(120)}
+        epochs = {k: v for k, v in epochs.items() if v < end}
+        epochs["ancient"] = 1_000_000
+        epochs["future"] = end + 10
+        return epochs
+
+    def test_matches_sequential_scan_without_duplicates(self):
+        epochs = self._epochs()
+        service = make_windowed_service(epochs)
+        ids = [
+            i
+            for page in iter_sharded_message_id_pages(lambda: service, self.CUTOFF, workers=3)
+            for i in page
+        ]
+        expected = list_message_ids(service, f"before:{int(self.CUTOFF.timestamp())}")
+        assert len(ids) == len(set(ids))
+        assert set(ids) == set(expected)
+        assert "future" not in ids
+
+    def test_dense_window_is_subdivided(self):
+        epochs = self._epochs()
+        service = make_windowed_service(epochs)
+        list(iter_sharded_message_id_pages(lambda: service, self.CUTOFF, workers=2, shard_target=10))
+        queries = {
+            c.kwargs["q"]
+            for c in service.users.return_value.messages.return_value.list.call_args_list
+        }
+        assert len(queries) > 3  # more windows than the initial split
+
+    def test_http_error_propagates(self):
+        service = MagicMock()
+        service.users.return_value.messages.return_value.list.return_value.execute.side_effect = (
+            HttpError(resp=MagicMock(status=403), content=b"boom")
+        )
+        with pytest.raises(HttpError):
+            list(iter_sharded_message_id_pages(lambda: service, self.CUTOFF, workers=2))
+
+
+def http_error(status: int) -> HttpError:
+    return HttpError(resp=httplib2.Response({"status": str(status)}), content=b"error")
+
+
+class FakeBatch:
+    """Stand-in for BatchHttpRequest: answers each sub-request via respond(key)."""
+
+    def __init__(self, respond, callback, sizes):
+        self._respond = respond
+        self._callback = callback
+        self._sizes = sizes
+        self._keys = []
+
+    def add(self, request, request_id):
+        self._keys.append(request_id)
+
+    def execute(self):
+        self._sizes.append(len(self._keys))
+        for key in self._keys:
+            outcome = self._respond(key)
+            if isinstance(outcome, HttpError):
+                self._callback(key, None, outcome)
+            else:
+                self._callback(key, outcome, None)
+
+
+def make_batch_service(respond):
+    service = MagicMock()
+    sizes: list[int] = []
+    service.new_batch_http_request.side_effect = lambda callback: FakeBatch(respond, callback, sizes)
+    return service, sizes
+
+
+class TestBatchExecute:
+    def test_packs_at_most_100_per_batch(self):
+        service, sizes = make_batch_service(lambda key: {"id": key})
+        keys = [str(i) for i in range(250)]
+        responses, failures = batch_execute(service, keys, MagicMock(), "get")
+        assert sizes == [100, 100, 50]
+        assert set(responses) == set(keys)
+        assert failures == {}
+
+    def test_only_failed_subrequests_are_retried(self):
+        calls: dict[str, int] = {}
+
+        def respond(key):
+            calls[key] = calls.get(key, 0) + 1
+            if key == "b" and calls[key] == 1:
+                return http_error(503)
+            return {"id": key}
+
+        service, sizes = make_batch_service(respond)
+        with patch("time.sleep"):
+            responses, failures = batch_execute(service, ["a", "b", "c"], MagicMock(), "get")
+        assert sizes == [3, 1]
+        assert set(responses) == {"a", "b", "c"}
+
+    def test_permanent_failures_are_reported_not_retried(self):
+        service, sizes = make_batch_service(
+            lambda key: http_error(404) if key == "gone" else {"id": key}
+        )
+        responses, failures = batch_execute(service, ["a", "gone"], MagicMock(), "get")
+        assert sizes == [2]
+        assert set(failures) == {"gone"}
+
+    def test_lost_batch_is_resent_whole(self):
+        """A batch that times out is sent again with every sub-request; a lasting one raises."""
+        outcomes = iter([TimeoutError("timed out")])
+
+        def respond(key):
+            outcome = next(outcomes, None)
+            if outcome is not None:
+                raise outcome
+            return {"id": key}
+
+        service, sizes = make_batch_service(respond)
+        with patch("time.sleep"):
+            responses, failures = batch_execute(service, ["a", "b"], MagicMock(), "get")
+        assert sizes == [2, 2]
+        assert set(responses) == {"a", "b"} and failures == {}
+
+        def lost(key):
+            raise ConnectionError("reset")
+
+        service, sizes = make_batch_service(lost)
+        with patch("time.sleep"), pytest.raises(ConnectionError):
+            batch_execute(service, ["a"], MagicMock(), "get", max_attempts=2)
+        assert len(sizes) == 2
+
+    def test_gives_up_after_max_attempts(self):
+        service, sizes = make_batch_service(lambda key: http_error(500))
+        with patch("time.sleep"):
+            responses, failures = batch_execute(service, ["a"], MagicMock(), "get", max_attempts=3)
+        assert len(sizes) == 3
+        assert set(failures) == {"a"}
+
+
+def make_history_service(pages):
+    service = MagicMock()
+    service.users.return_value.history.return_value.list.return_value.execute.side_effect = pages
+    return service
+
+
+class TestListHistoryChanges:
+    def test_collects_added_and_deleted(self):
+        pages = [
+            {
+                "history": [
+                    {"messagesAdded": [{"message": {"id": "a", "labelIds": ["INBOX"]}}]},
+                    {"messagesAdded": [{"message": {"id": "b", "labelIds": ["INBOX"]}}]},
+                    {"messagesDeleted": [{"message": {"id": "b"}}]},
+                ],
+                "nextPageToken": "tok",
+                "historyId": "150",
+            },
+            {
+                "history": [{"messagesDeleted": [{"message": {"id": "old"}}]}],
+                "historyId": "200",
+            },
+        ]
+        added, deleted, history_id = list_history_changes(make_history_service(pages), "100")
+        assert added == {"a"}
+        assert deleted == {"b", "old"}
+        assert history_id == "200"
+
+    def test_spam_and_trash_additions_are_ignored(self):
+        pages = [{"history": [{"messagesAdded": [{"message": {"id": "s", "labelIds": ["SPAM"]}}]}]}]
+        added, _, _ = list_history_changes(make_history_service(pages), "100")
+        assert added == set()
+
+    def test_trash_and_spam_label_changes(self):
+        """Gaining TRASH/SPAM counts as deleted; losing them counts as added unless still hidden."""
+        def label(change, message_id, changed, now):
+            return {change: [{"labelIds": changed, "message": {"id": message_id, "labelIds": now}}]}
+
+        pages = [{"history": [
+            label("labelsAdded", "t", ["TRASH"], ["TRASH", "INBOX"]),
+            label("labelsAdded", "s", ["SPAM"], ["SPAM"]),
+            label("labelsRemoved", "s", ["SPAM"], ["INBOX"]),
+            label("labelsRemoved", "both", ["TRASH"], ["SPAM"]),
+            label("labelsAdded", "x", ["STARRED"], ["STARRED"]),
+        ]}]
+        added, deleted, _ = list_history_changes(make_history_service(pages), "100")
+        assert added == {"s"}
+        assert deleted == {"t"}
+
+    def test_404_raises_history_expired(self):
+        service = make_history_service(http_error(404))
+        with pytest.raises(HistoryExpiredError):
+            list_history_changes(service, "1")
+
+
+class TestFilterReceivedBefore:
+    def test_keeps_only_messages_before_cutoff(self):
+        cutoff = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        cutoff_ms = int(cutoff.timestamp()) * 1000
+        dates = {"old": cutoff_ms - 1000, "new": cutoff_ms + 1000}
+        service, _ = make_batch_service(
+            lambda key: http_error(404) if key == "gone" else {"internalDate": str(dates[key])}
+        )
+        assert filter_received_before(service, ["old", "new", "gone"], cutoff) == {"old"}
+
+
+class TestPartialResponse:
+    def _service(self, responses):
+        http = HttpMockSequence(responses)
+        return build("gmail", "v1", http=http, static_discovery=True), http
+
+    def test_list_requests_fields_mask(self):
+        service = self._service([({"status": "200"}, '{"messages": [{"id": "a"}]}')])[0]
+        request = service.users().messages().list(userId="me", q="q", fields=LIST_FIELDS)
+        assert "fields=messages%28id%29%2CnextPageToken" in request.uri
+
+    def test_stats_record_payload_and_gzip(self):
+        body = '{"messages": [{"id": "a"}], "nextPageToken": "t"}'
+        service, _ = self._service([
+            ({"status": "200", "-content-encoding": "gzip"}, body),
+            ({"status": "200"}, '{"messages": [{"id": "b"}]}'),
+        ])
+        stats = TransferStats()
+        assert list_message_ids(service, "q", stats=stats) == ["a", "b"]
+        assert stats.pages == 2
+        assert stats.gzip_pages == 1
+        assert stats.payload_bytes == len(body) + len('{"messages": [{"id": "b"}]}')
+
+    def test_gzip_is_requested(self):
+        service, http = self._service([({"status": "200"}, "{}")])
+        list_message_ids(service, "q")
+        assert "gzip" in http.request_sequence[0][3]["accept-encoding"]
+        assert "(gzip)" in http.request_sequence[0][3]["user-agent"]
+
+
+class TestEstimateWithMargin:
+    CUTOFF = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    EPOCHS = {f"m{i}": 1_104_537_600 + i * 5_000_000 for i in range(100)}
+
+    def test_small_windows_are_counted_exactly(self):
+        service = make_windowed_service(self.EPOCHS, page_size=500, skew=1.3)
+        result = estimate_with_margin(service, self.CUTOFF, samples=4)
+        assert result.count == 100
+        assert result.margin == 0 and result.exact
+        assert result.requests == 6  # whole range + open window + 4 samples
+
+    def test_margin_reflects_estimate_disagreement(self):
+        service = make_windowed_service(self.EPOCHS, page_size=2, skew=1.3)
+        result = estimate_with_margin(service, self.CUTOFF, samples=4)
+        assert result.count == 100
+        assert result.margin == 30 and not result.exact
+
+    def test_agreeing_estimates_keep_a_margin(self):
+        """Estimates that happen to agree are still not exact: the margin has a floor."""
+        service = make_windowed_service(self.EPOCHS, page_size=2, skew=1.0)
+        result = estimate_with_margin(service, self.CUTOFF, samples=4)
+        assert result.count == 100
+        assert result.margin == 5 and not result.exact
@@ -0,0 +1,121 @@
+"""Tests for gmail_cleanup.id_file — exported ID files and memory-mapped reads."""
+import json
+import tracemalloc
+from types import SimpleNamespace
+
+import pytest
+
+from benchmarks.fake_gmail import FakeGmailConfig, FakeGmailServer, service_for
+from gmail_cleanup.cleaner import batch_delete
+from gmail_cleanup.id_file import MAGIC, IdFile, IdFileError, IdFileWriter
+from gmail_cleanup.rate_limit import RateLimiter
+
+IDS = ["18c5a3f2b1e4d7a9", "1", "ffffffffffffffff", "18c5a3f2b1e4d7aa"]
+
+
+def export(path, pages):
+    with IdFileWriter(path, "before:1700000000", 1700000000, "older-than:12") as writer:
+        for page in pages:
+            writer.write(page)
+    return writer
+
+
+class TestIdFile:
+
+    def test_round_trip(self, tmp_path):
+        """Pages written in order read back by index, slice and iteration, with the header."""
+        path = tmp_path / "scan.ids"
+        assert export(path, [IDS[:2], [], IDS[2:]]).count == 4
+        ids = IdFile(path)
+        try:
+            assert list(ids) == IDS
+            assert ids[1:3] == IDS[1:3] and ids[3:1] == []
+            assert ids[-1] == IDS[-1] and ids[::2] == IDS[::2]
+            assert (ids.query, ids.cutoff) == ("before:1700000000", 1700000000)
+            assert ids.header["target"] == "older-than:12"
+        finally:
+            ids.close()
+        # 8 bytes per ID after the (8-byte aligned) header.
+        assert (path.stat().st_size - 4 * 8) % 8 == 0
+
+    def test_failed_export_leaves_no_file(self, tmp_path):
+        """An error while writing discards the partial file instead of publishing it."""
+        path = tmp_path / "scan.ids"
+        with pytest.raises(ValueError, match="non-hex"):
+            export(path, [IDS, ["not-hex"]])
+        assert list(tmp_path.iterdir()) == []
+
+    def test_rejects_other_and_truncated_files(self, tmp_path):
+        """A file without the magic prefix, or cut mid-record, raises IdFileError."""
+        other = tmp_path / "other.ids"
+        other.write_text("18c5a3f2b1e4d7a9\n")
+        with pytest.raises(IdFileError, match="not an ID export"):
+            IdFile(other)
+        path = tmp_path / "scan.ids"
+        export(path, [IDS])
+        path.write_bytes(path.read_bytes()[:-3])
+        with pytest.raises(IdFileError, match="truncated"):
+            IdFile(path)
+
+    def test_rejects_header_without_required_fields(self, tmp_path):
+        """Valid JSON that lacks query/created or has a non-integer cutoff raises IdFileError."""
+        path = tmp_path / "scan.ids"
+        headers = [
+            [],
+            {"query": "q", "created": "x"},
+            {"query": "q", "cutoff": "1", "created": "x"},
+        ]
+        for header in headers:
+            data = json.dumps(header).encode()
+            prefix = MAGIC + len(data).to_bytes(4, "little") + data
+            path.write_bytes(prefix + b"\0" * (-len(prefix) % 8))
+            with pytest.raises(IdFileError, match="header lacks"):
+                IdFile(path)
+
+    def test_batch_delete_reads_chunks_from_file(self, tmp_path):
+        """batch_delete slices its chunks straight from an IdFile."""
+        path = tmp_path / "scan.ids"
+        with FakeGmailServer(FakeGmailConfig(messages=1200)) as server:
+            export(path, [[message_id for _, message_id in server.mailbox.keys]])
+            ids = IdFile(path)
+            try:
+                deleted = batch_delete(
+                    service_for(server.url),
+                    ids,
+                    workers=2,
+                    service_factory=lambda: service_for(server.url),
+                    show_progress=False,
+                )
+            finally:
+                ids.close()
+            assert deleted == 1200
+            assert server.stats.batch_delete == 3
+            assert len(server.mailbox.deleted) == 1200
+
+    def test_batch_delete_memory_stays_bounded(self, tmp_path):
+        """Deleting 200,000 IDs from a file holds a few chunks in memory, not the whole list."""
+        path = tmp_path / "scan.ids"
+        export(path, [[f"{i + 2**60:x}" for i in range(start, start + 10_000)]
+                      for start in range(0, 200_000, 10_000)])
+        sent = 0
+
+        def batch_delete_request(userId, body):
+            nonlocal sent
+            sent += len(body["ids"])
+            return SimpleNamespace(execute=lambda: None)
+
+        messages = SimpleNamespace(batchDelete=batch_delete_request)
+        service = SimpleNamespace(users=lambda: SimpleNamespace(messages=lambda: messages))
+        ids = IdFile(path)
+        tracemalloc.start()
+        try:
+            deleted = batch_delete(
+                service, ids, limiter=RateLimiter(rate=1e9), show_progress=False
+            )
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+            ids.close()
+        assert deleted == sent == 200_000
+        # Decoding every ID at once would take over 10 MiB.
+        assert peak < 2 * 2**20
@@ -0,0 +1,67 @@
+"""Tests for gmail_cleanup.id_store — array-backed message ID containers."""
+from unittest.mock import patch
+
+from gmail_cleanup import id_store
+from gmail_cleanup.id_store import MessageIdList, MessageIdSet, decode_id, encode_id
+
+REAL_IDS = ["18c5a3f2b1e4d7a9", "18c5a3f2b1e4d7aa", "1234abcd", "ffffffffffffffff"]
+
+
+class TestEncodeId:
+    def test_round_trips_gmail_ids(self):
+        for message_id in REAL_IDS:
+            assert decode_id(encode_id(message_id)) == message_id
+
+    def test_non_canonical_ids_are_rejected(self):
+        for message_id in ["0abc", "ABC", "0x1f", "1_0", "not-hex", "1" + "0" * 16]:
+            assert encode_id(message_id) is None
+
+
+class TestMessageIdList:
+    def test_preserves_order_and_slices_to_strings(self):
+        ids = MessageIdList(REAL_IDS)
+        assert len(ids) == 4
+        assert ids[1:3] == REAL_IDS[1:3]
+        assert isinstance(ids[0:2], list)
+        assert ids[-1] == REAL_IDS[-1]
+        assert list(ids) == REAL_IDS
+
+    def test_non_hex_ids_keep_their_position(self):
+        ids = MessageIdList(["abc", "p1_0", "def"])
+        assert list(ids) == ["abc", "p1_0", "def"]
+        assert ids[1] == "p1_0"
+
+    def test_compares_equal_to_list(self):
+        assert MessageIdList(["a", "b"]) == ["a", "b"]
+        assert MessageIdList(["a", "b"]) != ["b", "a"]
+
+
+class TestMessageIdSet:
+    def test_add_new_reports_only_unseen_ids(self):
+        ids = MessageIdSet(["a1", "b2"])
+        assert ids.add_new(["b2", "c3", "c3", "zz"]) == ["c3", "zz"]
+        assert len(ids) == 4
+
+    def test_membership_across_merges(self):
+        """IDs stay findable after the insert buffer is merged into the array."""
+        with patch.object(id_store, "_MERGE_MIN", 4):
+            ids = MessageIdSet(format(i, "x") for i in range(1, 50))
+            assert ids._sorted  # at least one merge happened
+            assert all(format(i, "x") in ids for i in range(1, 50))
+            assert "0" not in ids and format(50, "x") not in ids
+            assert ids.add_new([format(i, "x") for i in range(45, 55)]) == [
+                format(i, "x") for i in range(50, 55)
+            ]
+
+    def test_difference_update(self):
+        with patch.object(id_store, "_MERGE_MIN", 4):
+            ids = MessageIdSet(format(i, "x") for i in range(1, 20))
+            ids -= [format(i, "x") for i in range(1, 20, 2)] + ["nothex"]
+        assert set(ids) == {format(i, "x") for i in range(2, 20, 2)}
+
+    def test_iterates_in_numeric_order(self):
+        ids = MessageIdSet(["ff", "a", "1b"])
+        assert list(ids) == ["a", "1b", "ff"]
+
+    def test_compares_equal_to_set(self):
+        assert MessageIdSet(["a", "b"]) == {"a", "b"}
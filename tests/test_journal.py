@@ -0,0 +1,100 @@
+"""Tests for gmail_cleanup.journal — resumable run bookkeeping in SQLite."""
+import pytest
+
+from gmail_cleanup import journal as journal_module
+from gmail_cleanup.journal import RunJournal
+
+
+@pytest.fixture
+def journal(tmp_path):
+    j = RunJournal(tmp_path / "journal.db")
+    yield j
+    j.close()
+
+
+class TestRunJournal:
+    def test_start_and_find_unfinished(self, journal):
+        run = journal.start("older-than:12", "before:100", 100)
+        found = journal.find_unfinished("older-than:12")
+        assert found is not None
+        assert found.id == run.id
+        assert found.query == "before:100"
+        assert not found.scan_complete
+
+    def test_find_unknown_target_returns_none(self, journal):
+        assert journal.find_unfinished("before:2020-01-01") is None
+
+    def test_ids_buffered_until_flush(self, journal, monkeypatch):
+        """IDs and page token are written together once FLUSH_SIZE is reached."""
+        monkeypatch.setattr(journal_module, "FLUSH_SIZE", 4)
+        run = journal.start("t", "q", 1)
+        journal.record_page(run, ["a", "b"], "tok1")
+        assert journal.scanned_ids(run) == []
+        journal.record_page(run, ["c", "d"], "tok2")
+        assert journal.scanned_ids(run) == ["a", "b", "c", "d"]
+        assert journal.find_unfinished("t").page_token == "tok2"
+
+    def test_complete_scan_flushes_and_dedupes(self, journal):
+        run = journal.start("t", "q", 1)
+        journal.record_page(run, ["a", "b"])
+        journal.record_page(run, ["b", "c"])
+        journal.complete_scan(run)
+        assert journal.scanned_ids(run) == ["a", "b", "c"]
+        assert journal.find_unfinished("t").scan_complete
+
+    def test_chunk_state_round_trips(self, journal):
+        run = journal.start("t", "q", 1)
+        journal.mark_chunk_done(run, 0)
+        journal.mark_chunk_done(run, 3)
+        assert journal.done_chunks(run) == {0, 3}
+
+    def test_start_discards_previous_run(self, journal):
+        old = journal.start("t", "q", 1)
+        journal.record_page(old, ["a"])
+        journal.complete_scan(old)
+        new = journal.start("t", "q2", 2)
+        assert journal.find_unfinished("t").id == new.id
+        assert journal.scanned_ids(old) == []
+
+    def test_finish_removes_run(self, journal):
+        run = journal.start("t", "q", 1)
+        journal.mark_chunk_done(run, 0)
+        journal.finish(run)
+        assert journal.find_unfinished("t") is None
+        assert journal.done_chunks(run) == set()
+
+    def test_survives_reopen(self, tmp_path):
+        path = tmp_path / "journal.db"
+        first = RunJournal(path)
+        run = first.start("t", "q", 1)
+        first.record_page(run, ["a"])
+        first.complete_scan(run)
+        first.mark_chunk_done(run, 0)
+        first.close()
+        second = RunJournal(path)
+        resumed = second.find_unfinished("t")
+        assert second.scanned_ids(resumed) == ["a"]
+        assert second.done_chunks(resumed) == {0}
+        second.close()
+
+
+class TestScanSnapshot:
+    def test_no_snapshot_initially(self, journal):
+        assert journal.load_snapshot() is None
+
+    def test_save_replaces_previous_snapshot(self, journal):
+        journal.save_snapshot("100", 1000, ["a", "b"])
+        journal.save_snapshot("200", 2000, ["b", "c"])
+        snapshot = journal.load_snapshot()
+        assert (snapshot.history_id, snapshot.cutoff) == ("200", 2000)
+        assert journal.snapshot_ids() == {"b", "c"}
+
+
+class TestWatermark:
+    def test_watermarks_are_per_target(self, journal):
+        assert journal.load_watermark("older-than:12") is None
+        journal.save_watermark("older-than:12", 1000)
+        journal.save_watermark("older-than:12", 2000)
+        journal.save_watermark("trash:older-than:12", 500)
+        assert journal.load_watermark("older-than:12") == 2000
+        assert journal.load_watermark("trash:older-than:12") == 500
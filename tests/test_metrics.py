@@ -0,0 +1,106 @@
+"""Tests for gmail_cleanup.metrics — histograms, call outcomes and export formats."""
+import json
+from unittest.mock import MagicMock, patch
+
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+from gmail_cleanup.cleaner import batch_delete
+from gmail_cleanup.metrics import LATENCY_BUCKETS, Histogram, Metrics
+from gmail_cleanup.rate_limit import RateLimiter, execute_paced
+
+
+def make_http_error(status: int) -> HttpError:
+    return HttpError(resp=httplib2.Response({"status": str(status)}), content=b"error")
+
+
+class TestMetrics:
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Observations land in the first bucket they fit; export is cumulative to +Inf."""
+        h = Histogram()
+        for seconds in (0.01, 0.07, 0.07, 1000.0):
+            h.observe(seconds)
+        buckets = dict(h.cumulative())
+        assert buckets["0.05"] == 1
+        assert buckets["0.1"] == 3
+        assert buckets[str(LATENCY_BUCKETS[-1])] == 3
+        assert buckets["+Inf"] == h.count == 4
+        assert h.max == 1000.0
+
+    def test_call_records_status_of_each_outcome(self):
+        """Successful, HTTP-failed and transport-failed calls are counted by status."""
+        metrics = Metrics()
+        with metrics.call("list"):
+            pass
+        with pytest.raises(HttpError), metrics.call("list"):
+            raise make_http_error(503)
+        with pytest.raises(TimeoutError), metrics.call("list"):
+            raise TimeoutError
+        assert metrics.requests == {("list", "200"): 1, ("list", "503"): 1, ("list", "error"): 1}
+        assert metrics.latency["list"].count == 3
+
+    def test_execute_paced_records_quota_and_latency(self):
+        """Each paced call reserves its quota cost and is timed under its method."""
+        limiter = RateLimiter()
+        request = MagicMock()
+        request.execute.return_value = {}
+        for _ in range(3):
+            execute_paced(request, "list", limiter)
+        execute_paced(request, "getProfile", limiter)
+        assert limiter.metrics.quota_units == {"list": 15, "getProfile": 1}
+        assert limiter.metrics.latency["list"].count == 3
+
+    def test_batch_delete_records_retries_and_backoff(self):
+        """A 503 then 429 on batchDelete are counted as retries; the 503 sleep as backoff."""
+        service = MagicMock()
+        service.users().messages().batchDelete().execute.side_effect = [
+            make_http_error(503),
+            make_http_error(429),
+            None,
+        ]
+        limiter = RateLimiter()
+        with patch("time.sleep"), patch("gmail_cleanup.cleaner.backoff_delay", return_value=0.5):
+            batch_delete(service, ["a", "b"], limiter=limiter)
+        metrics = limiter.metrics
+        assert metrics.retries == {("batchDelete", "503"): 1, ("batchDelete", "429"): 1}
+        assert metrics.backoff_seconds == 0.5
+        assert metrics.quota_units["batchDelete"] == 150
+
+    def test_phase_throughput(self):
+        """record_phase accumulates seconds and messages per phase."""
+        metrics = Metrics()
+        metrics.record_phase("scan", 2.0, 1000)
+        metrics.record_phase("scan", 2.0, 1000)
+        assert metrics.to_dict()["phases"]["scan"] == {
+            "seconds": 4.0,
+            "messages": 2000,
+            "messages_per_second": 500.0,
+        }
+
+    def test_write_json(self, tmp_path):
+        """A non-.prom path gets JSON, and no temp file is left behind."""
+        metrics = Metrics()
+        with metrics.call("list"):
+            pass
+        path = tmp_path / "out" / "metrics.json"
+        metrics.write(path)
+        data = json.loads(path.read_text())
+        assert data["requests"] == {"list": {"200": 1}}
+        assert [p.name for p in path.parent.iterdir()] == ["metrics.json"]
+
+    def test_write_prometheus_textfile(self, tmp_path):
+        """A .prom path gets the Prometheus text format with labelled series."""
+        metrics = Metrics()
+        with metrics.call("batchDelete"):
+            pass
+        metrics.record_retry("batchDelete", 429)
+        metrics.record_phase("delete", 1.0, 500)
+        path = tmp_path / "gmail_clean.prom"
+        metrics.write(path)
+        text = path.read_text()
+        assert "# TYPE gmail_clean_request_duration_seconds histogram" in text
+        assert 'gmail_clean_request_duration_seconds_count{method="batchDelete"} 1' in text
+        assert 'gmail_clean_retries_total{method="batchDelete",status="429"} 1' in text
+        assert 'gmail_clean_phase_messages_per_second{phase="delete"} 500.0' in text
@@ -0,0 +1,122 @@
+"""Tests for gmail_cleanup.policy — policy file parsing and multi-rule query planning."""
+from datetime import datetime, timezone
+
+import pytest
+
+from benchmarks.fake_gmail import MAILBOX_END, FakeGmailConfig, FakeGmailServer, service_for
+from gmail_cleanup.policy import (
+    PolicyError,
+    Rule,
+    iter_plan_pages,
+    load_policy,
+    plan_queries,
+)
+
+
+def rule(name: str, query: str, year: int) -> Rule:
+    return Rule(name, query, datetime(year, 1, 1, tzinfo=timezone.utc))
+
+
+def epoch(year: int) -> int:
+    return int(datetime(year, 1, 1, tzinfo=timezone.utc).timestamp())
+
+
+class TestLoadPolicy:
+
+    def test_parses_rules(self, tmp_path):
+        """older_than, before strings and TOML dates all become cutoffs; queries are tidied."""
+        path = tmp_path / "policy.toml"
+        path.write_text(
+            '[[rule]]\nname = "promotions"\nquery = "  category:promotions "\nolder_than = 1\n'
+            '[[rule]]\nname = "old"\nbefore = "2020-01-01"\n'
+            '[[rule]]\nname = "older"\nbefore = 2019-01-01\n'
+        )
+        rules = load_policy(path)
+        assert [(r.name, r.query) for r in rules] == [
+            ("promotions", "category:promotions"),
+            ("old", ""),
+            ("older", ""),
+        ]
+        assert rules[1].cutoff.strftime("%Y-%m-%d %H:%M") == "2020-01-01 23:59"
+        assert rules[2].cutoff.strftime("%Y-%m-%d") == "2019-01-01"
+
+    def test_rejects_dates_in_query(self, tmp_path):
+        """A before:/older_than: operator in the query is refused, naming the rule."""
+        path = tmp_path / "policy.toml"
+        path.write_text('[[rule]]\nname = "x"\nquery = "older_than:1y"\nolder_than = 1\n')
+        with pytest.raises(PolicyError, match="rule 'x'"):
+            load_policy(path)
+
+    def test_rejects_invalid_rules(self, tmp_path):
+        """Missing or doubled ages, unknown keys and duplicate names are all errors."""
+        path = tmp_path / "policy.toml"
+        for body, message in (
+            ('name = "x"\n', "exactly one of"),
+            ('name = "x"\nolder_than = 1\nbefore = "2020-01-01"\n', "exactly one of"),
+            ('name = "x"\nolder_then = 1\n', "unknown key 'older_then'"),
+            ('name = "x"\nolder_than = 0\n', "whole number"),
+            ('name = "x"\nolder_than = 1\n[[rule]]\nname = "x"\nolder_than = 2\n', "duplicate"),
+        ):
+            path.write_text("[[rule]]\n" + body)
+            with pytest.raises(PolicyError, match=message):
+                load_policy(path)
+
+
+class TestPlanQueries:
+
+    def test_catch_all_trims_other_rules_to_windows(self):
+        """Filtered rules list only the window after the catch-all cutoff."""
+        plan = plan_queries([
+            rule("promotions", "category:promotions", 2024),
+            rule("updates", "category:updates", 2023),
+            rule("everything", "", 2020),
+        ])
+        assert [(q.rule, q.query) for q in plan.queries] == [
+            ("promotions", f"(category:promotions) after:{epoch(2020) - 1} before:{epoch(2024)}"),
+            ("updates", f"(category:updates) after:{epoch(2020) - 1} before:{epoch(2023)}"),
+            ("everything", f"before:{epoch(2020)}"),
+        ]
+        assert plan.covered == {}
+        assert plan.cutoff == datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    def test_covered_rules_get_no_query(self):
+        """Same-query rules keep the latest cutoff; rules older than the catch-all vanish."""
+        plan = plan_queries([
+            rule("old social", "category:social", 2010),
+            rule("social", "category:social", 2015),
+            rule("recent social", "category:social", 2024),
+            rule("updates", "category:updates", 2018),
+            rule("everything", "", 2020),
+        ])
+        assert [q.rule for q in plan.queries] == ["recent social", "everything"]
+        assert plan.covered == {
+            "old social": "recent social",
+            "social": "recent social",
+            "updates": "everything",
+        }
+
+    def test_without_catch_all_each_query_is_bounded_by_its_cutoff(self):
+        """With no catch-all rule, every distinct query lists everything before its cutoff."""
+        plan = plan_queries([
+            rule("a", "from:a OR from:b", 2020),
+            rule("c", "from:c", 2021),
+        ])
+        assert [q.query for q in plan.queries] == [
+            f"(from:a OR from:b) before:{epoch(2020)}",
+            f"(from:c) before:{epoch(2021)}",
+        ]
+
+
+class TestIterPlanPages:
+
+    def test_overlapping_queries_yield_each_id_once(self):
+        """IDs listed by an earlier query are dropped from later ones."""
+        # The fake server ignores search terms, so both queries list every message.
+        year = datetime.fromtimestamp(MAILBOX_END, tz=timezone.utc).year + 1
+        plan = plan_queries([rule("first", "from:a", year), rule("second", "from:b", year)])
+        with FakeGmailServer(FakeGmailConfig(messages=1200)) as server:
+            pages = list(iter_plan_pages(service_for(server.url), plan))
+            assert server.stats.list == 6
+        ids = [message_id for _, page in pages for message_id in page]
+        assert len(ids) == len(set(ids)) == 1200
+        assert {name for name, page in pages if page} == {"first"}
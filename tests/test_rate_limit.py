@@ -0,0 +1,168 @@
+"""Tests for gmail_cleanup.rate_limit — token bucket, AIMD and Retry-After."""
+from unittest.mock import MagicMock, patch
+
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+from gmail_cleanup.rate_limit import (
+    MAX_BACKOFF,
+    RateLimiter,
+    RetryBudget,
+    backoff_delay,
+    execute_paced,
+    execute_retrying,
+    retry_after_seconds,
+)
+
+
+def make_http_error(status: int, headers: dict | None = None) -> HttpError:
+    resp = httplib2.Response({"status": str(status), **(headers or {})})
+    return HttpError(resp=resp, content=b"error")
+
+
+class TestRateLimiter:
+    def test_burst_within_budget_does_not_sleep(self):
+        """One second of quota is available immediately."""
+        limiter = RateLimiter(rate=250)
+        with patch("time.sleep") as mock_sleep:
+            for _ in range(5):
+                limiter.acquire("batchDelete")  # 5 x 50 = 250 units
+        mock_sleep.assert_not_called()
+
+    def test_over_budget_sleeps_for_the_deficit(self):
+        limiter = RateLimiter(rate=100)
+        with patch("time.sleep") as mock_sleep:
+            limiter.acquire("batchDelete")
+            limiter.acquire("batchDelete")
+            waited = limiter.acquire("batchDelete")  # 50 units short at 100/s
+        mock_sleep.assert_called_once()
+        assert waited == pytest.approx(0.5, abs=0.05)
+
+    def test_throttle_halves_rate_and_pauses(self):
+        limiter = RateLimiter(rate=200)
+        limiter.on_throttle(3.0)
+        assert limiter.rate == 100
+        with patch("time.sleep") as mock_sleep:
+            waited = limiter.acquire("list")
+        mock_sleep.assert_called_once()
+        assert waited == pytest.approx(3.0, abs=0.1)
+
+    def test_concurrent_throttles_decrease_once(self):
+        """A burst of 429s inside the cooldown halves the rate only once."""
+        limiter = RateLimiter(rate=200)
+        for _ in range(4):
+            limiter.on_throttle(0.0)
+        assert limiter.rate == 100
+
+    def test_rate_never_drops_below_min(self):
+        limiter = RateLimiter(rate=20, min_rate=15)
+        limiter.on_throttle(0.0)
+        assert limiter.rate == 15
+
+    def test_success_increases_up_to_max(self):
+        limiter = RateLimiter(rate=200, increase=60)
+        limiter.on_throttle(0.0)
+        limiter.on_success()
+        assert limiter.rate == 160
+        limiter.on_success()
+        assert limiter.rate == 200
+
+
+class TestRetryAfter:
+    def test_delta_seconds(self):
+        assert retry_after_seconds(make_http_error(429, {"retry-after": "7"})) == 7.0
+
+    def test_http_date_in_past_is_zero(self):
+        exc = make_http_error(429, {"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"})
+        assert retry_after_seconds(exc) == 0.0
+
+    def test_missing_header(self):
+        assert retry_after_seconds(make_http_error(429)) is None
+
+    def test_garbage_header(self):
+        assert retry_after_seconds(make_http_error(429, {"retry-after": "soon"})) is None
+
+
+class TestBackoffDelay:
+    def test_jitter_within_bounds(self):
+        for attempt in range(10):
+            delay = backoff_delay(attempt)
+            assert 0 <= delay <= min(MAX_BACKOFF, 2 ** attempt)
+
+
+class TestExecutePaced:
+    def test_429_throttles_and_reraises(self):
+        limiter = RateLimiter(rate=200)
+        request = MagicMock()
+        request.execute.side_effect = make_http_error(429, {"retry-after": "0"})
+        with pytest.raises(HttpError):
+            execute_paced(request, "list", limiter)
+        assert limiter.rate == 100
+
+    def test_no_limiter_just_executes(self):
+        request = MagicMock()
+        request.execute.return_value = {"ok": True}
+        assert execute_paced(request, "list", None) == {"ok": True}
+
+
+class TestExecuteRetrying:
+    @patch("gmail_cleanup.rate_limit.time.sleep")
+    def test_transient_failures_are_retried(self, sleep):
+        """503 and network errors are sent again and counted against the budget."""
+        limiter = RateLimiter(rate=1e6)
+        request = MagicMock()
+        request.execute.side_effect = [make_http_error(503), TimeoutError(), {"ok": True}]
+        budget = RetryBudget(max_retries=5)
+        assert execute_retrying(request, "list", limiter, budget) == {"ok": True}
+        assert budget.used == 2 and sleep.call_count == 2
+        assert limiter.metrics.to_dict()["retries"]["list"] == {"503": 1, "error": 1}
+
+    @patch("gmail_cleanup.rate_limit.backoff_delay", side_effect=lambda attempt: 2.0 ** attempt)
+    def test_repeated_429s_back_off_exponentially(self, backoff):
+        """Each 429 without Retry-After pauses for that attempt's backoff; the timeout sees it."""
+        clock = [0.0]
+
+        def sleep(seconds):
+            clock[0] += seconds
+
+        with (
+            patch("gmail_cleanup.rate_limit.time.monotonic", lambda: clock[0]),
+            patch("gmail_cleanup.rate_limit.time.sleep", sleep),
+        ):
+            limiter = RateLimiter(rate=1e6)
+            limiter.on_throttle = MagicMock(wraps=limiter.on_throttle)
+            request = MagicMock()
+            request.execute.side_effect = [make_http_error(429)] * 3 + [{"ok": True}]
+            assert execute_retrying(request, "list", limiter, RetryBudget()) == {"ok": True}
+            assert [c.args[0] for c in limiter.on_throttle.call_args_list] == [1, 2, 4]
+            assert clock[0] >= 7
+            # Waits of 1, 2 and 4s fit a 10s timeout; the fourth (8s) would not.
+            clock[0] = 100.0
+            request.execute.side_effect = make_http_error(429)
+            budget = RetryBudget(timeout=10)
+            with pytest.raises(HttpError):
+                execute_retrying(request, "list", limiter, budget)
+            assert budget.used == 3
+
+    @patch("gmail_cleanup.rate_limit.time.sleep")
+    def test_spent_budget_reraises(self, sleep):
+        """Once the scan's retries are spent the next failure is raised."""
+        request = MagicMock()
+        request.execute.side_effect = make_http_error(500)
+        with pytest.raises(HttpError):
+            execute_retrying(request, "list", None, RetryBudget(max_retries=3))
+        assert request.execute.call_count == 4
+
+    @patch("gmail_cleanup.rate_limit.time.sleep")
+    def test_timeout_and_permanent_errors_are_not_retried(self, sleep):
+        """A 403, or a retry that would wait past the timeout, raises at once."""
+        request = MagicMock()
+        request.execute.side_effect = make_http_error(403)
+        with pytest.raises(HttpError):
+            execute_retrying(request, "list", None, RetryBudget())
+        request.execute.side_effect = make_http_error(503, {"retry-after": "120"})
+        budget = RetryBudget(timeout=60)
+        with pytest.raises(HttpError):
+            execute_retrying(request, "list", None, budget)
+        assert budget.used == 0 and sleep.call_count == 0
@@ -0,0 +1,92 @@
+"""Tests for gmail_cleanup.report — metadata cache, fetching and aggregation."""
+from unittest.mock import patch
+
+import pytest
+
+from benchmarks.fake_gmail import FakeGmailConfig, FakeGmailServer, service_for
+from gmail_cleanup.rate_limit import RateLimiter
+from gmail_cleanup.report import MessageMetadata, MetadataCache, build_report
+
+
+def unpaced() -> RateLimiter:
+    # messages.get costs 5 quota units; lift the quota so tests are not paced.
+    return RateLimiter(rate=1_000_000)
+
+
+@pytest.fixture
+def server():
+    with FakeGmailServer(FakeGmailConfig(messages=300)) as server:
+        yield server
+
+
+class TestMetadataCache:
+
+    def test_round_trip(self, tmp_path):
+        """Stored metadata reads back unchanged; unknown IDs are absent."""
+        cache = MetadataCache(tmp_path / "metadata.db")
+        cache.put_many({"a": MessageMetadata("x@example.com", ("INBOX", "Label_1"), 1234)})
+        assert cache.get_many(["a", "b"]) == {
+            "a": MessageMetadata("x@example.com", ("INBOX", "Label_1"), 1234)
+        }
+
+    def test_evicts_least_recently_used(self, tmp_path):
+        """Over the bound, the rows read or written longest ago are dropped first."""
+        cache = MetadataCache(tmp_path / "metadata.db", max_entries=2)
+        row = MessageMetadata("x@example.com", (), 1)
+        with patch("time.time", side_effect=[1.0, 2.0, 3.0, 4.0]):
+            cache.put_many({"a": row})
+            cache.put_many({"b": row})
+            cache.get_many(["a"])  # a is now more recent than b
+            cache.put_many({"c": row})
+        assert len(cache) == 2
+        assert set(cache.get_many(["a", "b", "c"])) == {"a", "c"}
+
+
+class TestBuildReport:
+
+    def test_sender_parsed_from_header(self):
+        """The From header is reduced to its lower-cased address."""
+        message = {
+            "labelIds": ["INBOX"],
+            "sizeEstimate": 10,
+            "payload": {"headers": [{"name": "From", "value": "Shop <Deals@Shop.example>"}]},
+        }
+        assert MessageMetadata.from_message(message).sender == "deals@shop.example"
+
+    def test_totals_match_mailbox(self, server, tmp_path):
+        """Every message is counted once, with label names resolved from labels.list."""
+        ids = [message_id for _, message_id in server.mailbox.keys]
+        cache = MetadataCache(tmp_path / "metadata.db")
+        report = build_report(service_for(server.url), ids, cache, unpaced())
+        expected = [server.mailbox.metadata(message_id) for message_id in ids]
+        assert report.messages == report.fetched == 300
+        assert report.total_bytes == sum(m["sizeEstimate"] for m in expected)
+        assert sum(count for _, count, _ in report.top_senders(100)) == 300
+        assert "Receipts" in dict(report.top_labels(100))
+        assert server.stats.batch == 3
+
+    def test_repeat_report_is_served_from_cache(self, server, tmp_path):
+        """A second report over the same IDs sends no messages.get at all."""
+        ids = [message_id for _, message_id in server.mailbox.keys]
+        cache = MetadataCache(tmp_path / "metadata.db")
+        first = build_report(service_for(server.url), ids, cache, unpaced())
+        gets = server.stats.get
+        second = build_report(service_for(server.url), ids, cache, unpaced())
+        assert server.stats.get == gets
+        assert second.cached == 300 and second.fetched == 0
+        assert second.total_bytes == first.total_bytes
+
+    def test_deleted_message_counted_as_missing(self, server, tmp_path):
+        """A message deleted since the scan is skipped, not raised."""
+        ids = [message_id for _, message_id in server.mailbox.keys]
+        server.mailbox.deleted.add(ids[0])
+        progress: list[int] = []
+        report = build_report(
+            service_for(server.url),
+            ids,
+            MetadataCache(tmp_path / "metadata.db"),
+            unpaced(),
+            on_progress=progress.append,
+        )
+        assert report.missing == 1 and report.messages == 299
+        assert progress == [300]
@@ -0,0 +1,20 @@
+"""Startup regression tests: the CLI must not load the Gmail stack before it is needed."""
+from benchmarks.startup import probe
+
+
+class TestStartup:
+
+    def test_import_loads_no_heavy_modules(self):
+        """Importing gmail_cleanup.main loads none of the Gmail client, OAuth or rich."""
+        _, loaded = probe(None)
+        assert loaded == []
+
+    def test_argument_error_loads_no_heavy_modules(self):
+        """A rejected argument combination exits before any heavy import."""
+        _, loaded = probe(["--older-than", "3", "--before", "2024-01-01"])
+        assert loaded == []
+
+    def test_help_loads_only_rich(self):
+        """--help may use rich (typer formats help with it) but nothing else."""
+        _, loaded = probe(["--help"])
+        assert set(loaded) <= {"rich"}
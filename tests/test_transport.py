@@ -0,0 +1,76 @@
+"""Unit tests for PooledHttp in gmail_cleanup.transport."""
+import socket
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from unittest.mock import MagicMock
+
+import pytest
+
+from benchmarks.fake_gmail import MAILBOX_END, FakeGmailConfig, FakeGmailServer, service_for
+from gmail_cleanup.date_utils import build_gmail_query
+from gmail_cleanup.gmail_client import list_message_ids
+from gmail_cleanup.transport import PooledHttp, TransportConfig
+
+QUERY = build_gmail_query(datetime.fromtimestamp(MAILBOX_END, tz=timezone.utc))
+
+
+@pytest.fixture
+def server():
+    with FakeGmailServer(FakeGmailConfig(messages=600, page_size=100)) as server:
+        yield server
+
+
+class TestPooledHttp:
+
+    def test_pages_reuse_one_connection(self, server):
+        """Six list pages through the Gmail client travel over a single connection."""
+        ids = list_message_ids(service_for(server.url, PooledHttp()), QUERY)
+        assert len(ids) == 600
+        assert server.stats.list == 6
+        assert server.stats.connections == 1
+
+    def test_threads_share_bounded_pool(self, server):
+        """Concurrent callers on one PooledHttp never open more than pool_size connections."""
+        http = PooledHttp(config=TransportConfig(pool_size=2))
+        with ThreadPoolExecutor(max_workers=6) as pool:
+            results = list(
+                pool.map(
+                    lambda _: len(list_message_ids(service_for(server.url, http), QUERY)),
+                    range(6),
+                )
+            )
+        assert results == [600] * 6
+        assert server.stats.connections <= 2
+
+    def test_response_matches_httplib2_shape(self, server):
+        """request() returns an httplib2.Response with int status and lower-cased headers."""
+        resp, content = PooledHttp().request(f"{server.url}/gmail/v1/users/me/profile")
+        assert resp.status == 200
+        assert resp["content-type"].startswith("application/json")
+        assert b"historyId" in content
+
+    def test_read_timeout_raises_timeout_error(self):
+        """A response slower than read_timeout raises TimeoutError."""
+        with FakeGmailServer(FakeGmailConfig(messages=1, latency=0.5)) as slow:
+            http = PooledHttp(config=TransportConfig(read_timeout=0.05))
+            with pytest.raises(TimeoutError):
+                http.request(f"{slow.url}/gmail/v1/users/me/profile")
+
+    def test_refused_connection_raises_connection_error(self):
+        """Nothing listening on the port raises ConnectionError."""
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        with pytest.raises(ConnectionError):
+            PooledHttp().request(f"http://127.0.0.1:{port}/")
+
+    def test_gzip_recorded_as_decoded(self):
+        """A gzip response is reported via -content-encoding, as httplib2 does."""
+        http = PooledHttp()
+        response = MagicMock(status_code=200, reason="OK", content=b'{"a": 1}')
+        response.headers = {"Content-Encoding": "gzip", "Content-Length": "30"}
+        http._session.request = MagicMock(return_value=response)
+        resp, content = http.request("https://example.invalid/")
+        assert resp["-content-encoding"] == "gzip"
+        assert "content-encoding" not in resp
+        assert resp["content-length"] == str(len(content))